@@ -0,0 +1,99 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from config.metrics import AUTH_CACHE
+from config.timing import timed
+
+TOKEN_CACHE_KEY = 'accounts:token-user:{digest}'
+
+
+def token_cache_key(key):
+    """Cache key for a token; hashed so raw tokens never sit in the cache"""
+    return TOKEN_CACHE_KEY.format(digest=hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_token(key):
+    """Forget the cached user for a token after it was deleted or rotated"""
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    """Forget the cached user for every token belonging to ``user_id``"""
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def _load_entry(key):
+    """``(user_id, is_active)`` for token ``key``, or None"""
+    return Token.objects.filter(key=key).values_list('user_id', 'user__is_active').first()
+
+
+def _user_from_entry(entry):
+    """
+    The token's user with only ``id`` and ``is_active`` loaded: the cache
+    never holds the password hash or profile. Any other field is fetched
+    from the database on first access.
+    """
+    user_id, is_active = entry
+    if not is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    User = get_user_model()
+    return User.from_db(DEFAULT_DB_ALIAS, [User._meta.pk.attname, 'is_active'], [user_id, is_active])
+
+
+def get_token_user(key):
+    """
+    Return the active user owning token ``key``, or raise AuthenticationFailed.
+    Successful lookups are cached for ``TOKEN_CACHE_SECONDS``.
+    """
+    cache_key = token_cache_key(key)
+    entry = cache.get(cache_key)
+    AUTH_CACHE.labels('miss' if entry is None else 'hit').inc()
+    if entry is None:
+        entry = _load_entry(key)
+        if entry is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        cache.set(cache_key, entry, settings.TOKEN_CACHE_SECONDS)
+    return _user_from_entry(entry)
+
+
+async def aget_token_user(key):
+    """Async version of get_token_user()"""
+    cache_key = token_cache_key(key)
+    entry = await cache.aget(cache_key)
+    AUTH_CACHE.labels('miss' if entry is None else 'hit').inc()
+    if entry is None:
+        entry = await Token.objects.filter(key=key).values_list('user_id', 'user__is_active').afirst()
+        if entry is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        await cache.aset(cache_key, entry, settings.TOKEN_CACHE_SECONDS)
+    return _user_from_entry(entry)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` that keeps the token-to-user mapping in the shared
+    cache, so most requests authenticate without touching the database.
+    Only the user's id and active flag are cached.
+
+    Entries are dropped by signal handlers when a token is deleted or
+    replaced and when its user is saved (which covers deactivation). Bulk
+    ``QuerySet.update()`` calls bypass those signals; the short
+    ``TOKEN_CACHE_SECONDS`` TTL bounds how long such changes go unnoticed.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        user = get_token_user(key)
+        return user, Token(key=key, user=user)
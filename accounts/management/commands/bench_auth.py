@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from accounts.authentication import CachedTokenAuthentication, invalidate_token
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the database queries and time spent authenticating an API '
+        'request with DRF TokenAuthentication and with CachedTokenAuthentication. '
+        'Uses a throwaway user, rolled back afterwards, unless --username is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests to authenticate per backend')
+        parser.add_argument('--username', type=str, default=None, help='Authenticate as this existing user')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                token = self.get_token(options['username'])
+                request = APIRequestFactory().get('/api/clothing-items/', HTTP_AUTHORIZATION=f'Token {token.key}')
+                invalidate_token(token.key)
+                self.stdout.write(f"Cache backend: {settings.CACHES['default']['BACKEND']}")
+                for backend in (TokenAuthentication(), CachedTokenAuthentication()):
+                    self.run(backend, request, options['requests'])
+                invalidate_token(token.key)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def get_token(self, username):
+        User = get_user_model()
+        if username is None:
+            user = User.objects.create_user(username='bench-auth', password=None)
+        else:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        token, _ = Token.objects.get_or_create(user=user)
+        return token
+
+    def run(self, backend, request, count):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                backend.authenticate(request)
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(type(backend).__name__))
+        self.stdout.write(f"  queries per request: {len(queries) / count:.3f} ({len(queries)} for {count} requests)")
+        self.stdout.write(f"  time per request:    {elapsed / count * 1e6:.0f} us")
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+
+
+@receiver([post_save, post_delete], sender=Token)
+def token_changed(sender, instance, **kwargs):
+    """Drop the cached user when a token is deleted or rotated."""
+    # After the commit: a lookup before then would cache the old row again
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_token(key))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, **kwargs):
+    """Drop cached copies of a user when it changes, e.g. is deactivated."""
+    if not created:
+        user_id = instance.pk
+        transaction.on_commit(lambda: invalidate_user_tokens(user_id))
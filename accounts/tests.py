@@ -1,3 +1,94 @@
-from django.test import TestCase
+"""
+Benchmarks of every route in accounts/urls.py.
 
-# Create your tests here.
+Logging in and registering are dominated by password hashing, so their
+latency mostly tracks the configured PASSWORD_HASHERS.
+"""
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.authentication import token_cache_key
+from config.benchmarks import EndpointBenchmark
+
+PASSWORD = 'correct-horse-battery'
+
+
+class AccountEndpointTests(EndpointBenchmark):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bench', password=PASSWORD)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_register(self):
+        numbers = count()
+
+        def register():
+            return self.client.post(
+                '/api/accounts/register/',
+                {'username': f'new-user-{next(numbers)}', 'password': PASSWORD},
+                format='json',
+            )
+        response = self.benchmark('POST accounts/register', register, queries=4, status=201)
+        token = Token.objects.get(user__username=response.data['user']['username'])
+        self.assertEqual(response.data['token'], token.key)
+
+    def test_login(self):
+        response = self.benchmark(
+            'POST accounts/login',
+            lambda: self.client.post(
+                '/api/accounts/login/', {'username': 'bench', 'password': PASSWORD}, format='json',
+            ),
+            queries=2,
+        )
+        self.assertEqual(response.data['user_id'], self.user.pk)
+
+    def test_login_invalid(self):
+        # Each 401 is logged as a warning
+        with self.assertLogs('django.request', 'WARNING'):
+            self.benchmark(
+                'POST accounts/login (wrong password)',
+                lambda: self.client.post(
+                    '/api/accounts/login/', {'username': 'bench', 'password': 'wrong'}, format='json',
+                ),
+                queries=1, status=401,
+            )
+
+    def test_init_superuser(self):
+        with self.assertQueryBudget(2):
+            self.client.get('/api/accounts/init-superuser/')
+        self.assertTrue(User.objects.filter(username='admin', is_superuser=True).exists())
+        # Every later call only checks for it
+        self.benchmark('GET accounts/init-superuser', lambda: self.client.get('/api/accounts/init-superuser/'), queries=1)
+
+
+class TokenCacheTests(EndpointBenchmark):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached', password=PASSWORD)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_only_id_and_active_flag_are_cached(self):
+        self.assertEqual(self.client.get('/api/health/').status_code, 200)
+        self.assertEqual(cache.get(token_cache_key(self.token.key)), (self.user.pk, True))
+
+    def test_deactivation_applies_after_commit(self):
+        self.client.get('/api/health/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # Still cached until the change is committed
+            self.assertIsNotNone(cache.get(token_cache_key(self.token.key)))
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get('/api/health/').status_code, 401)
@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with uvicorn workers under gunicorn, for example:
+
+    gunicorn -c gunicorn_config.py -k uvicorn.workers.UvicornWorker config.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +16,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Route the I/O-bound weather endpoints to their async views
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
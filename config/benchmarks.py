@@ -0,0 +1,124 @@
+"""
+Endpoint benchmarks for the test suite.
+
+``EndpointBenchmark.benchmark()`` runs one API request several times. It
+asserts an exact query budget on one run, so a new N+1 or a per-row save
+fails the test, and it records the latency percentiles of the other runs
+and the memory the request allocates. Each class prints its results as a
+table when it finishes; with ``BENCHMARK_REPORT`` set to a path they are
+also appended there as JSON lines, for comparing runs.
+
+``BENCHMARK_REPEAT`` sets the number of timed runs (default 10).
+"""
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+REPEAT = int(os.getenv('BENCHMARK_REPEAT', '10'))
+
+# SQLite logs BEGIN/COMMIT and PostgreSQL doesn't; budgets leave all of it out
+TRANSACTION_CONTROL = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.I)
+
+
+class EndpointBenchmark(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.report()
+        super().tearDownClass()
+
+    def setUp(self):
+        # Cached tokens, versions and features would otherwise leak between tests
+        cache.clear()
+
+    @contextmanager
+    def assertQueryBudget(self, queries):
+        """Like assertNumQueries(), leaving out transaction control statements"""
+        with CaptureQueriesContext(connection) as context:
+            yield
+        executed = [
+            query['sql'] for query in context.captured_queries
+            if not TRANSACTION_CONTROL.match(query['sql'])
+        ]
+        self.assertEqual(
+            len(executed), queries,
+            f"{len(executed)} queries executed, {queries} expected\n" + '\n'.join(executed),
+        )
+
+    def benchmark(self, name, request, queries, status=200, warmup=True):
+        """
+        Measure ``request``, a callable making one request with the test
+        client, asserting its status and that it runs exactly ``queries``
+        queries, not counting transaction control. The warm-up run fills
+        caches, as in a live process; pass ``warmup=False`` for requests
+        that can only succeed once.
+        """
+        if warmup:
+            request()
+        with self.assertQueryBudget(queries):
+            response = request()
+        self.assertEqual(response.status_code, status, getattr(response, 'data', response.content))
+
+        timings = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            request()
+            timings.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        try:
+            request()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.results.append({
+            'endpoint': name,
+            'queries': queries,
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'p95_ms': round(percentile(timings, 95) * 1000, 2),
+            'retained_kib': round(retained / 1024, 1),
+            'peak_kib': round(peak / 1024, 1),
+        })
+        return response
+
+    @classmethod
+    def report(cls):
+        if not cls.results:
+            return
+        width = max(len(result['endpoint']) for result in cls.results)
+        lines = [f"\n{cls.__name__} ({REPEAT} runs each)"]
+        lines.append(f"{'endpoint':<{width}}  queries    p50 ms    p95 ms  peak KiB")
+        for result in cls.results:
+            lines.append(
+                f"{result['endpoint']:<{width}}  {result['queries']:>7}  {result['p50_ms']:>8.2f}  "
+                f"{result['p95_ms']:>8.2f}  {result['peak_kib']:>8.1f}"
+            )
+        sys.stderr.write('\n'.join(lines) + '\n')
+
+        path = os.getenv('BENCHMARK_REPORT')
+        if path:
+            with open(path, 'a') as f:
+                for result in cls.results:
+                    f.write(json.dumps({'suite': cls.__name__, **result}) + '\n')
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * percent // 100) - 1)]
@@ -0,0 +1,124 @@
+"""
+Single-page app shell.
+
+The bundles the shell loads are read from the Vite build manifest
+(``FRONTEND_MANIFEST``), and ``index.html`` is rendered with them once into
+bytes that are kept for the life of the process. Serving the shell then does
+no filesystem or template work: it returns those bytes with an ETag,
+``Link`` preload headers for the bundles, and a 304 when the browser already
+has them. With DEBUG on, the manifest's mtime is checked per request so a
+frontend rebuild shows up without restarting the server.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.utils.cache import parse_etags
+from django.views import View
+
+from wardrobe.templatetags.frontend_assets import get_frontend_assets
+
+logger = logging.getLogger(__name__)
+
+# Vite writes manifest paths relative to its outDir, static/frontend
+STATIC_PREFIX = 'frontend/'
+
+
+def read_manifest(path):
+    """Return ``(scripts, stylesheets, preloads)`` static paths for the entry chunk"""
+    with open(path) as f:
+        manifest = json.load(f)
+    entry = next(chunk for chunk in manifest.values() if chunk.get('isEntry'))
+
+    scripts = [entry['file']]
+    stylesheets = list(entry.get('css', []))
+    preloads = []
+    pending = list(entry.get('imports', []))
+    seen = set()
+    while pending:
+        name = pending.pop(0)
+        if name in seen:
+            continue
+        seen.add(name)
+        chunk = manifest[name]
+        preloads.append(chunk['file'])
+        stylesheets.extend(css for css in chunk.get('css', []) if css not in stylesheets)
+        pending.extend(chunk.get('imports', []))
+
+    def prefixed(files):
+        return [STATIC_PREFIX + file for file in files]
+    return prefixed(scripts), prefixed(stylesheets), prefixed(preloads)
+
+
+class FrontendShell:
+    """The rendered SPA shell and its response headers, built once."""
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        # (manifest mtime, content, etag, link header), swapped atomically
+        self._state = None
+
+    def _manifest_mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime
+        except OSError:
+            return None
+
+    def get(self):
+        state = self._state
+        if state is None or (settings.DEBUG and self._manifest_mtime() != state[0]):
+            state = self._state = self.build()
+        return state
+
+    def build(self):
+        mtime = self._manifest_mtime()
+        try:
+            scripts, stylesheets, preloads = read_manifest(self.manifest_path)
+        except (OSError, ValueError, KeyError, StopIteration) as e:
+            # Builds without a manifest: find the bundles by name instead
+            logger.warning("Frontend manifest %s unusable (%s); scanning assets", self.manifest_path, e)
+            files = get_frontend_assets()
+            scripts = [file for file in files if file.endswith('.js')]
+            stylesheets = [file for file in files if file.endswith('.css')]
+            preloads = []
+
+        scripts, stylesheets, preloads = (
+            [static(file) for file in files] for files in (scripts, stylesheets, preloads)
+        )
+        content = render_to_string('index.html', {
+            'scripts': scripts,
+            'stylesheets': stylesheets,
+            'preloads': preloads,
+        }).encode()
+        etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+        link = ', '.join(
+            [f'<{url}>; rel=preload; as=style' for url in stylesheets]
+            + [f'<{url}>; rel=modulepreload' for url in scripts + preloads]
+        )
+        return mtime, content, etag, link
+
+
+shell = FrontendShell(settings.FRONTEND_MANIFEST)
+
+
+class FrontendView(View):
+    """Serve the SPA shell for every route the API doesn't handle."""
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request, *args, **kwargs):
+        _, content, etag, link = shell.get()
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='text/html; charset=utf-8')
+            if link:
+                response['Link'] = link
+        response['ETag'] = etag
+        # Always revalidate: the shell names the current bundles
+        response['Cache-Control'] = 'no-cache'
+        return response
@@ -0,0 +1,183 @@
+"""
+Serving of uploaded media files.
+
+Photos are private: a file is only served to a signed-in user, through the
+session or the ``media_token`` cookie. The SPA authenticates with a token
+header, which ``<img>`` requests cannot send, so ``MediaCookieMiddleware``
+(config.middleware) copies the token of each token-authenticated API
+request into an HttpOnly cookie scoped to ``MEDIA_URL``; it is checked with
+the same cached lookup as the header, so a deleted token stops working here
+too.
+
+Content-addressed files (see ``wardrobe.storage``) never change, so they are
+sent with a far-future immutable ``Cache-Control`` and their digest as ETag;
+other files get a short max-age and a size/mtime ETag. Both are ``private``
+so shared caches never keep them. Responses support conditional and
+single-range requests.
+
+When a front-end server is available the bytes do not pass through Django at
+all: with ``MEDIA_ACCEL_REDIRECT`` set, the response only carries an
+``X-Accel-Redirect`` to that nginx ``internal`` location, and with
+``MEDIA_SENDFILE`` it carries an ``X-Sendfile`` path for Apache/lighttpd.
+Otherwise, if ``MEDIA_SERVE_FILES`` allows it, the file is handed to the
+WSGI server's file wrapper, which gunicorn turns into a zero-copy
+``sendfile()`` but which still holds a worker for the whole transfer.
+Without any of the three, media is not served at all.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import parse_etags
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.authentication import get_token_user
+from wardrobe.storage import content_digest
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'private, max-age=3600'
+
+MEDIA_COOKIE = 'media_token'
+
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    Read-only view of ``length`` bytes of an open file, starting at its
+    current position. Exposes ``fileno()`` so servers can still sendfile().
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` inclusive for a single byte range, None to ignore it"""
+    match = RANGE_HEADER.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the final N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if end < start < size:
+        # e.g. "bytes=20-10": syntactically invalid, so ignored
+        return None
+    return start, end
+
+
+def media_user(request):
+    """The signed-in user from the session or the media cookie, or None"""
+    if request.user.is_authenticated:
+        return request.user
+    key = request.COOKIES.get(MEDIA_COOKIE)
+    if not key:
+        return None
+    try:
+        return get_token_user(key)
+    except AuthenticationFailed:
+        return None
+
+
+def set_media_cookie(response, key):
+    response.set_cookie(
+        MEDIA_COOKIE, key, max_age=settings.MEDIA_COOKIE_AGE, path=settings.MEDIA_URL,
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+def can_serve():
+    return bool(settings.MEDIA_ACCEL_REDIRECT or settings.MEDIA_SENDFILE or settings.MEDIA_SERVE_FILES)
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT to a signed-in user"""
+    if not can_serve():
+        raise Http404('Media is not served here')
+    if media_user(request) is None:
+        raise PermissionDenied
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404('File not found')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('File not found')
+
+    digest = content_digest(path)
+    if digest:
+        etag = f'"{digest}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{file_stat.st_size:x}-{int(file_stat.st_mtime):x}"'
+        cache_control = MUTABLE_CACHE_CONTROL
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_ACCEL_REDIRECT:
+        # nginx handles Range and conditional requests itself
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + quote(path)
+    elif settings.MEDIA_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = file_response(request, full_path, file_stat.st_size, content_type, etag)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def file_response(request, full_path, size, content_type, etag):
+    byte_range = None
+    if 'Range' in request.headers:
+        # A stale If-Range means the client's partial copy is outdated
+        if_range = request.headers.get('If-Range')
+        if if_range is None or if_range == etag:
+            byte_range = parse_range(request.headers['Range'], size)
+            if byte_range is not None and byte_range[0] >= size:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(RangeFile(file, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
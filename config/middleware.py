@@ -1,35 +1,271 @@
 import re
 import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
-from django.middleware.csrf import CsrfViewMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.authtoken.models import Token
+
+from . import metrics, replicas
+from .media import MEDIA_COOKIE, set_media_cookie
+from .timing import RequestTiming, current_timing, time_query
 
 logger = logging.getLogger(__name__)
 
-class RequestLoggingMiddleware:
+# Headers whose values never reach the logs
+REDACTED_HEADERS = frozenset({'authorization', 'cookie', 'x-csrftoken'})
+
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so the
+    async handler never has to hop to a thread to call it.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+def redact_headers(headers):
+    return {
+        name: '[redacted]' if name.lower() in REDACTED_HEADERS else value
+        for name, value in headers.items()
+    }
+
+
+class RequestLoggingMiddleware(AsyncCapableMiddleware):
+    """Logs each request at DEBUG; costs one level check when that is off."""
 
     def __call__(self, request):
-        # Log request details
-        logger.debug(f"Request path: {request.path}")
-        logger.debug(f"Request method: {request.method}")
-        logger.debug(f"Request headers: {dict(request.headers)}")
-        logger.debug(f"Authorization header: {request.headers.get('Authorization')}")
-        
-        response = self.get_response(request)
-        return response
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Request %s %s headers=%s",
+                request.method, request.path, redact_headers(request.headers),
+            )
+        # A coroutine in async mode, which the handler awaits
+        return self.get_response(request)
+
+
+class CsrfExemptMiddleware(AsyncCapableMiddleware):
+    """Skips CSRF checks for paths matching ``CSRF_EXEMPT_URLS``."""
 
-class CsrfExemptMiddleware:
     def __init__(self, get_response):
-        self.get_response = get_response
+        patterns = getattr(settings, 'CSRF_EXEMPT_URLS', [])
+        if not patterns:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        # One precompiled alternation instead of a re.match per pattern
+        self.exempt_urls = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
 
     def __call__(self, request):
-        # Check if the request path matches any of the exempt URLs
         path = request.path_info
         # Remove double api if present
-        path = re.sub(r'^/api/api/', '/api/', path)
-        for pattern in settings.CSRF_EXEMPT_URLS:
-            if re.match(pattern, path):
-                setattr(request, '_dont_enforce_csrf_checks', True)
-                break
-        return self.get_response(request) 
\ No newline at end of file
+        if path.startswith('/api/api/'):
+            path = path[4:]
+        if self.exempt_urls.match(path):
+            request._dont_enforce_csrf_checks = True
+        return self.get_response(request)
+
+
+def install_query_timer(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class ServerTimingMiddleware(AsyncCapableMiddleware):
+    """
+    Adds a ``Server-Timing`` header splitting each response's server time
+    into middleware (``mw``), authentication, view, database and rendering
+    phases, so browser devtools show where latency goes. Enabled by the
+    ``SERVER_TIMING`` setting; list it first in ``MIDDLEWARE`` so ``mw``
+    covers the whole middleware stack.
+    """
+    DESCRIPTIONS = {
+        'mw': 'middleware',
+        'db': 'queries: {count}',
+        'render': 'serialization',
+    }
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        connection_created.connect(install_query_timer)
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timing, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(timing, response)
+
+    async def __acall__(self, request):
+        timing, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(timing, response)
+
+    def start(self):
+        timing = RequestTiming()
+        timing.enter('mw')
+        return timing, current_timing.set(timing)
+
+    def finish(self, timing, response):
+        timing.finish()
+        total = sum(timing.durations.values())
+        response['Server-Timing'] = f'{timing.header(self.DESCRIPTIONS)}, total;dur={total * 1000:.1f}'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.enter('view')
+        return None
+
+    def process_template_response(self, request, response):
+        # Called between the view returning a DRF/template response and its
+        # rendering, which the handler does next
+        timing = current_timing.get()
+        if timing is not None and timing.current() == 'view':
+            timing.exit()
+            timing.enter('render')
+            response.add_post_render_callback(lambda rendered: timing.exit())
+        return response
+
+
+def install_query_counter(connection, **kwargs):
+    if metrics.count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.count_query)
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Records each request's latency, status, database queries and time per
+    route for ``/metrics`` (see config.metrics), plus requests in flight.
+    Enabled by ``METRICS_ENABLED``; list it first in ``MIDDLEWARE`` so the
+    latency covers the other middleware too.
+    """
+    METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        connection_created.connect(install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started, token = self.start()
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(request, response, started, token)
+        return response
+
+    async def __acall__(self, request):
+        started, token = self.start()
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(request, response, started, token)
+        return response
+
+    def start(self):
+        metrics.IN_FLIGHT.inc()
+        return time.perf_counter(), metrics.request_queries.set([0, 0.0])
+
+    def finish(self, request, response, started, token):
+        elapsed = time.perf_counter() - started
+        queries, db_time = metrics.request_queries.get()
+        metrics.request_queries.reset(token)
+        metrics.IN_FLIGHT.dec()
+
+        match = request.resolver_match
+        route = match.view_name if match is not None else 'unmatched'
+        # Clients can send any method name; keep the label set bounded
+        method = request.method if request.method in self.METHODS else 'other'
+        # An exception escaping here becomes a 500 further up
+        status = str(response.status_code) if response is not None else '500'
+        metrics.REQUEST_LATENCY.labels(route, method).observe(elapsed)
+        metrics.RESPONSES.labels(route, method, status).inc()
+        metrics.DB_QUERIES.labels(route).observe(queries)
+        metrics.DB_TIME.labels(route).observe(db_time)
+
+
+class MediaCookieMiddleware(AsyncCapableMiddleware):
+    """
+    Gives clients that authenticate with a token header the ``media_token``
+    cookie that lets their browser load photos (see config.media). Set only
+    when missing or for another token, so most responses are untouched.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        # DRF copies the authenticated token onto the underlying request
+        token = getattr(request, 'auth', None)
+        if isinstance(token, Token) and request.COOKIES.get(MEDIA_COOKIE) != token.key:
+            set_media_cookie(response, token.key)
+        return response
+
+
+class ReplicaPinningMiddleware(AsyncCapableMiddleware):
+    """
+    Sets up read-replica routing for each request (see config.replicas) and,
+    when the request wrote, keeps its user's reads on the primary for
+    ``REPLICA_PIN_SECONDS``. Enabled by ``DATABASE_REPLICAS``; list it after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        routing = replicas.RequestRouting(request)
+        token = replicas.request_routing.set(routing)
+        try:
+            return self.get_response(request)
+        finally:
+            replicas.request_routing.reset(token)
+            # Also after an error: whatever was committed is on the primary only
+            if routing.wrote:
+                replicas.pin(getattr(request, 'user', None))
+
+    async def __acall__(self, request):
+        routing = replicas.RequestRouting(request)
+        token = replicas.request_routing.set(routing)
+        try:
+            return await self.get_response(request)
+        finally:
+            replicas.request_routing.reset(token)
+            if routing.wrote:
+                await replicas.apin(getattr(request, 'user', None))
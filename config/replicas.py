@@ -0,0 +1,110 @@
+"""
+Read-replica routing.
+
+``ReplicaRouter`` sends the ORM reads of safe (GET, HEAD, OPTIONS) requests
+to one of the aliases in ``DATABASE_REPLICAS``, picked once per request,
+and every write to ``default``. Replicas lag the primary, so reads go to
+the primary instead:
+
+- for the rest of a request once it has written, and for every unsafe
+  request;
+- for ``REPLICA_PIN_SECONDS`` after a request by the same user wrote. The
+  pin lives in the shared cache, so it holds whichever worker serves the
+  user next;
+- always for tokens, users, sessions and database cache rows, so a token
+  created a moment ago authenticates.
+
+Queries outside a request (management commands, the shell) use the
+primary. ReplicaPinningMiddleware (config.middleware) sets up the state the
+router reads for each request; with no replicas configured neither does
+anything.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_CACHE_KEY = 'db:pin:{user_id}'
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# Authentication and cache rows: read where they are written
+PRIMARY_APPS = frozenset({'auth', 'authtoken', 'sessions', 'django_cache'})
+
+# The current request's RequestRouting, set by ReplicaPinningMiddleware
+request_routing = ContextVar('request_routing', default=None)
+
+
+class RequestRouting:
+    """Where the current request's reads go"""
+    __slots__ = ('request', 'replica', 'pinned', 'wrote')
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = random.choice(settings.DATABASE_REPLICAS)
+        # For safe requests, decided by the user's pin at the first read, by
+        # which time authentication has run
+        self.pinned = None if request.method in SAFE_METHODS else True
+        self.wrote = False
+
+    def read_alias(self):
+        if self.pinned is None:
+            self.pinned = is_pinned(getattr(self.request, 'user', None))
+        return 'default' if self.pinned else self.replica
+
+
+def pin_cache_key(user):
+    if user is None or not user.is_authenticated:
+        return None
+    return PIN_CACHE_KEY.format(user_id=user.pk)
+
+
+def is_pinned(user):
+    key = pin_cache_key(user)
+    return key is not None and cache.get(key) is not None
+
+
+def pin(user):
+    """Keep ``user``'s reads on the primary for ``REPLICA_PIN_SECONDS``"""
+    key = pin_cache_key(user)
+    if key is not None:
+        cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+
+
+async def apin(user):
+    """Async version of pin()"""
+    key = pin_cache_key(user)
+    if key is not None:
+        await cache.aset(key, True, settings.REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = request_routing.get()
+        if routing is None or model._meta.app_label in PRIMARY_APPS:
+            return None
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        routing = request_routing.get()
+        if routing is None:
+            return None
+        if model._meta.app_label not in PRIMARY_APPS:
+            routing.wrote = True
+            routing.pinned = True
+        # Explicitly, or saving an instance read from a replica would write there
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every replica holds the primary's rows
+        aliases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -18,11 +18,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'django_filters',
     'corsheaders',
+    'accounts',
     'wardrobe',
 ]
 
 MIDDLEWARE = [
+    'config.middleware.MetricsMiddleware',
+    'config.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -30,6 +34,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.middleware.ReplicaPinningMiddleware',
+    'config.middleware.MediaCookieMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,13 +85,40 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# `npm run build` in src/frontend writes to src/static/frontend (outDir in
+# vite.config.ts). It comes first so the current build wins over older
+# copies of the same files in static/.
+FRONTEND_BUILD_DIR = BASE_DIR / 'src' / 'static'
 STATICFILES_DIRS = [
+    FRONTEND_BUILD_DIR,
     BASE_DIR / 'static',
 ]
+# Vite build manifest naming the bundles the SPA shell loads
+FRONTEND_MANIFEST = FRONTEND_BUILD_DIR / 'frontend' / 'build-manifest.json'
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Uploads are named by content hash, deduplicated and cached as immutable
+STORAGES = {
+    'default': {
+        'BACKEND': 'wardrobe.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Hand media bytes to a front-end server instead of sending them from Django:
+# an nginx internal location for X-Accel-Redirect (e.g. "/protected-media/"),
+# or X-Sendfile for Apache/lighttpd
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', 'False') == 'True'
+# Without either of those, stream media from the Django worker itself
+MEDIA_SERVE_FILES = os.getenv('MEDIA_SERVE_FILES', 'True') == 'True'
+# Lifetime of the cookie that lets browsers load photos (see config/media.py)
+MEDIA_COOKIE_AGE = int(os.getenv('MEDIA_COOKIE_AGE', 30 * 24 * 3600))
+# Background threads per process resizing uploaded photos; 0 resizes inline
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -93,10 +126,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-} 
\ No newline at end of file
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+} 
+
+# Serve the I/O-bound weather endpoints from async views. Enabled
+# automatically by config/asgi.py; leave off for WSGI deployments.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Add a Server-Timing header with per-phase request timings (mw, auth, view,
+# db, render). Exposes server internals, so only enable it while profiling.
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False') == 'True'
+
+# Prometheus metrics at /metrics (see config/metrics.py). When METRICS_TOKEN
+# is set, scrapers must send it as "Authorization: Bearer <token>";
+# production turns metrics off without one.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Read replicas (see config/replicas.py): database aliases that safe
+# requests read from. The settings module for the environment defines the
+# aliases. A user's reads stay on the primary for REPLICA_PIN_SECONDS after
+# they write, which should exceed the usual replication lag.
+DATABASE_ROUTERS = ['config.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
+# Cache
+# Local memory is per process; production points this at a cache shared by
+# all gunicorn workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# How long an API token's user is cached before it is re-read from the database
+TOKEN_CACHE_SECONDS = int(os.getenv('TOKEN_CACHE_SECONDS', 60))
+
+# Days deletions are kept for the ?since= sync feed; older tokens must reload
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 90))
+# Rows per ?since= response; clients follow has_more for the rest
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+
+# Weather provider
+OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
+OPENWEATHER_URL = os.getenv('OPENWEATHER_URL', 'https://api.openweathermap.org/data/2.5')
+WEATHER_LOCATION = os.getenv('WEATHER_LOCATION', '')  # e.g. "San Francisco,US"
+WEATHER_FRESH_SECONDS = int(os.getenv('WEATHER_FRESH_SECONDS', 600))
+WEATHER_STALE_SECONDS = int(os.getenv('WEATHER_STALE_SECONDS', 3600))
+# Upstream calls must finish well inside gunicorn's 30 s worker timeout
+WEATHER_CONNECT_TIMEOUT = float(os.getenv('WEATHER_CONNECT_TIMEOUT', 2))
+WEATHER_READ_TIMEOUT = float(os.getenv('WEATHER_READ_TIMEOUT', 4))
+WEATHER_MAX_RETRIES = int(os.getenv('WEATHER_MAX_RETRIES', 2))
+# Total seconds for a call, retries and backoff included
+WEATHER_DEADLINE = float(os.getenv('WEATHER_DEADLINE', 10))
+WEATHER_BREAKER_THRESHOLD = int(os.getenv('WEATHER_BREAKER_THRESHOLD', 5))
+WEATHER_BREAKER_RESET_SECONDS = int(os.getenv('WEATHER_BREAKER_RESET_SECONDS', 30))
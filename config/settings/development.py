@@ -19,12 +19,15 @@ DATABASES = {
     }
 }
 
+# A second alias on the same file for trying read-replica routing locally:
+# DATABASE_REPLICAS=replica sends safe requests' reads to it. Being the same
+# database it never lags; the tests use it as a mirror of default.
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in os.getenv('DATABASE_REPLICAS', '').split(',') if alias]
+
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_DIRS = [
-    BASE_DIR / 'static',
-]
 
 # Media files
 MEDIA_URL = '/media/'
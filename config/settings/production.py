@@ -10,22 +10,90 @@ SECRET_KEY = os.environ.get('SECRET_KEY')
 # SECURITY WARNING: set this to your domain name in production!
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '.onrender.com').split(',')
 # Database
+# With PostgreSQL each worker process keeps a psycopg connection pool
+# (Django's native pool, psycopg >= 3). A request borrows a connection and
+# returns it when it finishes, so each database (the primary and every
+# replica) sees at most workers x DATABASE_POOL_MAX_SIZE connections however
+# many threads or requests are in flight; requests beyond that wait up to
+# DATABASE_POOL_TIMEOUT seconds. gunicorn_config.py sizes the pool to the
+# worker's concurrency. With health checks on, the pool tests each
+# connection before lending it, so a connection the server dropped is
+# replaced instead of failing a request. Pooling is incompatible with
+# persistent connections, so CONN_MAX_AGE is 0 when it is on.
+DATABASE_POOL = os.environ.get('DATABASE_POOL', 'True') == 'True'
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600
+        conn_max_age=600,
+        conn_health_checks=True,
     )
 }
+DATABASE_POOL_OPTIONS = {
+    'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 1)),
+    'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 4)),
+    'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+    # Close idle connections above min_size, and recycle every connection
+    # now and then so server-side memory doesn't build up
+    'max_idle': 300,
+    'max_lifetime': 1800,
+}
+
+# Read replicas, one alias (replica1, replica2, ...) per comma-separated
+# URL; see config/replicas.py
+DATABASE_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dj_database_url.parse(
+        url.strip(), conn_max_age=600, conn_health_checks=True, test_options={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+if DATABASE_POOL:
+    for database in DATABASES.values():
+        if database.get('ENGINE') == 'django.db.backends.postgresql':
+            database['CONN_MAX_AGE'] = 0
+            database.setdefault('OPTIONS', {})['pool'] = dict(DATABASE_POOL_OPTIONS)
+
+# Cache shared by all gunicorn workers: Redis when available, otherwise
+# the database cache table (created by `manage.py createcachetable`).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
 
 # Static files (CSS, JavaScript, Images)
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STORAGES = {
+    **STORAGES,
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 WHITENOISE_MIMETYPES = {
     '.js': 'application/javascript',
     '.mjs': 'application/javascript',
     '.css': 'text/css',
 }
 
+# Media is only served through a front-end server's X-Accel-Redirect or
+# X-Sendfile hand-off (MEDIA_ACCEL_REDIRECT / MEDIA_SENDFILE), so no gunicorn
+# worker is held for a photo download. Set MEDIA_SERVE_FILES=True to stream
+# from the workers instead.
+MEDIA_SERVE_FILES = os.environ.get('MEDIA_SERVE_FILES', 'False') == 'True'
+
+# /metrics describes every route's traffic, so it is never public here:
+# without METRICS_TOKEN the endpoint and the recording behind it are off
+METRICS_ENABLED = METRICS_ENABLED and bool(METRICS_TOKEN)
+
 # Security settings
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -123,23 +191,17 @@ LOGGING = {
         },
         'config.middleware': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            # DEBUG logs every request's (redacted) headers
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
     },
 }
 
-# Add WhiteNoise middleware at the top, right after security middleware
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'corsheaders.middleware.CorsMiddleware',
-    'django.middleware.common.CommonMiddleware',
+# Base's middleware, plus request logging and the CSRF exemptions above
+# ahead of the CSRF check
+_csrf = MIDDLEWARE.index('django.middleware.csrf.CsrfViewMiddleware')
+MIDDLEWARE = MIDDLEWARE[:_csrf] + [
     'config.middleware.RequestLoggingMiddleware',
     'config.middleware.CsrfExemptMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-] 
\ No newline at end of file
+] + MIDDLEWARE[_csrf:] 
@@ -0,0 +1,82 @@
+"""
+Per-request phase timing reported in the ``Server-Timing`` response header.
+
+``ServerTimingMiddleware`` starts a ``RequestTiming`` for each request and
+stores it in a context variable, so code anywhere in the request (including
+ORM calls run in a thread by async views) can attribute time to a phase with
+``timed('name')``. Phases nest and are exclusive: time spent in a nested
+phase is subtracted from the enclosing one, so the reported phases add up to
+the total. Everything here is a no-op unless ``SERVER_TIMING`` is enabled.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+current_timing = ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    """Exclusive wall time and entry count for each phase of one request."""
+
+    __slots__ = ('durations', 'counts', '_stack')
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        # [name, started_at, time spent in nested phases]
+        self._stack = []
+
+    def enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, started_at, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started_at
+        self.durations[name] = self.durations.get(name, 0.0) + elapsed - nested
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def current(self):
+        return self._stack[-1][0] if self._stack else None
+
+    def finish(self):
+        """Close every phase still open, e.g. after a view raised"""
+        while self._stack:
+            self.exit()
+
+    def header(self, descriptions=None):
+        descriptions = descriptions or {}
+        metrics = []
+        for name, duration in self.durations.items():
+            metric = f'{name};dur={duration * 1000:.1f}'
+            if name in descriptions:
+                metric += f';desc="{descriptions[name].format(count=self.counts[name])}"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timed(name):
+    """Attribute the enclosed block to phase ``name`` of the current request"""
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    timing.enter(name)
+    try:
+        yield
+    finally:
+        timing.exit()
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper recording queries in the ``db`` phase"""
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    timing.enter('db')
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.exit()
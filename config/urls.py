@@ -16,26 +16,20 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.views.generic import TemplateView
 from django.conf import settings
-from django.conf.urls.static import static
-from wardrobe.templatetags.frontend_assets import get_frontend_assets
 from accounts.views import create_initial_superuser
-
-class FrontendView(TemplateView):
-    template_name = 'index.html'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['static_files'] = get_frontend_assets()
-        return context
+from .frontend import FrontendView
+from .media import serve_media
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('wardrobe.urls')),
     path('api/accounts/', include('accounts.urls')),
     path('init-superuser/', create_initial_superuser),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('metrics', metrics_view, name='metrics'),
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media),
+]
 
 # Serve frontend for all other routes
 urlpatterns += [
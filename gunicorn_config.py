@@ -1,16 +1,117 @@
+"""
+Gunicorn configuration.
+
+Start the server with just the config file; the application is chosen by
+the serving profile:
+
+    gunicorn -c gunicorn_config.py
+
+Profiles are selected with GUNICORN_PROFILE:
+
+    sync     One request per worker process (config.wsgi). Default.
+    gthread  GUNICORN_THREADS threads per worker process (config.wsgi); good
+             for the I/O-bound weather endpoints at a low memory cost.
+    async    uvicorn workers serving config.asgi. The weather and suggestion
+             endpoints then run as async views, so each worker keeps many
+             upstream weather calls in flight. Every other endpoint is a
+             sync DRF view, which Django runs on the worker's single
+             thread_sensitive thread: a worker serves one of those at a
+             time, like a sync worker. The profile therefore defaults to
+             the sync profile's worker count, trading the same memory for
+             the same sync throughput; lower WEB_CONCURRENCY only when
+             traffic is mostly the async endpoints.
+
+Other knobs (all optional):
+
+    WEB_CONCURRENCY               worker processes (default depends on profile)
+    GUNICORN_THREADS              threads per worker for gthread (default 4)
+    GUNICORN_PRELOAD              load Django once in the master and fork
+                                  workers from it (default True)
+    GUNICORN_MAX_REQUESTS         recycle a worker after this many requests
+                                  (default 1000, 0 disables)
+    GUNICORN_MAX_REQUESTS_JITTER  random extra requests per worker so they do
+                                  not all restart together (default 100)
+    GUNICORN_REPORT_EVERY         log a memory/latency report per worker every
+                                  N requests (default 500, 0 disables)
+    DATABASE_POOL_MAX_SIZE        pooled PostgreSQL connections per worker
+                                  (default: 1 for sync, GUNICORN_THREADS for
+                                  gthread, 2 for async)
+    PROMETHEUS_MULTIPROC_DIR      where workers keep their /metrics values
+                                  (default closet_app_metrics in the temp dir)
+
+With preloading, the master imports Django, DRF and the project once and
+calls gc.freeze() before forking, so the imported objects stay in pages
+shared copy-on-write by every worker instead of being copied when the
+garbage collector touches them.
+
+Compare profiles with `manage.py bench_serving` against the same endpoint
+and use the per-worker reports to size instances. The reports come from
+gunicorn's request hooks, which uvicorn workers do not run; measure the async
+profile with bench_serving instead.
+"""
+import gc
+import glob
 import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+PROFILE = os.environ.get('GUNICORN_PROFILE', 'sync')
+CPU_COUNT = multiprocessing.cpu_count()
+
+if PROFILE == 'async':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Sync views share one thread per worker, so size like the sync profile
+    default_workers = CPU_COUNT * 2 + 1
+    # Sync views and the async views' ORM calls share that thread
+    default_pool_size = 2
+elif PROFILE == 'gthread':
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+    default_workers = CPU_COUNT + 1
+    default_pool_size = threads
+elif PROFILE == 'sync':
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'sync'
+    default_workers = CPU_COUNT * 2 + 1
+    default_pool_size = 1
+else:
+    raise RuntimeError(f"Unknown GUNICORN_PROFILE {PROFILE!r}; use sync, gthread or async")
 
 # Server socket
-bind = "0.0.0.0:8000"
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
-worker_connections = 1000
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers))
 timeout = 30
 keepalive = 2
 
+# Worker recycling bounds memory growth from fragmentation
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Load the application in the master so workers share its memory
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# One pooled database connection per request a worker serves at once (see
+# config/settings/production.py)
+os.environ.setdefault('DATABASE_POOL_MAX_SIZE', str(default_pool_size))
+
+REPORT_EVERY = int(os.environ.get('GUNICORN_REPORT_EVERY', 500))
+
+# Every process writes its metrics to files here and /metrics sums them (see
+# config/metrics.py). prometheus_client reads the variable when imported, so
+# it must be set before the app is loaded.
+METRICS_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'closet_app_metrics')
+)
+os.makedirs(METRICS_DIR, exist_ok=True)
+
 # Logging
 accesslog = '-'
 errorlog = '-'
@@ -29,4 +130,112 @@ tmp_upload_dir = None
 
 # SSL
 keyfile = None
-certfile = None 
\ No newline at end of file
+certfile = None
+
+
+def _close_db_connections():
+    if 'django' not in sys.modules:
+        return
+    from django.db import connections
+    connections.close_all()
+    # A connection pool's sockets and threads must not be shared across a
+    # fork; each worker opens its own pool on first use
+    for connection in connections.all(initialized_only=True):
+        if connection.vendor == 'postgresql' and connection.settings_dict['OPTIONS'].get('pool'):
+            connection.close_pool()
+
+
+def on_starting(server):
+    # Files left by a previous run would be added to this run's totals. Only
+    # prometheus_client's own files go, in case the directory is shared.
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.db')):
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported. Close any
+    # connection opened during import so no worker inherits its socket, then
+    # move every existing object into the permanent GC generation so
+    # collections in the workers never write to (and un-share) those pages.
+    _close_db_connections()
+    gc.collect()
+    gc.freeze()
+    server.log.info("Serving profile %s with %s workers (preload=%s)", PROFILE, workers, preload_app)
+
+
+def post_fork(server, worker):
+    # Each worker opens its own database connections
+    _close_db_connections()
+    # Workers would otherwise share the master's random state, making retry
+    # jitter identical across processes
+    random.seed()
+
+
+class WorkerStats:
+    """Request latencies and memory use of the current worker process."""
+
+    def __init__(self):
+        self.requests = 0
+        self.latencies = []
+
+    def record(self, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+
+    def memory(self):
+        """Resident, proportional and private memory in MB, from /proc when available"""
+        fields = {}
+        try:
+            with open('/proc/self/smaps_rollup') as f:
+                for line in f:
+                    name, _, value = line.partition(':')
+                    if value.strip().endswith('kB'):
+                        fields[name] = int(value.split()[0])
+        except OSError:
+            import resource
+            return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+        private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+        return {
+            'rss': fields.get('Rss', 0) / 1024,
+            'pss': fields.get('Pss', 0) / 1024,
+            'private': private / 1024,
+        }
+
+    def report(self, log, reason):
+        memory = ' '.join(f"{name}={value:.1f}MB" for name, value in self.memory().items())
+        latency = ''
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            p50 = ordered[len(ordered) // 2]
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            latency = f" p50={p50 * 1000:.1f}ms p95={p95 * 1000:.1f}ms window={len(ordered)}"
+        log.info("Worker %s %s: requests=%s %s%s", os.getpid(), reason, self.requests, memory, latency)
+        self.latencies = []
+
+
+worker_stats = WorkerStats()
+
+
+def pre_request(worker, req):
+    req.started_at = time.perf_counter()
+
+
+def post_request(worker, req, environ, resp):
+    started_at = getattr(req, 'started_at', None)
+    if started_at is None:
+        return
+    worker_stats.record(time.perf_counter() - started_at)
+    if REPORT_EVERY and worker_stats.requests % REPORT_EVERY == 0:
+        worker_stats.report(worker.log, 'report')
+
+
+def worker_exit(server, worker):
+    worker_stats.report(server.log, 'exit')
+
+
+def child_exit(server, worker):
+    # Runs in the master: drop the dead worker's live gauges (in-flight
+    # requests); its counters and histograms keep counting in the totals
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
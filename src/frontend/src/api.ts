@@ -1,5 +1,8 @@
 import axios from 'axios';
-import { ClothingItem, WearLog, WeatherSuggestion, Weather } from './types';
+import {
+  ClothingItem, WearLog, WeatherSuggestion, Weather, PaginatedResponse, WearLogQuery, WearCalendar,
+  SyncFeed, ClothingItemFacets, ClothingItemFilters,
+} from './types';
 import { API_BASE_URL, AUTH_BASE_URL } from './config';
 
 // Create a separate instance for auth requests
@@ -131,21 +134,89 @@ api.interceptors.response.use(
   }
 );
 
+const ITEM_SYNC_KEY = 'clothingItemSync';
+
+interface ItemSyncState {
+  authToken: string | null;
+  token: string;
+  items: ClothingItem[];
+}
+
+const readItemSync = (authToken: string | null): ItemSyncState | null => {
+  try {
+    const state: ItemSyncState | null = JSON.parse(localStorage.getItem(ITEM_SYNC_KEY) || 'null');
+    return state && state.authToken === authToken ? state : null;
+  } catch {
+    return null;
+  }
+};
+
+// Items are cached in localStorage and kept current through the `?since=`
+// changes feed, so a reload only transfers what changed since the last one
 export const getClothingItems = async (): Promise<ClothingItem[]> => {
   try {
     console.log('Fetching clothing items...');
-    const token = localStorage.getItem('authToken');
-    console.log('Current token:', token);
-    
-    const response = await api.get('/clothing-items/');
-    console.log('Clothing items response:', response.data);
-    return response.data;
+    const authToken = localStorage.getItem('authToken');
+    const cached = readItemSync(authToken);
+
+    const fetchFeed = async (since: string): Promise<SyncFeed<ClothingItem>> =>
+      (await api.get('/clothing-items/', { params: { since } })).data;
+
+    let base = cached ? cached.items : [];
+    let feed: SyncFeed<ClothingItem>;
+    try {
+      feed = await fetchFeed(cached ? cached.token : '0');
+    } catch (error) {
+      if (!cached || !axios.isAxiosError(error) || error.response?.status !== 410) throw error;
+      // Too old for the server's deletion history: start over
+      base = [];
+      feed = await fetchFeed('0');
+    }
+
+    const byId = new Map<number, ClothingItem>(base.map(item => [item.id, item]));
+    for (;;) {
+      feed.deleted.forEach(id => byId.delete(id));
+      feed.changed.forEach(item => byId.set(item.id, item));
+      if (!feed.has_more) break;
+      // Long feeds come in pages, each token resuming after the last row
+      feed = await fetchFeed(feed.token);
+    }
+    const items = Array.from(byId.values()).sort(
+      (a, b) => b.created_at.localeCompare(a.created_at) || b.id - a.id
+    );
+
+    localStorage.setItem(ITEM_SYNC_KEY, JSON.stringify({ authToken, token: feed.token, items }));
+    console.log('Clothing items response:', items);
+    return items;
   } catch (error) {
     console.error('Error fetching clothing items:', error);
     throw error;
   }
 };
 
+// Ids of the items matching `filters`, filtered server-side, with the facet
+// counts for every attribute. Only ids are transferred: the items themselves
+// come from getClothingItems()'s synced copy. `ids` is null without filters.
+export const filterClothingItems = async (
+  filters: ClothingItemFilters,
+): Promise<{ ids: Set<number> | null; facets: ClothingItemFacets }> => {
+  const params = Object.fromEntries(Object.entries(filters).filter(([, value]) => value));
+  const filtered = Object.keys(params).length !== 0;
+  let response = await api.get('/clothing-items/', {
+    params: { ...params, fields: 'id', page_size: filtered ? 200 : 1 },
+  });
+  const facets: ClothingItemFacets = response.data.facets;
+  if (!filtered) return { ids: null, facets };
+
+  const ids = new Set<number>();
+  for (;;) {
+    response.data.results.forEach((item: { id: number }) => ids.add(item.id));
+    if (!response.data.next) break;
+    response = await api.get(response.data.next);
+  }
+  return { ids, facets };
+};
+
 export interface ClothingItemFormData {
   name: string;
   category: string;
@@ -192,8 +263,21 @@ export const deleteClothingItem = async (id: number): Promise<void> => {
   await api.delete(`/clothing-items/${id}/`);
 };
 
-export const getWearLogs = async (): Promise<WearLog[]> => {
-  const response = await api.get('/wear-logs/');
+// One page of wear history, newest first. Pass the previous page's `next`
+// URL as `cursor` to continue; `query` only applies to the first page.
+export const getWearLogs = async (
+  query: WearLogQuery = {},
+  cursor?: string | null,
+): Promise<PaginatedResponse<WearLog>> => {
+  const response = cursor
+    ? await api.get(cursor)
+    : await api.get('/wear-logs/', { params: query });
+  return response.data;
+};
+
+// `month` is YYYY-MM; the server defaults to the current month
+export const getWearCalendar = async (month?: string): Promise<WearCalendar> => {
+  const response = await api.get('/wear-logs/calendar/', { params: month ? { month } : {} });
   return response.data;
 };
 
@@ -19,20 +19,39 @@ const HistoryLog = (): JSX.Element => {
   const [showDeleteModal, setShowDeleteModal] = useState(false);
   const [selectedLogId, setSelectedLogId] = useState<number | null>(null);
   const [expandedLogs, setExpandedLogs] = useState<Set<number>>(new Set());
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchLogs();
   }, []);
 
+  // Only the most recent page is loaded up front; older history is fetched
+  // page by page through the cursor
   const fetchLogs = async (): Promise<void> => {
     try {
-      const fetchedLogs = await getWearLogs();
-      setLogs(fetchedLogs);
+      const page = await getWearLogs();
+      setLogs(page.results as WearLogWithId[]);
+      setNextCursor(page.next);
     } catch (error) {
       console.error('Error fetching logs:', error);
     }
   };
 
+  const loadMore = async (): Promise<void> => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await getWearLogs({}, nextCursor);
+      setLogs(prevLogs => [...prevLogs, ...(page.results as WearLogWithId[])]);
+      setNextCursor(page.next);
+    } catch (error) {
+      console.error('Error fetching logs:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (logId: number): Promise<void> => {
     try {
       await deleteWearLog(logId);
@@ -188,6 +207,16 @@ const HistoryLog = (): JSX.Element => {
             </div>
           ))}
         </div>
+
+        {nextCursor && (
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="self-center px-4 py-2 text-sm font-medium text-gray-700 bg-white border border-gray-300 rounded-md hover:bg-gray-50 disabled:opacity-50 dark:bg-gray-700 dark:text-white dark:border-gray-600 dark:hover:bg-gray-600"
+          >
+            {loadingMore ? 'Loading...' : 'Load older logs'}
+          </button>
+        )}
       </div>
 
       <ConfirmationModal
@@ -1,13 +1,16 @@
 import React, { useState, useEffect, Fragment } from 'react';
 import { PlusIcon, TrashIcon, MagnifyingGlassIcon, FunnelIcon, XMarkIcon, EllipsisVerticalIcon, PencilSquareIcon, PhotoIcon, ChevronDownIcon } from '@heroicons/react/24/outline';
 import { Menu, Transition } from '@headlessui/react';
-import { ClothingItem } from '../types';
-import { getClothingItems, deleteClothingItem } from '../api';
+import { ClothingItem, ClothingItemFacets } from '../types';
+import { getClothingItems, deleteClothingItem, filterClothingItems } from '../api';
 import AddClothingModal from './AddClothingModal';
 import EditClothingModal from './EditClothingModal';
 import ConfirmationModal from './ConfirmationModal';
 import { API_BASE_URL } from '../config';
 
+// Matches the grid's columns: 1 / sm:2 / lg:3 / xl:4
+const GRID_IMAGE_SIZES = '(min-width: 1280px) 25vw, (min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw';
+
 interface WardrobeListProps {
   onAddItem?: () => void;
 }
@@ -31,15 +34,15 @@ const WardrobeList: React.FC<WardrobeListProps> = ({ onAddItem }) => {
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [isConfirmationOpen, setIsConfirmationOpen] = useState(false);
   const [categoryFilter, setCategoryFilter] = useState('all');
+  // Server-side filter results: matching ids (null when unfiltered) and facet counts
+  const [matchingIds, setMatchingIds] = useState<Set<number> | null>(null);
+  const [facets, setFacets] = useState<ClothingItemFacets | null>(null);
 
   const filterItems = (item: ClothingItem) => {
     const matchesSearch = item.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
       item.brand?.toLowerCase().includes(searchTerm.toLowerCase()) ||
       item.category.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesFilters = Object.entries(filters).every(([key, value]) => {
-      if (!value) return true;
-      return item[key as keyof ClothingItem] === value;
-    });
+    const matchesFilters = matchingIds === null || matchingIds.has(item.id);
     return matchesSearch && matchesFilters;
   };
 
@@ -47,6 +50,27 @@ const WardrobeList: React.FC<WardrobeListProps> = ({ onAddItem }) => {
     fetchItems();
   }, []);
 
+  useEffect(() => {
+    let cancelled = false;
+    filterClothingItems({
+      category: filters.category,
+      color: filters.color,
+      weather_suitability: filters.weather,
+    })
+      .then(({ ids, facets }) => {
+        if (cancelled) return;
+        setMatchingIds(ids);
+        setFacets(facets);
+      })
+      .catch(err => console.error('Error filtering items:', err));
+    return () => {
+      cancelled = true;
+    };
+  }, [filters, items]);
+
+  const facetCount = (dimension: string, value: string): number | undefined =>
+    facets?.[dimension]?.find(facet => facet.value === value)?.count;
+
   useEffect(() => {
     const filtered = items.filter(filterItems);
     setFilteredItems(filtered);
@@ -271,6 +295,9 @@ const WardrobeList: React.FC<WardrobeListProps> = ({ onAddItem }) => {
                       }`}
                     >
                       {category}
+                      {facetCount('category', category) !== undefined && (
+                        <span className="ml-1 text-xs opacity-70">{facetCount('category', category)}</span>
+                      )}
                     </button>
                   ))}
                 </div>
@@ -292,6 +319,9 @@ const WardrobeList: React.FC<WardrobeListProps> = ({ onAddItem }) => {
                     >
                       <span className={`w-4 h-4 rounded-full ${getColorClass(color)} shadow-sm border border-gray-200 dark:border-gray-600`} />
                       {color}
+                      {facetCount('color', color) !== undefined && (
+                        <span className="text-xs opacity-70">{facetCount('color', color)}</span>
+                      )}
                     </button>
                   ))}
                 </div>
@@ -312,6 +342,9 @@ const WardrobeList: React.FC<WardrobeListProps> = ({ onAddItem }) => {
                       }`}
                     >
                       {weather}
+                      {facetCount('weather_suitability', weather) !== undefined && (
+                        <span className="ml-1 text-xs opacity-70">{facetCount('weather_suitability', weather)}</span>
+                      )}
                     </button>
                   ))}
                 </div>
@@ -343,7 +376,20 @@ const WardrobeList: React.FC<WardrobeListProps> = ({ onAddItem }) => {
               className="bg-white dark:bg-gray-800 rounded-xl border border-gray-200 dark:border-gray-700 shadow-sm hover:shadow-md transition-shadow overflow-hidden cursor-pointer"
             >
               <div className="aspect-square relative overflow-hidden bg-gray-100 dark:bg-gray-700">
-                {item.image ? (
+                {item.image && item.srcset ? (
+                  <picture>
+                    <source type="image/webp" srcSet={item.srcset.webp} sizes={GRID_IMAGE_SIZES} />
+                    <img
+                      src={item.renditions?.card?.jpeg ?? item.image}
+                      srcSet={item.srcset.jpeg}
+                      sizes={GRID_IMAGE_SIZES}
+                      alt={item.name}
+                      loading="lazy"
+                      decoding="async"
+                      className="w-full h-full object-cover"
+                    />
+                  </picture>
+                ) : item.image ? (
                   <img
                     src={item.image}
                     alt={item.name}
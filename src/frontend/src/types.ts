@@ -6,14 +6,26 @@ export interface ClothingItem {
   size: string;
   brand?: string;
   image?: string;
+  renditions?: Partial<Record<'thumb' | 'card' | 'full', ImageRendition>>;
+  srcset?: { webp: string; jpeg: string } | null;
+  purchase_price?: string | null;
   weather_suitability: string;
   created_at: string;
+  updated_at?: string;
   last_worn?: string;
 }
 
+export interface ImageRendition {
+  width: number;
+  height: number;
+  webp: string;
+  jpeg: string;
+}
+
 export interface WeatherLog {
   id: number;
   date: string;
+  location?: string;
   temp_high: number;
   temp_low: number;
   precipitation_chance: number;
@@ -71,4 +83,54 @@ export interface Weather {
     };
   };
   last_updated: string;
-} 
\ No newline at end of file
+} 
+
+export interface PaginatedResponse<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+// Response of `?since=<token>` on the item and wear log lists
+export interface SyncFeed<T> {
+  changed: T[];
+  deleted: number[];
+  token: string;
+  has_more: boolean;
+}
+
+export interface WearLogQuery {
+  date_worn_after?: string;
+  date_worn_before?: string;
+  page_size?: number;
+}
+
+export interface WearCalendarDay {
+  date: string;
+  logs: number;
+  item_ids: number[];
+  weather: string | null;
+}
+
+export interface WearCalendar {
+  month: string;
+  days: WearCalendarDay[];
+}
+
+export interface FacetCount {
+  value: string;
+  count: number;
+}
+
+// Counts per value for each filterable item attribute
+export type ClothingItemFacets = Record<string, FacetCount[]>;
+
+export interface ClothingItemFilters {
+  category?: string;
+  color?: string;
+  weather_suitability?: string;
+  brand?: string;
+  material?: string;
+  formality?: string;
+  size?: string;
+}
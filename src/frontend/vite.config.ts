@@ -7,11 +7,14 @@ export default defineConfig({
     outDir: '../static/frontend',
     emptyOutDir: true,
     sourcemap: true,
+    // Read by config/frontend.py to find the bundles; not manifest.json,
+    // which is the PWA manifest from public/
+    manifest: 'build-manifest.json',
     rollupOptions: {
       output: {
-        entryFileNames: `assets/[name].js`,
-        chunkFileNames: `assets/[name].js`,
-        assetFileNames: `assets/[name].[ext]`
+        entryFileNames: `assets/[name]-[hash].js`,
+        chunkFileNames: `assets/[name]-[hash].js`,
+        assetFileNames: `assets/[name]-[hash].[ext]`
       }
     }
   },
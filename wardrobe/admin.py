@@ -1,5 +1,6 @@
+from django import forms
 from django.contrib import admin
-from .models import ClothingItem, WearLog, WeatherLog
+from .models import ClothingItem, ItemWearStats, WearLog, WeatherLog
 
 @admin.register(ClothingItem)
 class ClothingItemAdmin(admin.ModelAdmin):
@@ -7,11 +8,34 @@ class ClothingItemAdmin(admin.ModelAdmin):
     list_filter = ('category', 'color', 'weather_suitability')
     search_fields = ('name', 'brand')
 
+class WearLogAdminForm(forms.ModelForm):
+    class Meta:
+        model = WearLog
+        # Derived from the items in clean()
+        exclude = ('owner',)
+
+    def clean(self):
+        """Take the log's owner from its items, which must all share one"""
+        cleaned_data = super().clean()
+        owners = {item.owner_id for item in cleaned_data.get('items') or ()}
+        if len(owners) > 1:
+            raise forms.ValidationError('All items in a wear log must belong to the same user.')
+        if owners:
+            # The viewsets list logs by owner; without one the log is invisible
+            self.instance.owner_id = owners.pop()
+        return cleaned_data
+
 @admin.register(WearLog)
 class WearLogAdmin(admin.ModelAdmin):
+    form = WearLogAdminForm
     list_display = ('date_worn', 'get_items_display', 'get_weather_display')
+    readonly_fields = ('owner',)
     list_filter = ('date_worn',)
     filter_horizontal = ('items',)
+    list_select_related = ('weather_log',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('items')
 
     def get_items_display(self, obj):
         return ", ".join([item.name for item in obj.items.all()])
@@ -28,3 +52,18 @@ class WeatherLogAdmin(admin.ModelAdmin):
     list_display = ('date', 'temp_high', 'temp_low', 'precipitation_chance', 'humidity')
     list_filter = ('date',)
     search_fields = ('date',)
+
+    # Snapshots are shared between wear logs (see WeatherLog) and created by
+    # the API; here they can only be viewed or deleted
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ItemWearStats)
+class ItemWearStatsAdmin(admin.ModelAdmin):
+    list_display = ('item', 'weather_bucket', 'wear_count', 'last_worn')
+    list_filter = ('weather_bucket',)
+    list_select_related = ('item',)
+    readonly_fields = ('owner', 'item', 'weather_bucket', 'wear_count', 'last_worn')
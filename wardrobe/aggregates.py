@@ -0,0 +1,26 @@
+from django.db.models import Aggregate, CharField
+
+
+class GroupConcat(Aggregate):
+    """
+    Comma-separated values of a column across the group, in no particular
+    order: ``GROUP_CONCAT`` on SQLite and MySQL, ``STRING_AGG`` on PostgreSQL.
+    """
+    function = 'GROUP_CONCAT'
+    template = '%(function)s(%(distinct)s%(expressions)s)'
+    allow_distinct = True
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            function='STRING_AGG',
+            template="%(function)s(%(distinct)s(%(expressions)s)::text, ',')",
+            **extra_context,
+        )
+
+
+def split_ids(value):
+    """Sorted integer ids from a GroupConcat value"""
+    return sorted(int(part) for part in value.split(',')) if value else []
@@ -0,0 +1,119 @@
+"""
+Async versions of the I/O-bound weather endpoints.
+
+When ``ASYNC_VIEWS`` is enabled (the ASGI entry point turns it on) these
+views take over ``/api/weather/current/`` and
+``/api/clothing-items/suggestions/`` from the DRF actions. They await the
+weather upstream through an async HTTP client and use Django's async ORM,
+so one worker process can keep many slow upstream calls in flight instead
+of blocking a whole worker on each.
+"""
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import parse_etags, quote_etag
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.authentication import aget_token_user
+from config.timing import timed
+
+from .models import ClothingItem
+from .outfits import WardrobeFeatures, rank_outfits
+from .serializers import ClothingItemSerializer, OutfitSerializer, WeatherSerializer
+from .versions import aweather_etag, revalidate
+from .weather import WeatherService
+
+
+async def authenticate(request):
+    """
+    Resolve the requesting user the way the API's DRF authentication classes
+    do: a ``Token`` header first, then the session. Returns ``(user, error)``
+    and, like DRF, sets ``request.user``, which replica routing reads to
+    keep a user who just wrote on the primary.
+    """
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    with timed('auth'):
+        if keyword == 'Token':
+            try:
+                user = await aget_token_user(key.strip())
+            except AuthenticationFailed as e:
+                return None, str(e.detail)
+        else:
+            user = await request.auser()
+    if not user.is_authenticated:
+        return None, 'Authentication credentials were not provided.'
+    request.user = user
+    return user, None
+
+
+def unauthorized(detail):
+    response = JsonResponse({'detail': detail}, status=401)
+    response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+@require_GET
+async def current_weather(request):
+    """Get current weather data"""
+    user, error = await authenticate(request)
+    if user is None:
+        return unauthorized(error)
+
+    etag = quote_etag(await aweather_etag(request))
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return revalidate(response)
+
+    weather = await WeatherService.aget_weather_for_date()
+    if not weather:
+        return JsonResponse({"error": "Could not fetch weather data"}, status=503)
+    response = JsonResponse(WeatherSerializer(weather).data)
+    response['ETag'] = etag
+    return revalidate(response)
+
+
+@require_GET
+async def suggestions(request):
+    """Get clothing suggestions based on current weather"""
+    user, error = await authenticate(request)
+    if user is None:
+        return unauthorized(error)
+
+    weather_service = WeatherService()
+    try:
+        weather_data = await weather_service.aget_weather(
+            city=request.GET.get('city'),
+            zip_code=request.GET.get('zip_code'),
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if not weather_data:
+        return JsonResponse({"error": "Could not fetch weather data"}, status=503)
+
+    # Get suitable items based on weather
+    queryset = ClothingItem.objects.filter(owner=user)
+    weather_suitability = weather_service.get_weather_suitability(weather_data['temperature'])
+    suitable_items = [
+        item async for item in queryset.filter(
+            weather_suitability=weather_suitability
+        ).order_by('last_worn')[:5]  # Get 5 least recently worn items
+    ]
+
+    ranked = rank_outfits(
+        await WardrobeFeatures.afor_user(user),
+        weather_data,
+        weather_suitability,
+        limit=request.GET.get('limit'),
+        formality=request.GET.get('formality'),
+    )
+    items = await queryset.ain_bulk({item_id for _, ids in ranked for item_id in ids})
+    outfits = [
+        {'score': round(score, 4), 'items': [items[item_id] for item_id in ids if item_id in items]}
+        for score, ids in ranked
+    ]
+
+    return JsonResponse({
+        'weather': weather_data,
+        'suggestions': ClothingItemSerializer(suitable_items, many=True).data,
+        'outfits': OutfitSerializer(outfits, many=True, context={'request': request}).data,
+    })
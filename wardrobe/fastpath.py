@@ -0,0 +1,175 @@
+"""
+``values()`` read path for clothing item and wear log lists.
+
+``ClothingItemSerializer`` builds a model instance per row and runs every
+field object over it. For lists, ``ValuesSerializer`` reads only the
+columns the (possibly ``?fields=``-narrowed) serializer needs as dicts and
+converts them with a plan computed once per request: plain values pass
+through untouched, files become URLs, and the remaining fields use the DRF
+field's own ``to_representation()``, so the output is identical.
+
+``WearLogValuesSerializer`` does the same for wear logs: the weather
+snapshot's columns come through the same join ``select_related`` would
+use, and the items of a page from one query on the m2m table, like
+``prefetch_related``. A weather snapshot or items left out with
+``?fields=`` cost neither the join nor the query.
+"""
+from operator import itemgetter
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .models import WearLog
+
+# DRF fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _iso_datetime(field):
+    """
+    DateTimeField.to_representation() with the timezone looked up once
+    instead of per value, or None when the field needs the general path.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or tz is None:
+        return None
+
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _converted(column, convert):
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+class ValuesSerializer:
+    """
+    Serialize ``values()`` rows the way ``serializer`` would. With a
+    ``prefix`` the columns are read across a relation (``weather_log__``);
+    fields in ``exclude`` are left to the caller.
+    """
+
+    def __init__(self, serializer, required=(), prefix='', exclude=()):
+        self.serializer = serializer
+        self.prefix = prefix
+        self.columns = []
+        for name in required:
+            self._column(name)
+        self.plan = []
+        self.with_renditions = False
+        for name, field in serializer.fields.items():
+            if field.write_only or name in exclude:
+                continue
+            iso_datetime = _iso_datetime(field) if isinstance(field, serializers.DateTimeField) else None
+            if name in ('renditions', 'srcset'):
+                self.with_renditions = True
+                self._column('image')
+                self._column('renditions')
+                self.plan.append((name, None))
+            elif isinstance(field, serializers.FileField):
+                self.plan.append((name, _converted(self._column(field.source), self._file_url(field.source))))
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                self.plan.append((name, itemgetter(self._column(field.source))))
+            elif iso_datetime is not None:
+                self.plan.append((name, _converted(self._column(field.source), iso_datetime)))
+            else:
+                self.plan.append((name, _converted(self._column(field.source), field.to_representation)))
+
+    def _column(self, name):
+        name = self.prefix + name
+        if name not in self.columns:
+            self.columns.append(name)
+        return name
+
+    def _file_url(self, source):
+        storage = self.serializer.Meta.model._meta.get_field(source).storage
+
+        def url(name):
+            return self.serializer._url(storage, name) if name else None
+        return url
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, row):
+        data = {}
+        if self.with_renditions:
+            renditions = self.serializer.rendition_urls(
+                row[self.prefix + 'image'], row[self.prefix + 'renditions'],
+            )
+        for name, get in self.plan:
+            if name == 'renditions':
+                data[name] = renditions
+            elif name == 'srcset':
+                data[name] = self.serializer.srcset_for(renditions)
+            else:
+                data[name] = get(row)
+        return data
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class WearLogValuesSerializer:
+    """Serialize wear log ``values()`` rows the way a WearLogSerializer would"""
+    NESTED = ('items', 'weather_log')
+
+    def __init__(self, serializer, required=()):
+        fields = serializer.fields
+        self.names = [name for name, field in fields.items() if not field.write_only]
+        self.log = ValuesSerializer(serializer, required=['id', *required], exclude=self.NESTED)
+        self.weather = None
+        if 'weather_log' in fields:
+            self.weather = ValuesSerializer(fields['weather_log'], required=['id'], prefix='weather_log__')
+        self.items = None
+        if 'items' in fields:
+            self.items = ValuesSerializer(fields['items'].child, prefix='clothingitem__')
+
+    @property
+    def columns(self):
+        return self.log.columns + (self.weather.columns if self.weather else [])
+
+    def values(self, queryset):
+        # The items come from items_by_log() instead
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def items_by_log(self, log_ids):
+        """Serialized items of each wear log, from one query on the m2m table"""
+        items = {}
+        if self.items is None or not log_ids:
+            return items
+        rows = WearLog.items.through.objects.filter(wearlog_id__in=log_ids).values('wearlog_id', *self.items.columns)
+        for row in rows:
+            items.setdefault(row['wearlog_id'], []).append(self.items.to_representation(row))
+        return items
+
+    def many(self, rows):
+        items = self.items_by_log([row['id'] for row in rows])
+        results = []
+        for row in rows:
+            own = self.log.to_representation(row)
+            data = {}
+            for name in self.names:
+                if name == 'items':
+                    data[name] = items.get(row['id'], [])
+                elif name == 'weather_log':
+                    has_weather = row['weather_log__id'] is not None
+                    data[name] = self.weather.to_representation(row) if has_weather else None
+                else:
+                    data[name] = own[name]
+            results.append(data)
+        return results
@@ -0,0 +1,66 @@
+"""
+Server-side filtering and facet counts for the wardrobe.
+
+Every dimension accepts one value or several comma-separated ones
+(``?color=black,navy``). Facet counts follow the usual faceted-search
+rule: a dimension's counts apply every filter except its own, so the
+alternatives to a selected value stay visible. All dimensions are counted
+in one statement, a UNION ALL of one GROUP BY per dimension.
+"""
+import django_filters
+from django.db.models import CharField, Count, F, Value
+
+from .models import ClothingItem
+
+FACET_FIELDS = [
+    'category',
+    'color',
+    'weather_suitability',
+    'brand',
+    'material',
+    'formality',
+    'size',
+]
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    pass
+
+
+class ClothingItemFilter(django_filters.FilterSet):
+    category = CharInFilter(field_name='category')
+    color = CharInFilter(field_name='color')
+    weather_suitability = CharInFilter(field_name='weather_suitability')
+    brand = CharInFilter(field_name='brand')
+    material = CharInFilter(field_name='material')
+    formality = CharInFilter(field_name='formality')
+    size = CharInFilter(field_name='size')
+
+    class Meta:
+        model = ClothingItem
+        fields = FACET_FIELDS
+
+
+def facet_counts(queryset, data, request=None):
+    """
+    ``{dimension: [{'value': v, 'count': n}, ...]}`` for ``queryset`` (the
+    unfiltered list) under the filters in ``data``, most common value first.
+    """
+    parts = []
+    for dimension in FACET_FIELDS:
+        others = data.copy()
+        others.pop(dimension, None)
+        filtered = ClothingItemFilter(others, queryset=queryset, request=request).qs
+        parts.append(
+            filtered.order_by()
+            .annotate(dimension=Value(dimension, output_field=CharField()), value=F(dimension))
+            .values('dimension', 'value')
+            .annotate(count=Count('id'))
+        )
+
+    facets = {dimension: [] for dimension in FACET_FIELDS}
+    for row in parts[0].union(*parts[1:], all=True):
+        facets[row['dimension']].append({'value': row['value'], 'count': row['count']})
+    for values in facets.values():
+        values.sort(key=lambda entry: (-entry['count'], entry['value']))
+    return facets
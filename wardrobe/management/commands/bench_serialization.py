@@ -0,0 +1,100 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from config.renderers import ORJSONRenderer
+from wardrobe.fastpath import ValuesSerializer
+from wardrobe.models import ClothingItem
+from wardrobe.serializers import ClothingItemSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the throughput of rendering a whole closet as JSON with '
+        'ClothingItemSerializer + JSONRenderer (the old list path) and with '
+        'ValuesSerializer + ORJSONRenderer, with and without ?fields=. Uses a '
+        'throwaway user and items, rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5000, help='Items in the closet')
+        parser.add_argument('--repeat', type=int, default=5, help='Renders per variant; the best one is reported')
+        parser.add_argument(
+            '--fields', type=str, default='id,name,category,color,last_worn',
+            help='Sparse fieldset for the ?fields= variant',
+        )
+
+    def handle(self, *args, **options):
+        if options['items'] < 1 or options['repeat'] < 1:
+            raise CommandError('--items and --repeat must be positive')
+        try:
+            with transaction.atomic():
+                queryset = self.make_closet(options['items'])
+                full = self.request('/api/clothing-items/')
+                sparse = self.request(f"/api/clothing-items/?fields={options['fields']}")
+
+                results = [
+                    self.run('ModelSerializer + JSONRenderer', lambda: self.render_model(queryset, full), options),
+                    self.run('values() + ORJSONRenderer', lambda: self.render_values(queryset, full), options),
+                    self.run(f"values() + ORJSONRenderer, ?fields={options['fields']}",
+                             lambda: self.render_values(queryset, sparse), options),
+                ]
+                if json.loads(results[0]) != json.loads(results[1]):
+                    raise CommandError('The values() path produced different output')
+                raise Rollback
+        except Rollback:
+            pass
+
+    def make_closet(self, count):
+        user = get_user_model().objects.create_user(username='bench-serialization', password=None)
+        ClothingItem.objects.bulk_create(
+            [
+                ClothingItem(
+                    owner=user,
+                    name=f'Item {n}',
+                    category=ClothingItem.CATEGORY_CHOICES[n % len(ClothingItem.CATEGORY_CHOICES)][0],
+                    color='blue',
+                    size='M',
+                    brand='Bench',
+                    weather_suitability='all',
+                    purchase_price=f'{n % 200}.99',
+                )
+                for n in range(count)
+            ],
+            batch_size=1000,
+        )
+        return ClothingItem.objects.filter(owner=user).order_by('-created_at', '-id')
+
+    def request(self, path):
+        return Request(APIRequestFactory().get(path))
+
+    def render_model(self, queryset, request):
+        data = ClothingItemSerializer(queryset, many=True, context={'request': request}).data
+        return JSONRenderer().render(data)
+
+    def render_values(self, queryset, request):
+        rows = ValuesSerializer(ClothingItemSerializer(many=True, context={'request': request}).child)
+        return ORJSONRenderer().render(rows.many(rows.values(queryset)))
+
+    def run(self, label, render, options):
+        best = None
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            content = render()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.stdout.write(self.style.SUCCESS(label))
+        self.stdout.write(f"  time per list:  {best * 1000:.1f} ms ({options['items']} items, {len(content)} bytes)")
+        self.stdout.write(f"  items per second: {options['items'] / best:,.0f}")
+        return content
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# Client connections to this database other than the command's own
+CONNECTIONS_SQL = """
+    SELECT count(*), count(*) FILTER (WHERE state = 'active')
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+"""
+SAMPLE_INTERVAL = 0.1
+
+
+def count_connections():
+    with connection.cursor() as cursor:
+        cursor.execute(CONNECTIONS_SQL)
+        return cursor.fetchone()
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests one endpoint of a running server with concurrent requests and '
+        'reports throughput and latency percentiles. Run it once against the sync '
+        '(WSGI) deployment and once against the async (ASGI) one to compare, e.g. '
+        'with the weather emulator adding upstream latency. A "{n}" in the URL is '
+        'replaced by the request number, which forces per-location cache misses. '
+        'With --database-connections it also samples the PostgreSQL database in '
+        'DATABASES (point it at the one the server uses) and reports how many '
+        'client connections were open and active, e.g. to compare DATABASE_POOL=True '
+        'and False at the same concurrency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', type=str, help='Full URL to request')
+        parser.add_argument('--token', type=str, default=None, help='API token to send')
+        parser.add_argument('--requests', type=int, default=500, help='Total requests to send')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+        parser.add_argument(
+            '--database-connections', action='store_true',
+            help="Sample the database's client connections during the run (PostgreSQL only)",
+        )
+
+    def handle(self, *args, **options):
+        if options['database_connections'] and connection.vendor != 'postgresql':
+            raise CommandError('--database-connections needs a PostgreSQL database')
+        # httpx logs every request at INFO
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        results = asyncio.run(self.run(options))
+        self.report(options, *results)
+
+    async def run(self, options):
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f"Token {options['token']}"
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies = []
+        statuses = {}
+        samples = []
+        done = asyncio.Event()
+        sampler = None
+        if options['database_connections']:
+            sampler = asyncio.create_task(self.sample_connections(samples, done))
+
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=options['timeout']) as client:
+            async def one(n):
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get(options['url'].replace('{n}', str(n)))
+                        status = response.status_code
+                    except httpx.HTTPError as e:
+                        status = type(e).__name__
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(n) for n in range(options['requests'])))
+            elapsed = time.perf_counter() - started
+        if sampler:
+            done.set()
+            await sampler
+        return latencies, statuses, elapsed, samples
+
+    async def sample_connections(self, samples, done):
+        """Append ``(open, active)`` connection counts until ``done`` is set"""
+        count = sync_to_async(count_connections)
+        while not done.is_set():
+            samples.append(await count())
+            try:
+                await asyncio.wait_for(done.wait(), SAMPLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self, options, latencies, statuses, elapsed, samples):
+        latencies.sort()
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(f"URL:          {options['url']}")
+        self.stdout.write(f"Requests:     {len(latencies)} at concurrency {options['concurrency']}")
+        self.stdout.write(f"Elapsed:      {elapsed:.2f}s")
+        self.stdout.write(f"Throughput:   {len(latencies) / elapsed:.1f} req/s")
+        self.stdout.write(
+            f"Latency (ms): p50 {quantiles[49] * 1000:.1f}  p95 {quantiles[94] * 1000:.1f}  "
+            f"p99 {quantiles[98] * 1000:.1f}  max {latencies[-1] * 1000:.1f}"
+        )
+        self.stdout.write(f"Responses:    {dict(sorted(statuses.items(), key=str))}")
+        if samples:
+            opened = [sample[0] for sample in samples]
+            active = [sample[1] for sample in samples]
+            self.stdout.write(
+                f"DB connections: open max {max(opened)} mean {statistics.mean(opened):.1f}  "
+                f"active max {max(active)} mean {statistics.mean(active):.1f}  ({len(samples)} samples)"
+            )
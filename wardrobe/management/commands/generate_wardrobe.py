@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from wardrobe import synthetic
+from wardrobe.stats import refresh_items
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates synthetic users with closets and years of wear and weather history '
+        'for benchmarking, deterministically from --seed. Closets are written with '
+        'bulk_create and wear logs with multi-row INSERTs, in chunks of users spread '
+        'over a process pool; e.g. '
+        '--users 10000 --items 100 --years 3 loads about ten million wear logs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to create')
+        parser.add_argument('--items', type=int, default=80, help='Clothing items per user')
+        parser.add_argument('--years', type=float, default=2, help='Years of history, ending yesterday')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--prefix', type=str, default='synthetic-', help='Username prefix, followed by the user number')
+        parser.add_argument('--password', type=str, default=None, help='Password for every user (default: unusable)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--users-per-task', type=int, default=10, help='Users written per transaction')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--skip-stats', action='store_true', help="Don't rebuild wear stats afterwards")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['items'], options['users_per_task'], options['batch_size']) < 1:
+            raise CommandError('--users, --items, --users-per-task and --batch-size must be positive')
+        if options['items'] < 3:
+            raise CommandError('--items must be at least 3 (a shirt, pants and shoes)')
+        if options['years'] <= 0:
+            raise CommandError('--years must be positive')
+
+        workers = max(options['workers'], 1)
+        if workers > 1 and connection.vendor == 'sqlite':
+            # SQLite allows one writer at a time; more processes only contend
+            self.stdout.write(self.style.WARNING('SQLite database: using a single worker'))
+            workers = 1
+        if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            self.stdout.write(self.style.WARNING('fork is unavailable: using a single worker'))
+            workers = 1
+
+        started = time.perf_counter()
+        first_day, last_day = synthetic.history_days(options['years'])
+        days = (last_day - first_day).days + 1
+        weather = synthetic.create_weather(options['seed'], first_day, days, options['batch_size'])
+        users = self.create_users(options)
+        self.stdout.write(
+            f"Created {len(users)} users and weather for {len(weather)} cities from "
+            f"{first_day} to {last_day}; generating closets with {workers} workers"
+        )
+
+        per_task = options['users_per_task']
+        tasks = [users[start:start + per_task] for start in range(0, len(users), per_task)]
+        arguments = (options['seed'], options['items'], first_day, days, options['batch_size'])
+        totals = [0, 0, 0, 0]
+        if workers == 1:
+            synthetic.init_worker(weather)
+            results = (synthetic.populate(task, *arguments) for task in tasks)
+            self.collect(results, totals, len(users), started)
+        else:
+            # Forked workers must open their own connections, not share ours
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=synthetic.init_worker,
+                initargs=(weather,),
+            ) as executor:
+                futures = [executor.submit(synthetic.populate, task, *arguments) for task in tasks]
+                self.collect((future.result() for future in as_completed(futures)), totals, len(users), started)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals[1]} items and {totals[2]} wear logs ({totals[3]} logged items) "
+            f"in {elapsed:.1f}s ({totals[2] / elapsed:,.0f} wear logs per second)"
+        ))
+
+        if not options['skip_stats']:
+            started = time.perf_counter()
+            refresh_items()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt wear stats in {time.perf_counter() - started:.1f}s"
+            ))
+
+    def create_users(self, options):
+        """``(number, id)`` for each new user"""
+        User = get_user_model()
+        usernames = [f"{options['prefix']}{number:06d}" for number in range(options['users'])]
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Users named {options['prefix']}NNNNNN already exist; choose another --prefix")
+        # Hashed once: every user shares the password (and its salt)
+        password = make_password(options['password'])
+        User.objects.bulk_create(
+            [User(username=username, password=password) for username in usernames],
+            batch_size=options['batch_size'],
+        )
+        ids = dict(User.objects.filter(username__startswith=options['prefix']).values_list('username', 'id'))
+        return [(number, ids[username]) for number, username in enumerate(usernames)]
+
+    def collect(self, results, totals, user_count, started):
+        """Add up ``populate()`` results, reporting progress every tenth of the users"""
+        step = max(user_count // 10, 1)
+        for result in results:
+            previous = totals[0]
+            totals[:] = [total + count for total, count in zip(totals, result)]
+            if totals[0] // step != previous // step:
+                self.stdout.write(
+                    f"  {totals[0]}/{user_count} users, {totals[2]} wear logs "
+                    f"({time.perf_counter() - started:.0f}s)"
+                )
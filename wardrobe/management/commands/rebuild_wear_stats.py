@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wardrobe.models import ItemWearStats
+from wardrobe.stats import refresh_items
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes every per-item wear statistic and ClothingItem.last_worn from the '
+        'wear logs with set-based SQL (one DELETE, one INSERT ... SELECT, one UPDATE). '
+        'Use after bulk changes made outside the ORM.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        refresh_items()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {ItemWearStats.objects.count()} wear stats rows in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,115 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+
+CONDITIONS = [
+    ('Clear', 'clear sky'),
+    ('Clouds', 'scattered clouds'),
+    ('Rain', 'light rain'),
+    ('Drizzle', 'light intensity drizzle'),
+    ('Snow', 'light snow'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a local OpenWeather emulator with adjustable latency and error rates. '
+        'Point OPENWEATHER_URL at http://<addr>:<port>/data/2.5 to use it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--addr', type=str, default='127.0.0.1', help='Address to bind to')
+        parser.add_argument('--port', type=int, default=8001, help='Port to listen on')
+        parser.add_argument('--latency', type=float, default=0.1,
+                            help='Base response latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.05,
+                            help='Random extra latency in seconds, added to --latency')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of requests answered with a 503 (0-1)')
+        parser.add_argument('--hang-rate', type=float, default=0.0,
+                            help='Fraction of requests that stall for --hang seconds (0-1)')
+        parser.add_argument('--hang', type=float, default=30.0,
+                            help='Seconds a stalled request waits before answering')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+
+                delay = options['latency'] + rng.uniform(0, options['jitter'])
+                if rng.random() < options['hang_rate']:
+                    delay = options['hang']
+                time.sleep(delay)
+
+                if not params.get('appid'):
+                    return self._send(401, {'cod': 401, 'message': 'Invalid API key.'})
+                if rng.random() < options['error_rate']:
+                    return self._send(503, {'cod': 503, 'message': 'Service Unavailable'})
+
+                if url.path.endswith('/weather'):
+                    return self._send(200, command.current_weather(rng, params))
+                if url.path.endswith('/forecast'):
+                    return self._send(200, command.forecast(rng, params))
+                return self._send(404, {'cod': 404, 'message': 'Not found'})
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                if options['verbosity'] > 1:
+                    super().log_message(format, *args)
+
+        server = ThreadingHTTPServer((options['addr'], options['port']), Handler)
+        self.stdout.write(self.style.SUCCESS(
+            f"OpenWeather emulator listening on http://{options['addr']}:{options['port']}/data/2.5 "
+            f"(latency {options['latency']}s +{options['jitter']}s, "
+            f"error rate {options['error_rate']:.0%}, hang rate {options['hang_rate']:.0%})"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def location(self, params):
+        return (params.get('q') or params.get('zip') or ['Emulated City'])[0].split(',')[0]
+
+    def current_weather(self, rng, params):
+        temp = round(rng.uniform(20, 100), 1)
+        main, description = rng.choice(CONDITIONS)
+        return {
+            'name': self.location(params),
+            'main': {
+                'temp': temp,
+                'temp_min': temp - 5,
+                'temp_max': temp + 5,
+                'humidity': rng.randint(20, 95),
+            },
+            'weather': [{'main': main, 'description': description}],
+            'wind': {'speed': round(rng.uniform(0, 20), 1)},
+        }
+
+    def forecast(self, rng, params):
+        entries = []
+        for _ in range(8):
+            current = self.current_weather(rng, params)
+            current['pop'] = round(rng.random(), 2)
+            entries.append(current)
+        return {'city': {'name': self.location(params)}, 'list': entries}
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['owner', 'created_at'], name='wardrobe_cl_owner_i_dedce2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['owner', 'category'], name='wardrobe_cl_owner_i_f7c034_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['owner', 'weather_suitability', 'last_worn'], name='wardrobe_cl_owner_i_e242fc_idx'),
+        ),
+    ]
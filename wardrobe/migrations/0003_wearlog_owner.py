@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_owner(apps, schema_editor):
+    """Copy each wear log's owner from the items it references."""
+    WearLog = apps.get_model('wardrobe', 'WearLog')
+    Through = WearLog.items.through
+    item_owner = Through.objects.filter(
+        wearlog_id=OuterRef('pk'),
+        clothingitem__owner__isnull=False,
+    ).values('clothingitem__owner')[:1]
+    WearLog.objects.filter(owner__isnull=True).update(owner=Subquery(item_owner))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0002_clothingitem_owner_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wearlog',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='wearlog',
+            index=models.Index(fields=['owner', 'date_worn'], name='wardrobe_we_owner_i_fb84b1_idx'),
+        ),
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+    ]
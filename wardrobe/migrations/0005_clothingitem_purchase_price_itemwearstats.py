@@ -0,0 +1,75 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, CharField, Count, F, FloatField, Max, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+
+
+def backfill_wear_stats(apps, schema_editor):
+    """Build the initial wear stats from existing wear logs."""
+    WearLog = apps.get_model('wardrobe', 'WearLog')
+    ItemWearStats = apps.get_model('wardrobe', 'ItemWearStats')
+    avg_temp = (
+        F('wearlog__weather_log__temp_high') + F('wearlog__weather_log__temp_low')
+    ) / Value(2.0, output_field=FloatField())
+    bucket = Case(
+        When(wearlog__weather_log__isnull=True, then=Value('unknown')),
+        When(GreaterThanOrEqual(avg_temp, 85), then=Value('hot')),
+        When(GreaterThanOrEqual(avg_temp, 70), then=Value('warm')),
+        When(GreaterThanOrEqual(avg_temp, 50), then=Value('mild')),
+        default=Value('cold'),
+        output_field=CharField(),
+    )
+    rows = (
+        WearLog.items.through.objects.annotate(bucket=bucket)
+        .values('clothingitem__owner_id', 'clothingitem_id', 'bucket')
+        .annotate(wear_count=Count('id'), last_worn=Max('wearlog__date_worn'))
+        .order_by()
+    )
+    ItemWearStats.objects.bulk_create(
+        [
+            ItemWearStats(
+                owner_id=row['clothingitem__owner_id'],
+                item_id=row['clothingitem_id'],
+                weather_bucket=row['bucket'],
+                wear_count=row['wear_count'],
+                last_worn=row['last_worn'],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0004_clothingitem_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='purchase_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='ItemWearStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weather_bucket', models.CharField(choices=[('hot', 'Hot'), ('warm', 'Warm'), ('mild', 'Mild'), ('cold', 'Cold'), ('unknown', 'Unknown')], max_length=10)),
+                ('wear_count', models.PositiveIntegerField(default=0)),
+                ('last_worn', models.DateTimeField(blank=True, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wear_stats', to='wardrobe.clothingitem')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'weather_bucket'], name='wardrobe_it_owner_i_e7653b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'weather_bucket'), name='unique_item_weather_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_wear_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:40
+
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 500
+
+
+def weather_fingerprint(date, temp_high, temp_low, precipitation_chance, humidity, conditions, location=''):
+    """
+    Frozen copy of ``wardrobe.models.weather_fingerprint`` as of this
+    migration, so later changes to the live function cannot alter what it
+    writes. Stored dates are already datetimes, made aware here the way
+    ``snapshot_date`` does.
+    """
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    content = [
+        date.astimezone(dt_timezone.utc).isoformat(),
+        location.strip().lower(),
+        float(temp_high),
+        float(temp_low),
+        float(precipitation_chance),
+        float(humidity),
+        conditions,
+    ]
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(',', ':')).encode()
+    ).hexdigest()
+
+
+def merge_duplicate_snapshots(apps, schema_editor):
+    """Fingerprint every WeatherLog and fold identical ones into the oldest."""
+    WeatherLog = apps.get_model('wardrobe', 'WeatherLog')
+    WearLog = apps.get_model('wardrobe', 'WearLog')
+
+    keepers = {}
+    duplicates = {}
+    fingerprinted = []
+    for log in WeatherLog.objects.order_by('id').iterator():
+        fingerprint = weather_fingerprint(
+            log.date, log.temp_high, log.temp_low, log.precipitation_chance,
+            log.humidity, log.conditions, log.location,
+        )
+        if fingerprint in keepers:
+            duplicates.setdefault(keepers[fingerprint], []).append(log.id)
+        else:
+            keepers[fingerprint] = log.id
+            log.fingerprint = fingerprint
+            fingerprinted.append(log)
+            if len(fingerprinted) >= BATCH_SIZE:
+                WeatherLog.objects.bulk_update(fingerprinted, ['fingerprint'])
+                fingerprinted = []
+    WeatherLog.objects.bulk_update(fingerprinted, ['fingerprint'])
+
+    for keeper_id, duplicate_ids in duplicates.items():
+        WearLog.objects.filter(weather_log_id__in=duplicate_ids).update(weather_log_id=keeper_id)
+        WeatherLog.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0005_clothingitem_purchase_price_itemwearstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatherlog',
+            name='location',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='weatherlog',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_snapshots, migrations.RunPython.noop),
+    ]
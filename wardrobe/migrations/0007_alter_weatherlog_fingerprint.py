@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0006 so PostgreSQL doesn't alter the table in the
+    # transaction that rewrote its rows
+
+    dependencies = [
+        ('wardrobe', '0006_weatherlog_location_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='weatherlog',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0008_clothingitem_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('clothing_item', 'Clothing item'), ('wear_log', 'Wear log')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='wearlog',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['owner', 'updated_at'], name='wardrobe_cl_owner_i_ed0393_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wearlog',
+            index=models.Index(fields=['owner', 'updated_at'], name='wardrobe_we_owner_i_ae7730_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['owner', 'model', 'deleted_at'], name='wardrobe_to_owner_i_43b3ec_idx'),
+        ),
+    ]
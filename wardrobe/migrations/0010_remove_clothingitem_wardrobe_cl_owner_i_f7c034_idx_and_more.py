@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0009_tombstone_wearlog_updated_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='clothingitem',
+            name='wardrobe_cl_owner_i_f7c034_idx',
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['owner', 'category', 'created_at'], name='wardrobe_cl_owner_i_df0cb3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['owner', 'color', 'created_at'], name='wardrobe_cl_owner_i_2e4a5e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['owner', 'weather_suitability', 'created_at'], name='wardrobe_cl_owner_i_622757_idx'),
+        ),
+    ]
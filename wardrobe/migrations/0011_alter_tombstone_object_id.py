@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0010_remove_clothingitem_wardrobe_cl_owner_i_f7c034_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='object_id',
+            field=models.PositiveBigIntegerField(),
+        ),
+    ]
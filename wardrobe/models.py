@@ -1,3 +1,7 @@
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -87,44 +91,122 @@ class ClothingItem(models.Model):
     name = models.CharField(max_length=200)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     image = models.ImageField(upload_to='clothing_items/', blank=True, null=True)
+    # Resized copies of image, built in the background (see renditions.py)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     weather_suitability = models.CharField(max_length=20, choices=WEATHER_CHOICES)
     color = models.CharField(max_length=50, choices=COLOR_CHOICES)
     size = models.CharField(max_length=50, blank=True)
     brand = models.CharField(max_length=100, blank=True)
     formality = models.CharField(max_length=50, blank=True)
     material = models.CharField(max_length=100, blank=True)
+    purchase_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     last_worn = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'created_at']),
+            # Filtered wardrobe pages: equality on the filter, then the list order
+            models.Index(fields=['owner', 'category', 'created_at']),
+            models.Index(fields=['owner', 'color', 'created_at']),
+            models.Index(fields=['owner', 'weather_suitability', 'created_at']),
+            models.Index(fields=['owner', 'weather_suitability', 'last_worn']),
+            models.Index(fields=['owner', 'updated_at']),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.get_category_display()})"
 
 class WearLog(models.Model):
     items = models.ManyToManyField(ClothingItem)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     date_worn = models.DateTimeField()
     weather_log = models.ForeignKey('WeatherLog', on_delete=models.SET_NULL, null=True, blank=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date_worn']
         indexes = [
             models.Index(fields=['date_worn']),
+            models.Index(fields=['owner', 'date_worn']),
+            models.Index(fields=['owner', 'updated_at']),
         ]
 
     def __str__(self):
         return f"Outfit worn on {self.date_worn.date()}"
 
+def snapshot_date(value):
+    """Aware datetime for a WeatherLog date given as a string, date or datetime"""
+    value = WeatherLog._meta.get_field('date').to_python(value)
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def weather_fingerprint(date, temp_high, temp_low, precipitation_chance, humidity, conditions, location=''):
+    """sha256 identifying a weather snapshot by its content"""
+    content = [
+        snapshot_date(date).astimezone(dt_timezone.utc).isoformat(),
+        location.strip().lower(),
+        float(temp_high),
+        float(temp_low),
+        float(precipitation_chance),
+        float(humidity),
+        conditions,
+    ]
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(',', ':')).encode()
+    ).hexdigest()
+
+
+class WeatherLogManager(models.Manager):
+    def get_snapshot(self, **fields):
+        """The WeatherLog holding exactly these readings, created if needed"""
+        fields['date'] = snapshot_date(fields['date'])
+        snapshot, _ = self.get_or_create(fingerprint=weather_fingerprint(**fields), defaults=fields)
+        return snapshot
+
+    def get_snapshots(self, readings):
+        """
+        Shared WeatherLogs for a list of readings dicts (None entries stay
+        None), inserting the missing ones in a single bulk insert.
+        """
+        fingerprints = [weather_fingerprint(**fields) if fields else None for fields in readings]
+        wanted = {fingerprint: fields for fingerprint, fields in zip(fingerprints, readings) if fields}
+        snapshots = self.in_bulk(list(wanted), field_name='fingerprint')
+        missing = [
+            self.model(fingerprint=fingerprint, **fields)
+            for fingerprint, fields in wanted.items() if fingerprint not in snapshots
+        ]
+        if missing:
+            # Conflicts are snapshots another request inserted meanwhile
+            self.bulk_create(missing, ignore_conflicts=True)
+            snapshots = self.in_bulk(list(wanted), field_name='fingerprint')
+        return [snapshots[fingerprint] if fingerprint else None for fingerprint in fingerprints]
+
+
 class WeatherLog(models.Model):
+    """
+    Weather at the time outfits were worn. Snapshots are shared: wear logs
+    with identical readings point at one row, found by its ``fingerprint``.
+    A saved snapshot is therefore immutable: changing it would change the
+    weather of every wear log pointing at it. Give a wear log different
+    readings with ``WeatherLog.objects.get_snapshot()`` instead.
+    """
     date = models.DateTimeField()
+    location = models.CharField(max_length=100, blank=True, default='')
     temp_high = models.FloatField()
     temp_low = models.FloatField()
     precipitation_chance = models.FloatField()
     humidity = models.FloatField()
     conditions = models.JSONField()  # Store the full conditions object
+    fingerprint = models.CharField(max_length=64, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = WeatherLogManager()
+
     class Meta:
         ordering = ['-date']
         indexes = [
@@ -133,3 +215,59 @@ class WeatherLog(models.Model):
 
     def __str__(self):
         return f"Weather for {self.date.strftime('%Y-%m-%d')}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Saved weather snapshots are shared and cannot be changed")
+        self.fingerprint = weather_fingerprint(
+            self.date, self.temp_high, self.temp_low, self.precipitation_chance,
+            self.humidity, self.conditions, self.location,
+        )
+        super().save(*args, **kwargs)
+
+class ItemWearStats(models.Model):
+    """Wear totals for one item in one weather bucket, kept current by wardrobe.stats"""
+    WEATHER_BUCKETS = [
+        ('hot', 'Hot'),
+        ('warm', 'Warm'),
+        ('mild', 'Mild'),
+        ('cold', 'Cold'),
+        ('unknown', 'Unknown'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    item = models.ForeignKey(ClothingItem, on_delete=models.CASCADE, related_name='wear_stats')
+    weather_bucket = models.CharField(max_length=10, choices=WEATHER_BUCKETS)
+    wear_count = models.PositiveIntegerField(default=0)
+    last_worn = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'weather_bucket'], name='unique_item_weather_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'weather_bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} ({self.weather_bucket}): {self.wear_count}"
+
+class Tombstone(models.Model):
+    """A deleted item or wear log, reported to clients by the sync feed (wardrobe.sync)"""
+    MODEL_CHOICES = [
+        ('clothing_item', 'Clothing item'),
+        ('wear_log', 'Wear log'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'model', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted {self.deleted_at}"
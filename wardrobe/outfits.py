@@ -0,0 +1,316 @@
+"""
+Outfit composition engine.
+
+Builds whole outfits out of a user's wardrobe instead of returning single
+items. Each item is reduced once to a handful of small integer/float codes
+(slot, weather suitability, color, formality, last worn) stored in compact
+``array`` columns, and those columns are cached per user. Ranking an outfit
+then only touches lookup tables, so scoring stays cheap for large closets.
+
+Search is a beam search over the UI's category slots: each slot is pruned
+to its best candidates by per-item score, and partial outfits are extended
+slot by slot keeping only the best ``BEAM_WIDTH`` combinations.
+"""
+import heapq
+import math
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ClothingItem
+
+FEATURES_CACHE_TIMEOUT = 60 * 60
+FEATURES_CACHE_KEY = 'wardrobe:outfit-features:{user_id}'
+
+# Slots filled by an outfit, in the order they are searched
+TOP, BOTTOM, SHOES, JACKET, ACCESSORY = range(5)
+SLOT_NAMES = ['top', 'bottom', 'shoes', 'jacket', 'accessory']
+
+CATEGORY_SLOTS = {
+    'shirt': TOP,
+    'dress': TOP,
+    'pants': BOTTOM,
+    'shoes': SHOES,
+    'jacket': JACKET,
+    'accessory': ACCESSORY,
+}
+# A dress fills the bottom slot as well as the top one
+FULL_BODY_CATEGORIES = {'dress'}
+
+WEATHER_CODES = {value: code for code, (value, _) in enumerate(ClothingItem.WEATHER_CHOICES)}
+COLOR_CODES = {value: code for code, (value, _) in enumerate(ClothingItem.COLOR_CHOICES)}
+
+# How well an item suited to the row weather works in the column weather.
+# Rows and columns follow ClothingItem.WEATHER_CHOICES: hot, warm, cool, cold, rainy.
+WEATHER_FIT = [
+    [1.0, 0.6, 0.1, 0.0, 0.2],
+    [0.6, 1.0, 0.6, 0.1, 0.4],
+    [0.1, 0.6, 1.0, 0.6, 0.6],
+    [0.0, 0.1, 0.6, 1.0, 0.5],
+    [0.1, 0.4, 0.6, 0.5, 1.0],
+]
+
+# Pairwise color compatibility, following ClothingItem.COLOR_CHOICES:
+# red, blue, yellow, white, black. Neutrals go with everything.
+COLOR_COMPATIBILITY = [
+    [0.5, 0.6, 0.4, 1.0, 1.0],
+    [0.6, 0.7, 0.7, 1.0, 1.0],
+    [0.4, 0.7, 0.5, 1.0, 0.9],
+    [1.0, 1.0, 1.0, 0.8, 1.0],
+    [1.0, 1.0, 0.9, 1.0, 0.9],
+]
+UNKNOWN_COLOR_SCORE = 0.75
+
+# Free-text formality values mapped onto a 0 (casual) to 3 (formal) scale
+FORMALITY_LEVELS = {
+    'athletic': 0,
+    'casual': 0,
+    'smart casual': 1,
+    'business casual': 1,
+    'business': 2,
+    'formal': 3,
+    'black tie': 3,
+}
+MAX_FORMALITY = 3
+
+# Days without wearing after which an item counts as completely fresh
+FRESHNESS_DAYS = 30
+
+WEIGHTS = {
+    'weather': 0.4,
+    'color': 0.25,
+    'formality': 0.15,
+    'freshness': 0.2,
+}
+
+CANDIDATES_PER_SLOT = 12
+BEAM_WIDTH = 40
+
+DEFAULT_OUTFITS = 3
+MAX_OUTFITS = 10
+# OpenWeather main conditions that call for rain-ready outfits
+RAINY_CONDITIONS = {'rain', 'drizzle', 'thunderstorm'}
+
+
+class WardrobeFeatures:
+    """Column-oriented, picklable feature arrays for one user's wardrobe."""
+
+    __slots__ = ('ids', 'slots', 'full_body', 'weather', 'colors', 'formality', 'last_worn')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.slots = array('b')
+        self.full_body = array('b')
+        self.weather = array('b')
+        self.colors = array('b')
+        self.formality = array('b')
+        # Seconds since the epoch, or NaN when the item was never worn
+        self.last_worn = array('d')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build features from ``(id, category, weather, color, formality, last_worn)`` rows"""
+        features = cls()
+        for item_id, category, weather, color, formality, last_worn in rows:
+            slot = CATEGORY_SLOTS.get(category)
+            if slot is None:
+                continue
+            features.ids.append(item_id)
+            features.slots.append(slot)
+            features.full_body.append(category in FULL_BODY_CATEGORIES)
+            features.weather.append(WEATHER_CODES.get(weather, -1))
+            features.colors.append(COLOR_CODES.get(color, -1))
+            features.formality.append(
+                FORMALITY_LEVELS.get((formality or '').strip().lower(), -1)
+            )
+            features.last_worn.append(last_worn.timestamp() if last_worn else math.nan)
+        return features
+
+    @classmethod
+    def for_user(cls, user):
+        """Load the user's cached features, building them on a miss"""
+        key = FEATURES_CACHE_KEY.format(user_id=user.pk)
+        features = cache.get(key)
+        if features is None:
+            rows = ClothingItem.objects.filter(owner=user).values_list(
+                'id', 'category', 'weather_suitability', 'color', 'formality', 'last_worn'
+            )
+            features = cls.from_rows(rows)
+            cache.set(key, features, FEATURES_CACHE_TIMEOUT)
+        return features
+
+    @classmethod
+    async def afor_user(cls, user):
+        """Async version of for_user()"""
+        key = FEATURES_CACHE_KEY.format(user_id=user.pk)
+        features = await cache.aget(key)
+        if features is None:
+            rows = ClothingItem.objects.filter(owner=user).values_list(
+                'id', 'category', 'weather_suitability', 'color', 'formality', 'last_worn'
+            )
+            features = cls.from_rows([row async for row in rows])
+            await cache.aset(key, features, FEATURES_CACHE_TIMEOUT)
+        return features
+
+
+def invalidate_features(user_id):
+    """
+    Drop a user's cached features after their wardrobe changed. Inside a
+    transaction this waits for the commit, since a request rebuilding them
+    before then would cache the old rows for the full timeout.
+    """
+    key = FEATURES_CACHE_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class OutfitEngine:
+    """Ranks complete outfits for a target weather suitability."""
+
+    def __init__(self, features, weather_suitability, formality=None, now=None):
+        self.features = features
+        self.target_weather = WEATHER_CODES.get(weather_suitability, -1)
+        self.target_formality = FORMALITY_LEVELS.get((formality or '').strip().lower())
+        self.now = (now or timezone.now()).timestamp()
+        self.item_scores = self._score_items()
+
+    def _score_items(self):
+        """Per-item score combining weather fit and rotation freshness"""
+        features = self.features
+        target = self.target_weather
+        now = self.now
+        horizon = FRESHNESS_DAYS * 86400
+        w_weather = WEIGHTS['weather']
+        w_fresh = WEIGHTS['freshness']
+
+        scores = array('d', bytes(8 * len(features)))
+        for i, (weather, last_worn) in enumerate(zip(features.weather, features.last_worn)):
+            fit = WEATHER_FIT[weather][target] if weather >= 0 and target >= 0 else 0.5
+            if math.isnan(last_worn):
+                freshness = 1.0
+            else:
+                freshness = min(max(now - last_worn, 0.0), horizon) / horizon
+            scores[i] = w_weather * fit + w_fresh * freshness
+        return scores
+
+    def _slot_rules(self):
+        """Return ``(required, allowed)`` flags for each slot given the weather"""
+        required = [True, True, True, False, False]
+        allowed = [True, True, True, True, True]
+        hot, warm = WEATHER_CODES['hot'], WEATHER_CODES['warm']
+        if self.target_weather == hot:
+            allowed[JACKET] = False
+        elif self.target_weather != warm:
+            required[JACKET] = True
+        return required, allowed
+
+    def _candidates(self):
+        """Best ``CANDIDATES_PER_SLOT`` item indices for each slot"""
+        by_slot = [[] for _ in SLOT_NAMES]
+        for i, slot in enumerate(self.features.slots):
+            by_slot[slot].append(i)
+        scores = self.item_scores
+        return [
+            heapq.nlargest(CANDIDATES_PER_SLOT, indices, key=scores.__getitem__)
+            for indices in by_slot
+        ]
+
+    def score(self, indices):
+        """Score an outfit given as a sequence of feature indices"""
+        features = self.features
+        n = len(indices)
+        if not n:
+            return 0.0
+
+        item_score = sum(self.item_scores[i] for i in indices) / n
+
+        colors = [features.colors[i] for i in indices]
+        pairs = 0
+        color_score = 0.0
+        for a in range(n):
+            for b in range(a + 1, n):
+                ca, cb = colors[a], colors[b]
+                if ca >= 0 and cb >= 0:
+                    color_score += COLOR_COMPATIBILITY[ca][cb]
+                else:
+                    color_score += UNKNOWN_COLOR_SCORE
+                pairs += 1
+        color_score = color_score / pairs if pairs else 1.0
+
+        levels = [features.formality[i] for i in indices if features.formality[i] >= 0]
+        if len(levels) >= 2:
+            formality_score = 1.0 - (max(levels) - min(levels)) / MAX_FORMALITY
+        else:
+            formality_score = 1.0
+        if self.target_formality is not None and levels:
+            distance = sum(abs(level - self.target_formality) for level in levels) / len(levels)
+            formality_score = (formality_score + 1.0 - distance / MAX_FORMALITY) / 2
+
+        return (
+            item_score
+            + WEIGHTS['color'] * color_score
+            + WEIGHTS['formality'] * formality_score
+        )
+
+    def rank(self, limit=3):
+        """Return up to ``limit`` ``(score, [feature indices])`` outfits, best first"""
+        candidates = self._candidates()
+        required, allowed = self._slot_rules()
+        full_body = self.features.full_body
+
+        beam = [()]
+        for slot in range(len(SLOT_NAMES)):
+            options = candidates[slot] if allowed[slot] else []
+            expanded = []
+            for partial in beam:
+                if slot == BOTTOM and partial and full_body[partial[0]]:
+                    expanded.append(partial)
+                    continue
+                expanded.extend(partial + (i,) for i in options)
+                if not required[slot] or not options:
+                    expanded.append(partial)
+            beam = heapq.nlargest(BEAM_WIDTH, expanded, key=self.score)
+
+        # Prefer outfits that differ from the ones already picked
+        chosen = []
+        for outfit in beam:
+            if all(len(set(outfit) & set(other)) * 2 <= len(outfit) for other in chosen):
+                chosen.append(outfit)
+                if len(chosen) == limit:
+                    break
+        for outfit in beam:
+            if len(chosen) == limit:
+                break
+            if outfit not in chosen:
+                chosen.append(outfit)
+        return [(self.score(outfit), list(outfit)) for outfit in chosen]
+
+
+def rank_outfits(features, weather_data, weather_suitability, limit=None, formality=None):
+    """
+    Rank outfits for the current weather and return ``(score, [item ids])``
+    pairs. ``limit`` may come straight from the query string.
+    """
+    try:
+        limit = max(1, min(int(limit or DEFAULT_OUTFITS), MAX_OUTFITS))
+    except ValueError:
+        limit = DEFAULT_OUTFITS
+    if weather_data.get('condition') in RAINY_CONDITIONS:
+        weather_suitability = 'rainy'
+
+    engine = OutfitEngine(features, weather_suitability, formality=formality)
+    return [
+        (score, [features.ids[i] for i in outfit])
+        for score, outfit in engine.rank(limit=limit)
+    ]
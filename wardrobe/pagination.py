@@ -0,0 +1,134 @@
+import json
+from functools import reduce
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    ``CursorPagination`` whose cursor holds every ordering column, not just
+    the first.
+
+    DRF's cursor keeps only ``ordering[0]`` and steps over rows sharing that
+    value with an offset, so bulk imports that put many rows on one
+    timestamp bring back offset scans. Here the position is the whole
+    ordering tuple, which ends in the primary key and so is unique: the next
+    page is the rows after ``(a, b) > (x, y)``, written out as
+    ``a >= x AND (a > x OR (a = x AND b > y))`` so the first column bounds
+    an index range scan. Ordering columns must not be null.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*[self._reversed(field) for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._after(self._decode_position(current_position), reverse))
+
+        # Positions are unique, so offsets only come from cursors made by
+        # plain CursorPagination
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @staticmethod
+    def _reversed(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _after(self, values, reverse):
+        """Rows following ``values`` in the current direction, as a Q"""
+        bounds = []
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            # Descending columns continue downwards, unless paging backwards
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            bounds.append((name, lookup, value))
+
+        name, lookup, value = bounds[0]
+        # Non-strict bound on the first column, for the index range
+        condition = Q(**{f'{name}__{lookup}e': value})
+        alternatives = [
+            Q(**{f'{earlier}': earlier_value for earlier, _, earlier_value in bounds[:index]},
+              **{f'{name}__{lookup}': value})
+            for index, (name, lookup, value) in enumerate(bounds)
+        ]
+        return condition & reduce(lambda left, right: left | right, alternatives)
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return json.dumps(values)
+
+
+class ClothingItemCursorPagination(KeysetCursorPagination):
+    """
+    Keyset pagination for the wardrobe list.
+
+    Pages are addressed by an opaque cursor on ``(created_at, id)`` instead
+    of an offset, so fetching page 50 costs the same index range scan as
+    page 1 (served by the ``(owner, created_at)`` index on ClothingItem).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+
+class WearLogCursorPagination(KeysetCursorPagination):
+    """
+    Keyset pagination for the wear history, newest first.
+
+    The cursor is a position on ``(date_worn, id)``, answered by the
+    ``(owner, date_worn)`` index however many years of logs precede it,
+    and however many logs share a timestamp.
+    """
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-date_worn', '-id')
@@ -0,0 +1,146 @@
+"""
+Resized renditions of clothing photos.
+
+Uploaded photos are often multi-megabyte phone pictures, while the UI shows
+them as small tiles. After an item's image is saved, a background thread
+decodes it once and writes each rendition in ``RENDITIONS`` as WebP plus a
+JPEG fallback next to the original. The stored names and pixel sizes are
+recorded on ``ClothingItem.renditions`` together with the source name they
+were built from, so stale renditions are easy to spot.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ClothingItem
+from .versions import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels; images are never upscaled
+RENDITIONS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide rendition thread pool, recreated after a fork"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_RENDITION_WORKERS,
+                    thread_name_prefix='renditions',
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def needs_renditions(item):
+    return bool(item.image) and item.renditions.get('source') != item.image.name
+
+
+def rendition_name(source_name, size, extension):
+    # Kept under the field's upload directory whatever layout the storage
+    # gives the original
+    directory = ClothingItem._meta.get_field('image').upload_to
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    return os.path.join(directory, 'renditions', f'{stem}-{size}.{extension}')
+
+
+def open_source(storage, name):
+    """Decode an uploaded photo upright and in RGB"""
+    with storage.open(name) as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+
+def build_renditions(storage, source_name):
+    """Write every rendition of ``source_name`` and return the mapping to store"""
+    source = open_source(storage, source_name)
+    renditions = {'source': source_name}
+    # Largest first, so each smaller size resamples the previous rendition
+    # rather than the full photo
+    image = source
+    for size, edge in sorted(RENDITIONS.items(), key=lambda entry: -entry[1]):
+        image = image.copy()
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        entry = {'width': image.width, 'height': image.height}
+        for extension, (pil_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, pil_format, **options)
+            name = rendition_name(source_name, size, extension)
+            # Content-addressed storages may share the file with other items
+            if storage.exists(name) and not getattr(storage, 'deduplicates', False):
+                storage.delete(name)
+            entry[extension] = storage.save(name, ContentFile(buffer.getvalue()))
+        renditions[size] = entry
+    return renditions
+
+
+def render_item(item_id, force=False):
+    """Build renditions for one item unless they are already current"""
+    try:
+        item = ClothingItem.objects.filter(pk=item_id).only('image', 'renditions', 'owner').first()
+        if item is None or not item.image or not (force or needs_renditions(item)):
+            return False
+        source_name = item.image.name
+        renditions = build_renditions(item.image.storage, source_name)
+        # Skip the write if the image was replaced while we were working
+        updated = ClothingItem.objects.filter(pk=item_id, image=source_name).update(
+            renditions=renditions, updated_at=timezone.now(),
+        )
+        if updated and item.owner_id:
+            bump_data_version(item.owner_id)
+        return bool(updated)
+    except Exception:
+        logger.exception("Could not build renditions for clothing item %s", item_id)
+        return False
+
+
+def render_item_in_thread(item_id, force=False):
+    try:
+        return render_item(item_id, force)
+    finally:
+        # Worker threads hold their own database connections
+        close_old_connections()
+
+
+def schedule_renditions(item):
+    """Build the item's renditions off the request thread once it is committed"""
+    if not needs_renditions(item):
+        return
+    item_id = item.pk
+
+    def submit():
+        if settings.IMAGE_RENDITION_WORKERS:
+            get_executor().submit(render_item_in_thread, item_id)
+        else:
+            render_item(item_id)
+    transaction.on_commit(submit)
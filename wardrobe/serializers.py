@@ -1,5 +1,53 @@
 from rest_framework import serializers
 from .models import ClothingItem, WearLog, WeatherLog, Weather
+from .renditions import FORMATS, RENDITIONS
+
+
+def requested_fields(request, path):
+    """
+    Field names picked by ``?fields=`` for the serializer at ``path`` (its
+    field names from the root), or None for all of them. ``items.name``
+    selects within nested serializers; naming a nested field alone keeps all
+    of its subfields.
+    """
+    if request is None or request.method != 'GET':
+        return None
+    param = request.query_params.get('fields') if hasattr(request, 'query_params') else request.GET.get('fields')
+    if not param:
+        return None
+    wanted = set()
+    for entry in param.split(','):
+        parts = entry.strip().split('.')
+        if parts[:len(path)] != path:
+            continue
+        if len(parts) == len(path):
+            return None
+        wanted.add(parts[len(path)])
+    return wanted or None
+
+
+class SparseFieldsetMixin:
+    """Serialize only the fields chosen with ``?fields=`` on GET requests"""
+
+    def field_path(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return path[::-1]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted = requested_fields(self.context.get('request'), self.field_path())
+        if wanted is None:
+            return fields
+        unknown = wanted - set(fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return {name: field for name, field in fields.items() if name in wanted}
+
 
 class WeatherSerializer(serializers.ModelSerializer):
     conditions = serializers.SerializerMethodField()
@@ -11,17 +59,64 @@ class WeatherSerializer(serializers.ModelSerializer):
     def get_conditions(self, obj):
         return obj.get_condition()
 
-class WeatherLogSerializer(serializers.ModelSerializer):
+class WeatherLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = WeatherLog
-        fields = '__all__'
+        exclude = ['fingerprint']
+
+class ClothingItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
-class ClothingItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = ClothingItem
         fields = '__all__'
 
-class WearLogSerializer(serializers.ModelSerializer):
+    def _url(self, storage, name):
+        url = storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_renditions(self, obj):
+        """Sizes and URLs of the resized images; empty until they are built"""
+        return self.rendition_urls(obj.image.name, obj.renditions)
+
+    def rendition_urls(self, image_name, stored):
+        """get_renditions() from the raw ``image`` and ``renditions`` column values"""
+        if not image_name or stored.get('source') != image_name:
+            return {}
+        storage = ClothingItem._meta.get_field('image').storage
+        renditions = {}
+        for size in RENDITIONS:
+            entry = stored.get(size)
+            if entry is None:
+                continue
+            renditions[size] = {'width': entry['width'], 'height': entry['height']}
+            for extension in FORMATS:
+                renditions[size][extension] = self._url(storage, entry[extension])
+        return renditions
+
+    def get_srcset(self, obj):
+        """A ``srcset`` value per format, for <picture> sources"""
+        return self.srcset_for(self.get_renditions(obj))
+
+    def srcset_for(self, renditions):
+        if not renditions:
+            return None
+        srcset = {}
+        for extension in FORMATS:
+            # Small photos give several renditions of the same width
+            by_width = {}
+            for entry in renditions.values():
+                by_width.setdefault(entry['width'], entry[extension])
+            srcset[extension] = ', '.join(f'{url} {width}w' for width, url in by_width.items())
+        return srcset
+
+class OutfitSerializer(serializers.Serializer):
+    score = serializers.FloatField()
+    items = ClothingItemSerializer(many=True)
+
+class WearLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = ClothingItemSerializer(many=True, read_only=True)
     weather_log = WeatherLogSerializer(read_only=True)
     item_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True)
@@ -32,9 +127,19 @@ class WearLogSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         item_ids = validated_data.pop('item_ids', [])
+        # {item id: owner id} when the view already looked them up, for record_wear()
+        item_owners = validated_data.pop('item_owners', None)
         wear_log = WearLog.objects.create(**validated_data)
         
         # Add items to the wear log
+        wear_log._item_owners = item_owners
         wear_log.items.add(*item_ids)
         
-        return wear_log 
\ No newline at end of file
+        return wear_log 
+
+class WearLogImportSerializer(serializers.Serializer):
+    """Validates a single entry of a bulk wear log import."""
+    item_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    date_worn = serializers.DateTimeField()
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    weather_log = WeatherLogSerializer(required=False, allow_null=True)
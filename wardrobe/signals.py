@@ -0,0 +1,97 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import ClothingItem, WearLog, Weather, WeatherLog
+from .outfits import invalidate_features
+from .renditions import schedule_renditions
+from .stats import record_wear, refresh_items, refresh_logs
+from .sync import record_deletion, touch_wear_logs
+from .versions import bump_data_version, bump_weather_version
+
+
+@receiver([post_save, post_delete], sender=ClothingItem)
+def clothing_item_changed(sender, instance, **kwargs):
+    """Drop the owner's precomputed outfit features and ETags when an item changes."""
+    if instance.owner_id:
+        invalidate_features(instance.owner_id)
+        bump_data_version(instance.owner_id)
+
+
+@receiver(post_delete, sender=ClothingItem)
+def clothing_item_deleted(sender, instance, origin=None, **kwargs):
+    record_deletion(instance, 'clothing_item', origin)
+
+
+@receiver(post_save, sender=ClothingItem)
+def clothing_item_saved(sender, instance, raw=False, **kwargs):
+    """Queue resized renditions when an item gets a new image."""
+    if not raw:
+        schedule_renditions(instance)
+
+
+@receiver(m2m_changed, sender=WearLog.items.through)
+def wear_log_items_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep wear stats in step with the items attached to wear logs."""
+    if action == 'post_add' and not reverse:
+        record_wear(instance, pk_set, getattr(instance, '_item_owners', None))
+    elif action == 'pre_clear':
+        # The cleared ids are gone by post_clear
+        if reverse:
+            instance._cleared_item_ids = [instance.pk]
+            instance._cleared_log_ids = list(instance.wearlog_set.values_list('id', flat=True))
+        else:
+            instance._cleared_item_ids = list(instance.items.values_list('id', flat=True))
+    elif action == 'post_clear':
+        refresh_items(getattr(instance, '_cleared_item_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_items([instance.pk] if reverse else pk_set)
+
+    if action == 'post_clear' and reverse:
+        touch_wear_logs(getattr(instance, '_cleared_log_ids', []))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        touch_wear_logs(pk_set if reverse else [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=WearLog)
+def wear_log_changed(sender, instance, **kwargs):
+    # Changes to its items and weather bump the version through wardrobe.stats
+    if instance.owner_id:
+        bump_data_version(instance.owner_id)
+
+
+@receiver(post_save, sender=WearLog)
+def wear_log_saved(sender, instance, created, raw=False, **kwargs):
+    """An edited log may have moved to another date or weather bucket."""
+    if not created and not raw:
+        refresh_logs([instance.pk])
+
+
+@receiver(pre_delete, sender=WearLog)
+def wear_log_deleting(sender, instance, **kwargs):
+    # Cascading deletes remove the item links without m2m_changed
+    instance._deleted_item_ids = list(instance.items.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=WearLog)
+def wear_log_deleted(sender, instance, origin=None, **kwargs):
+    """Lower the totals and last_worn of the items a deleted log named."""
+    refresh_items(getattr(instance, '_deleted_item_ids', []))
+    record_deletion(instance, 'wear_log', origin)
+
+
+@receiver(pre_delete, sender=WeatherLog)
+def weather_log_deleting(sender, instance, **kwargs):
+    # Its wear logs fall back to the 'unknown' bucket once it is gone
+    instance._wear_log_ids = list(instance.wearlog_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=WeatherLog)
+def weather_log_deleted(sender, instance, **kwargs):
+    wear_log_ids = getattr(instance, '_wear_log_ids', [])
+    touch_wear_logs(wear_log_ids)
+    refresh_logs(wear_log_ids)
+
+
+@receiver([post_save, post_delete], sender=Weather)
+def weather_changed(sender, instance, **kwargs):
+    bump_weather_version()
@@ -0,0 +1,156 @@
+"""
+Per-item wear statistics.
+
+``ItemWearStats`` holds, for every item, how often and how recently it was
+worn in each weather bucket. Adding items to a wear log increments the
+affected rows in place. Anything that can lower a total (removing items,
+deleting or editing a log, changing its weather) instead recomputes the
+affected items' rows and ``ClothingItem.last_worn`` with set-based SQL, the
+same statements the ``rebuild_wear_stats`` command runs for everything.
+"""
+from django.db import connection, transaction
+from django.db.models import (
+    Case, CharField, Count, F, FloatField, Max, OuterRef, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from .models import ClothingItem, ItemWearStats, WearLog
+from .outfits import invalidate_features
+from .versions import bump_data_version
+
+# Lower bounds of the average temperature (°F) for each bucket, matching
+# Weather.get_condition()
+BUCKET_THRESHOLDS = [
+    ('hot', 85),
+    ('warm', 70),
+    ('mild', 50),
+]
+
+
+def weather_bucket(weather_log):
+    """Bucket for a WeatherLog, or 'unknown' without one"""
+    if weather_log is None:
+        return 'unknown'
+    avg_temp = (weather_log.temp_high + weather_log.temp_low) / 2
+    for bucket, threshold in BUCKET_THRESHOLDS:
+        if avg_temp >= threshold:
+            return bucket
+    return 'cold'
+
+
+def bucket_expression(prefix):
+    """SQL version of weather_bucket() for the WeatherLog at ``prefix``"""
+    avg_temp = (F(f'{prefix}__temp_high') + F(f'{prefix}__temp_low')) / Value(2.0, output_field=FloatField())
+    return Case(
+        When(**{f'{prefix}__isnull': True}, then=Value('unknown')),
+        *[
+            When(GreaterThanOrEqual(avg_temp, threshold), then=Value(bucket))
+            for bucket, threshold in BUCKET_THRESHOLDS
+        ],
+        default=Value('cold'),
+        output_field=CharField(),
+    )
+
+
+def record_wear(wear_log, item_ids, owners=None):
+    """
+    Count one more wear of ``item_ids`` from ``wear_log`` and advance their
+    last_worn. ``owners`` is their ``{item id: owner id}``, when the caller
+    already has it.
+    """
+    if not item_ids:
+        return
+    bucket = weather_bucket(wear_log.weather_log)
+    if owners is None or not set(item_ids) <= owners.keys():
+        owners = dict(ClothingItem.objects.filter(id__in=item_ids).values_list('id', 'owner_id'))
+    else:
+        owners = {item_id: owners[item_id] for item_id in item_ids}
+    with transaction.atomic():
+        # Make sure every row exists, then bump them all in one atomic UPDATE
+        ItemWearStats.objects.bulk_create(
+            [
+                ItemWearStats(owner_id=owner_id, item_id=item_id, weather_bucket=bucket)
+                for item_id, owner_id in owners.items()
+            ],
+            ignore_conflicts=True,
+        )
+        date_worn = Value(wear_log.date_worn)
+        later = Greatest(Coalesce('last_worn', date_worn), date_worn)
+        ItemWearStats.objects.filter(item_id__in=owners, weather_bucket=bucket).update(
+            wear_count=F('wear_count') + 1,
+            last_worn=later,
+        )
+        ClothingItem.objects.filter(id__in=owners).update(last_worn=later, updated_at=timezone.now())
+
+    _items_changed(owners.values())
+
+
+def _items_changed(owner_ids):
+    """Drop what was derived from these owners' items"""
+    for owner_id in set(owner_ids):
+        if owner_id is not None:
+            invalidate_features(owner_id)
+            bump_data_version(owner_id)
+
+
+def _aggregate(item_ids=None):
+    """Stats rows as ``(owner, item, bucket, wear_count, last_worn)`` grouped in SQL"""
+    rows = WearLog.items.through.objects.all()
+    if item_ids is not None:
+        rows = rows.filter(clothingitem_id__in=item_ids)
+    return (
+        rows.annotate(bucket=bucket_expression('wearlog__weather_log'))
+        .values('clothingitem__owner_id', 'clothingitem_id', 'bucket')
+        .annotate(wear_count=Count('id'), last_worn=Max('wearlog__date_worn'))
+        .values_list('clothingitem__owner_id', 'clothingitem_id', 'bucket', 'wear_count', 'last_worn')
+        .order_by()
+    )
+
+
+def refresh_items(item_ids=None):
+    """
+    Recompute stats and ``last_worn`` for ``item_ids`` (every item when None)
+    with an INSERT ... SELECT and one UPDATE.
+    """
+    if item_ids is not None:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+
+    stats = ItemWearStats.objects.all()
+    items = ClothingItem.objects.all()
+    if item_ids is not None:
+        stats = stats.filter(item_id__in=item_ids)
+        items = items.filter(id__in=item_ids)
+
+    sql, params = _aggregate(item_ids).query.sql_with_params()
+    table = connection.ops.quote_name(ItemWearStats._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(ItemWearStats._meta.get_field(name).column)
+        for name in ('owner', 'item', 'weather_bucket', 'wear_count', 'last_worn')
+    )
+    latest = (
+        WearLog.objects.filter(items=OuterRef('pk'))
+        .order_by()
+        .values('items')
+        .annotate(latest=Max('date_worn'))
+        .values('latest')
+    )
+    with transaction.atomic():
+        stats.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO {table} ({columns}) {sql}', params)
+        items.update(last_worn=Subquery(latest), updated_at=timezone.now())
+        owner_ids = list(items.values_list('owner_id', flat=True).distinct())
+
+    _items_changed(owner_ids)
+
+
+def refresh_logs(wear_log_ids):
+    """Recompute stats for every item in the given wear logs"""
+    refresh_items(set(
+        WearLog.items.through.objects.filter(wearlog_id__in=wear_log_ids)
+        .values_list('clothingitem_id', flat=True)
+    ))
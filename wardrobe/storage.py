@@ -0,0 +1,46 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+# Names written by ContentAddressedStorage: <dir>/<2 hex>/<64 hex><ext>
+CONTENT_ADDRESSED_NAME = re.compile(r'(?:^|/)[0-9a-f]{2}/([0-9a-f]{64})(?:\.[A-Za-z0-9]+)?$')
+
+
+def content_digest(name):
+    """The sha256 a content-addressed name was built from, or None"""
+    match = CONTENT_ADDRESSED_NAME.search(name)
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that names files after the sha256 of their content.
+
+    ``clothing_items/photo.JPG`` is stored as
+    ``clothing_items/3f/3f9c…e1.jpg``: the upload directory is kept, the file
+    name becomes the digest (sharded by its first two characters) and the
+    extension is lower-cased. Saving bytes that are already stored returns the
+    existing name instead of writing a copy, and since a name can never point
+    at different content the files can be cached forever.
+    """
+    deduplicates = True
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        hexdigest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, hexdigest[:2], hexdigest + extension)
+        if self.exists(name):
+            return name
+        # A concurrent save of the same bytes makes the parent pick a
+        # suffixed name; that only costs a duplicate file
+        return super()._save(name, content)
@@ -0,0 +1,127 @@
+"""
+Incremental sync feed.
+
+``?since=<token>`` on the clothing item and wear log lists returns the rows
+created or updated after the token, the ids deleted after it (from
+``Tombstone`` rows written when items and logs are deleted), and a new token
+to send next time. ``since=0`` returns every row and is how a client starts.
+
+Tokens are server timestamps in microseconds. Rows are matched from slightly
+before the token (``SYNC_OVERLAP``), because a transaction may commit after a
+later timestamp was already handed out. A client therefore sees a few rows
+twice, and applying a row it already has must be harmless.
+
+Responses hold at most ``SYNC_PAGE_SIZE`` rows, in ``(updated_at, id)``
+order. When more are left, ``has_more`` is set and the token is a
+continuation ``<start>:<updated_at>:<id>``, which resumes after that row;
+the last page's token is the moment the first page was read, so rows
+committed while paging come back on the next sync.
+
+Deleting an item also drops it from the wear logs that listed it, without
+touching the logs, so clients remove deleted items from cached logs themselves.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Tombstone, WearLog
+
+SYNC_OVERLAP = timedelta(seconds=30)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class SyncTokenExpired(Exception):
+    """The token predates the tombstones still kept: the client must reload"""
+
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def _moment(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def encode_token(moment, after=None):
+    """
+    Token for a sync read at ``moment``; with ``after``, the last row sent
+    (an instance or ``values()`` dict), a continuation resuming past it.
+    """
+    if after is None:
+        return str(_micros(moment))
+    if isinstance(after, dict):
+        updated_at, pk = after['updated_at'], after['id']
+    else:
+        updated_at, pk = after.updated_at, after.pk
+    return f'{_micros(moment)}:{_micros(updated_at)}:{pk}'
+
+
+def decode_token(value):
+    """``(moment, after)``, ``after`` being the ``(updated_at, id)`` of a continuation or None"""
+    try:
+        parts = [int(part) for part in value.split(':')]
+    except (AttributeError, ValueError):
+        raise ValidationError({'since': 'Invalid sync token.'})
+    if len(parts) not in (1, 3) or min(parts) < 0:
+        raise ValidationError({'since': 'Invalid sync token.'})
+    if len(parts) == 1:
+        return _moment(parts[0]), None
+    return _moment(parts[0]), (_moment(parts[1]), parts[2])
+
+
+def changes(queryset, model, owner, since):
+    """
+    ``(changed, deleted_ids, moment)`` for ``queryset``'s rows of ``model``
+    (a Tombstone.model value) since the token ``since``. ``changed`` is in
+    feed order and ``moment`` is what the last page's token encodes.
+    """
+    moment, after = decode_token(since)
+    queryset = queryset.order_by('updated_at', 'id')
+    if after is not None:
+        # A later page: deletions were all sent with the first one
+        updated_at, pk = after
+        return queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk),
+            updated_at__gte=updated_at,
+        ), [], moment
+
+    now = timezone.now()
+    if moment == EPOCH:
+        return queryset, [], now
+
+    oldest = now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    if moment < oldest:
+        raise SyncTokenExpired()
+    moment -= SYNC_OVERLAP
+    deleted_ids = list(
+        Tombstone.objects.filter(owner=owner, model=model, deleted_at__gte=moment)
+        .values_list('object_id', flat=True)
+        .distinct()
+    )
+    return queryset.filter(updated_at__gte=moment), deleted_ids, now
+
+
+def record_deletion(instance, model, origin=None):
+    """Write the tombstone for a deleted row unless its owner is going too"""
+    if instance.owner_id is None:
+        return
+    if isinstance(origin, User) and origin.pk == instance.owner_id:
+        return
+    Tombstone.objects.create(owner_id=instance.owner_id, model=model, object_id=instance.pk)
+
+
+def prune_tombstones():
+    """Delete tombstones older than any token still accepted"""
+    oldest = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    return Tombstone.objects.filter(deleted_at__lt=oldest).delete()[0]
+
+
+def touch_wear_logs(wear_log_ids):
+    """Move wear logs into the feed after changes that don't save them"""
+    if wear_log_ids:
+        WearLog.objects.filter(id__in=wear_log_ids).update(updated_at=timezone.now())
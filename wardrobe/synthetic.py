@@ -0,0 +1,393 @@
+"""
+Synthetic wardrobes for benchmarking at production scale.
+
+Everything is derived from a seed: each user draws from its own
+``random.Random`` seeded with ``(seed, user number)``, and each city's
+weather from ``(seed, city)``, so the same arguments always produce the same
+data however the users are spread over worker processes.
+
+Weather follows a yearly temperature curve per city with day-to-day noise.
+Snapshots are shared per city and day, like the app's own ``WeatherLog``
+rows. Users pick a few favourite brands and colours, and wear some items far
+more often than others, preferring items suited to the day's weather.
+
+Rows are written in chunks: closets with ``bulk_create``, and the much
+larger wear log tables with multi-row INSERTs of plain tuples. No signals
+fire, so per-item stats are rebuilt afterwards with ``refresh_items()``.
+"""
+import datetime
+import math
+import random
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ClothingItem, Weather, WearLog, WeatherLog, weather_fingerprint
+from .stats import weather_bucket
+
+# name: (mean °F, seasonal swing °F, typical humidity %, rain propensity 0-1)
+CITIES = {
+    'Seattle, WA': (53, 12, 75, 0.55),
+    'Phoenix, AZ': (75, 17, 30, 0.08),
+    'Chicago, IL': (50, 23, 68, 0.35),
+    'Miami, FL': (77, 6, 76, 0.45),
+    'Denver, CO': (51, 19, 45, 0.25),
+    'New York, NY': (55, 20, 63, 0.35),
+    'Minneapolis, MN': (46, 28, 66, 0.3),
+    'Los Angeles, CA': (64, 7, 62, 0.12),
+}
+
+CATEGORY_WEIGHTS = {
+    'shirt': 30,
+    'pants': 18,
+    'shoes': 14,
+    'dress': 8,
+    'jacket': 12,
+    'accessory': 18,
+}
+
+COLOR_WEIGHTS = {
+    'black': 30,
+    'blue': 26,
+    'white': 22,
+    'yellow': 10,
+    'red': 12,
+}
+
+WEATHER_WEIGHTS = {
+    'cool': 35,
+    'warm': 25,
+    'hot': 15,
+    'cold': 15,
+    'rainy': 10,
+}
+
+# Suitabilities preferred for each weather_bucket(); rainy items on wet days
+BUCKET_SUITABILITY = {
+    'hot': {'hot', 'warm'},
+    'warm': {'warm', 'hot', 'cool'},
+    'mild': {'cool', 'warm'},
+    'cold': {'cold', 'cool'},
+    'unknown': {'hot', 'warm', 'cool', 'cold', 'rainy'},
+}
+RAINY_CHANCE = 60
+
+BRANDS = [
+    'Uniqlo', "Levi's", 'J.Crew', 'Everlane', 'Patagonia', 'Nike', 'Zara', 'H&M',
+    'Banana Republic', 'Brooks Brothers', 'Madewell', 'The North Face', 'Gap',
+    'Allen Edmonds', 'Converse', 'COS', 'Lululemon', 'Ralph Lauren', 'Theory', 'Reformation',
+]
+
+NOUNS = {
+    'shirt': ['Tee', 'Oxford', 'Polo', 'Henley', 'Sweater', 'Blouse', 'Flannel'],
+    'pants': ['Jeans', 'Chinos', 'Trousers', 'Shorts', 'Joggers', 'Skirt'],
+    'shoes': ['Sneakers', 'Boots', 'Loafers', 'Derbies', 'Sandals', 'Flats'],
+    'dress': ['Midi Dress', 'Wrap Dress', 'Shirt Dress', 'Slip Dress'],
+    'jacket': ['Blazer', 'Parka', 'Denim Jacket', 'Rain Shell', 'Peacoat', 'Puffer'],
+    'accessory': ['Belt', 'Scarf', 'Watch', 'Tie', 'Beanie', 'Tote'],
+}
+
+MATERIALS = {
+    'shirt': ['cotton', 'linen', 'wool', 'polyester'],
+    'pants': ['denim', 'cotton', 'wool', 'linen'],
+    'shoes': ['leather', 'canvas', 'suede', 'rubber'],
+    'dress': ['cotton', 'silk', 'linen', 'polyester'],
+    'jacket': ['wool', 'nylon', 'denim', 'down', 'leather'],
+    'accessory': ['leather', 'wool', 'silk', 'steel'],
+}
+
+SIZES = {
+    'shirt': ['S', 'M', 'L', 'XL'],
+    'pants': ['30x30', '32x32', '34x32', '36x34'],
+    'shoes': ['8', '9', '10', '11'],
+    'dress': ['2', '4', '6', '8'],
+    'jacket': ['S', 'M', 'L', 'XL'],
+    'accessory': ['One Size'],
+}
+
+FORMALITY_WEIGHTS = {
+    'casual': 55,
+    'smart casual': 25,
+    'business': 15,
+    'formal': 5,
+}
+
+# Median purchase price per category; prices are log-normal around it
+PRICES = {
+    'shirt': 40,
+    'pants': 60,
+    'shoes': 110,
+    'dress': 90,
+    'jacket': 150,
+    'accessory': 35,
+}
+
+# Hour of the day outfits are logged, local to the server
+LOG_HOURS = (6, 10)
+
+
+def history_days(years):
+    """The first and last day of ``years`` of history ending yesterday"""
+    last = timezone.localdate() - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=round(years * 365) - 1), last
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+
+
+def city_weather(seed, city, first_day, days):
+    """One WeatherLog per day for ``city``, unsaved"""
+    mean, swing, humidity, wetness = CITIES[city]
+    rng = random.Random(f'{seed}:weather:{city}')
+    snapshots = []
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        # Warmest around July 20th
+        season = math.cos(2 * math.pi * (day.timetuple().tm_yday - 201) / 365.25)
+        average = mean + swing * season + rng.gauss(0, 6)
+        spread = rng.uniform(8, 22)
+        fields = {
+            'date': day_start(day),
+            'location': city,
+            'temp_high': round(average + spread / 2, 1),
+            'temp_low': round(average - spread / 2, 1),
+            # Forecasts round to the nearest 10%
+            'precipitation_chance': float(round(rng.betavariate(1 + 4 * wetness, 5 - 4 * wetness) * 10) * 10),
+            'humidity': float(min(100, max(10, round(rng.gauss(humidity, 12))))),
+        }
+        fields['conditions'] = Weather(
+            temp_high=fields['temp_high'], temp_low=fields['temp_low'],
+            precipitation_chance=fields['precipitation_chance'], humidity=fields['humidity'],
+        ).get_condition()
+        snapshots.append(WeatherLog(fingerprint=weather_fingerprint(**fields), **fields))
+    return snapshots
+
+
+def create_weather(seed, first_day, days, batch_size):
+    """
+    Insert every city's snapshots (existing ones are kept) and return them
+    as ``{city: [(id, temp_high, temp_low, precipitation_chance) per day]}``.
+    """
+    ids = {}
+    for city in CITIES:
+        snapshots = city_weather(seed, city, first_day, days)
+        WeatherLog.objects.bulk_create(snapshots, batch_size=batch_size, ignore_conflicts=True)
+        fingerprints = [snapshot.fingerprint for snapshot in snapshots]
+        found = {}
+        for start in range(0, days, batch_size):
+            found.update(
+                WeatherLog.objects.filter(fingerprint__in=fingerprints[start:start + batch_size])
+                .values_list('fingerprint', 'id')
+            )
+        ids[city] = [
+            (found[snapshot.fingerprint], snapshot.temp_high, snapshot.temp_low, snapshot.precipitation_chance)
+            for snapshot in snapshots
+        ]
+    return ids
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), list(weights.values()))[0]
+
+
+class SyntheticUser:
+    """The closet and habits of one generated user"""
+
+    def __init__(self, seed, number, owner_id, item_count):
+        self.rng = rng = random.Random(f'{seed}:user:{number}')
+        self.owner_id = owner_id
+        self.item_count = item_count
+        self.city = rng.choice(list(CITIES))
+        # Days with a logged outfit, and how often a day gets a second one
+        self.diligence = rng.uniform(0.7, 0.98)
+        self.changes = rng.uniform(0, 0.06)
+        self.wears_dresses = rng.random() < 0.5
+        self.weather_logged = rng.uniform(0.8, 1)
+        self.favourite_brands = rng.sample(BRANDS, 4)
+        self.favourite_colors = dict(COLOR_WEIGHTS)
+        for color in rng.sample(list(COLOR_WEIGHTS), 2):
+            self.favourite_colors[color] *= 3
+        self.closet = []
+        self._weights = {}
+
+    def items(self):
+        """The unsaved closet, with at least a shirt, pants and shoes"""
+        rng = self.rng
+        categories = dict(CATEGORY_WEIGHTS)
+        if not self.wears_dresses:
+            del categories['dress']
+        items = []
+        for n in range(self.item_count):
+            category = ('shirt', 'pants', 'shoes')[n] if n < 3 else weighted(rng, categories)
+            color = weighted(rng, self.favourite_colors)
+            brand = rng.choice(self.favourite_brands) if rng.random() < 0.6 else rng.choice(BRANDS)
+            price = PRICES[category] * math.exp(rng.gauss(0, 0.5))
+            items.append(ClothingItem(
+                owner_id=self.owner_id,
+                name=f'{color.title()} {brand} {rng.choice(NOUNS[category])}',
+                category=category,
+                color=color,
+                weather_suitability=weighted(rng, WEATHER_WEIGHTS),
+                size=rng.choice(SIZES[category]),
+                brand=brand,
+                formality=weighted(rng, FORMALITY_WEIGHTS),
+                material=rng.choice(MATERIALS[category]),
+                purchase_price=Decimal(max(5, round(price))) - Decimal('0.01'),
+            ))
+        self.closet = items
+        return items
+
+    def rank_items(self):
+        """
+        Give each saved item a popularity so a few favourites dominate, as
+        they do in real closets (roughly Zipf distributed).
+        """
+        self.by_category = {}
+        for item in self.closet:
+            self.by_category.setdefault(item.category, []).append(item)
+        for category_items in self.by_category.values():
+            self.rng.shuffle(category_items)
+        self.popularity = {
+            item.pk: 1 / (rank + 1) ** 1.1
+            for category_items in self.by_category.values()
+            for rank, item in enumerate(category_items)
+        }
+
+    def pick(self, category, bucket, rainy):
+        """An item of ``category`` for the weather, or None without one"""
+        candidates = self.by_category.get(category)
+        if not candidates:
+            return None
+        key = (category, bucket, rainy)
+        if key not in self._weights:
+            suitable = BUCKET_SUITABILITY[bucket] | ({'rainy'} if rainy else set())
+            weights = [
+                self.popularity[item.pk] * (4 if item.weather_suitability in suitable else 0.5)
+                for item in candidates
+            ]
+            self._weights[key] = list(_accumulate(weights))
+        return self.rng.choices(candidates, cum_weights=self._weights[key])[0]
+
+    def outfit(self, weather):
+        rng = self.rng
+        bucket = weather_bucket(weather)
+        rainy = weather is not None and weather.precipitation_chance >= RAINY_CHANCE
+        if self.wears_dresses and rng.random() < 0.3:
+            picks = [self.pick('dress', bucket, rainy)]
+        else:
+            picks = [self.pick('shirt', bucket, rainy), self.pick('pants', bucket, rainy)]
+        picks.append(self.pick('shoes', bucket, rainy))
+        if rng.random() < {'cold': 0.9, 'mild': 0.5}.get(bucket, 0.1) or (rainy and rng.random() < 0.7):
+            picks.append(self.pick('jacket', bucket, rainy))
+        if rng.random() < 0.4:
+            picks.append(self.pick('accessory', bucket, rainy))
+        # A second pick of the only item of a category is still one item
+        return {item.pk: item for item in picks if item is not None}
+
+    def wear_logs(self, first_day, days, weather):
+        """``(date worn, weather log id, item ids)`` for every logged outfit"""
+        rng = self.rng
+        logs = []
+        for offset in range(days):
+            if rng.random() > self.diligence:
+                continue
+            day = first_day + datetime.timedelta(days=offset)
+            snapshot = weather[offset] if rng.random() < self.weather_logged else None
+            hours = [rng.uniform(*LOG_HOURS)]
+            if rng.random() < self.changes:
+                hours.append(rng.uniform(17, 21))
+            for hour in hours:
+                date_worn = day_start(day) + datetime.timedelta(hours=hour)
+                logs.append((date_worn, snapshot and snapshot.pk, list(self.outfit(snapshot))))
+        return logs
+
+
+def insert_rows(model, fields, rows, batch_size, returning=False):
+    """
+    Multi-row INSERTs of tuples of values already adapted for the database,
+    skipping model instances and the per-value preparation of bulk_create().
+    With ``returning`` the new primary keys are returned in row order.
+
+    RETURNING itself promises no row order (bulk_create() trusts it anyway),
+    so each batch's keys are sorted instead: keys drawn for one INSERT rise
+    in VALUES order, from a sequence on PostgreSQL and the rowid on SQLite.
+    """
+    fields = [model._meta.get_field(name) for name in fields]
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, rows) or batch_size)
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    suffix = f' RETURNING {connection.ops.quote_name(model._meta.pk.column)}' if returning else ''
+    placeholder = '(%s)' % ', '.join(['%s'] * len(fields))
+    ids = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholder] * len(batch))}{suffix}',
+                [value for row in batch for value in row],
+            )
+            if returning:
+                ids.extend(sorted(pk for pk, in cursor.fetchall()))
+    return ids
+
+
+def _accumulate(weights):
+    total = 0
+    for weight in weights:
+        total += weight
+        yield total
+
+
+_weather = None
+
+
+def init_worker(weather):
+    """Pool initializer: keep the snapshots create_weather() returned"""
+    global _weather
+    _weather = {
+        city: [
+            WeatherLog(pk=pk, temp_high=temp_high, temp_low=temp_low, precipitation_chance=precipitation_chance)
+            for pk, temp_high, temp_low, precipitation_chance in snapshots
+        ]
+        for city, snapshots in weather.items()
+    }
+
+
+def populate(users, seed, item_count, first_day, days, batch_size):
+    """
+    Fill the closets and wear history of ``users``, ``(number, owner id)``
+    pairs, in one transaction. Returns ``(users, items, wear logs, log items)``
+    counts.
+    """
+    totals = [len(users), 0, 0, 0]
+    Through = WearLog.items.through
+    with transaction.atomic():
+        generated = [SyntheticUser(seed, number, owner_id, item_count) for number, owner_id in users]
+        items = [item for user in generated for item in user.items()]
+        ClothingItem.objects.bulk_create(items, batch_size=batch_size)
+        totals[1] = len(items)
+
+        # Logs are generated and written per user to bound memory
+        adapt = connection.ops.adapt_datetimefield_value
+        now = adapt(timezone.now())
+        for user in generated:
+            user.rank_items()
+            logs = user.wear_logs(first_day, days, _weather[user.city])
+            rows = []
+            for date_worn, weather_log_id, _ in logs:
+                date_worn = adapt(date_worn)
+                rows.append((user.owner_id, date_worn, weather_log_id, '', date_worn, now))
+            log_ids = insert_rows(
+                WearLog, ['owner', 'date_worn', 'weather_log', 'notes', 'created_at', 'updated_at'],
+                rows, batch_size, returning=True,
+            )
+            rows = [
+                (log_id, item_id)
+                for log_id, (_, _, item_ids) in zip(log_ids, logs) for item_id in item_ids
+            ]
+            insert_rows(Through, ['wearlog', 'clothingitem'], rows, batch_size)
+            totals[2] += len(logs)
+            totals[3] += len(rows)
+    return totals
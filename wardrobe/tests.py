@@ -1,3 +1,1751 @@
-from django.test import TestCase
+"""
+Benchmarks of every route in wardrobe/urls.py, against a synthetic closet.
 
-# Create your tests here.
+Each request must run exactly its query budget. Budgets don't depend on
+the size of the data, so a change that makes them grow with the number of
+items or logs (an N+1 in a serializer, per-item saves) fails here.
+"""
+import asyncio
+import datetime
+import hashlib
+import importlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+from operator import itemgetter
+from pathlib import Path
+from unittest import mock
+
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import ExifTags, Image
+from prometheus_client import generate_latest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from config.benchmarks import TRANSACTION_CONTROL, EndpointBenchmark
+from config.frontend import FrontendShell
+from config.media import MEDIA_COOKIE
+from config.metrics import metrics_view, registry as metrics_registry
+from config.middleware import CsrfExemptMiddleware, RequestLoggingMiddleware, redact_headers
+from config.replicas import RequestRouting, pin
+from wardrobe import synthetic
+from wardrobe.admin import WearLogAdminForm
+from wardrobe.async_views import authenticate
+from wardrobe.models import (
+    ClothingItem, ItemWearStats, Tombstone, Weather, WearLog, WeatherLog, weather_fingerprint,
+)
+from wardrobe.outfits import (
+    DEFAULT_OUTFITS, FEATURES_CACHE_KEY, MAX_OUTFITS, OutfitEngine, WardrobeFeatures, rank_outfits,
+)
+from wardrobe.renditions import FORMATS, RENDITIONS, render_item_in_thread
+from wardrobe.serializers import ClothingItemSerializer, WearLogSerializer
+from wardrobe.storage import content_digest
+from wardrobe.stats import refresh_items, weather_bucket
+from wardrobe.sync import encode_token
+from wardrobe.upstream import (
+    AsyncUpstreamClient, CircuitBreaker, CircuitOpenError, UpstreamClient, max_duration,
+)
+from wardrobe.weather import WeatherService, async_weather_client, weather_client
+
+SEED = 22
+ITEMS = 150
+YEARS = 2
+BATCH_SIZE = 1000
+
+CURRENT_WEATHER = {
+    'temperature': 68.0,
+    'condition': 'clouds',
+    'description': 'broken clouds',
+    'humidity': 60,
+    'wind_speed': 5.0,
+}
+
+WEATHER_READINGS = {
+    'date': '2024-05-01T08:00:00Z',
+    'location': 'Chicago, IL',
+    'temp_high': 64.0,
+    'temp_low': 48.0,
+    'precipitation_chance': 20.0,
+    'humidity': 55.0,
+    'conditions': {'primary': 'mild', 'all': ['mild']},
+}
+
+
+class WardrobeBenchmark(EndpointBenchmark):
+    """
+    Users with synthetic closets and wear history, two by default; requests
+    are made as the first
+    """
+    users = 2
+    items = ITEMS
+    years = YEARS
+
+    @classmethod
+    def setUpTestData(cls):
+        first_day, last_day = synthetic.history_days(cls.years)
+        days = (last_day - first_day).days + 1
+        synthetic.init_worker(synthetic.create_weather(SEED, first_day, days, BATCH_SIZE))
+        cls.user = User.objects.create_user('bench', password=None)
+        owners = [cls.user, User.objects.create_user('bench-other', password=None)]
+        owners += [User.objects.create_user(f'bench-{number}', password=None) for number in range(2, cls.users)]
+        synthetic.populate(
+            [(number, owner.id) for number, owner in enumerate(owners)], SEED, cls.items, first_day, days, BATCH_SIZE,
+        )
+        refresh_items()
+
+        cls.token = Token.objects.create(user=cls.user)
+        cls.item_ids = list(
+            ClothingItem.objects.filter(owner=cls.user).order_by('id').values_list('id', flat=True)
+        )
+        cls.log_ids = list(
+            WearLog.objects.filter(owner=cls.user).order_by('id').values_list('id', flat=True)
+        )
+        cls.first_day = first_day
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Caches the token's user, as in a process that has served the client before
+        self.client.get('/api/health/')
+
+    def get(self, path, **kwargs):
+        return lambda: self.client.get(path, **kwargs)
+
+
+class ClothingItemEndpointTests(WardrobeBenchmark):
+    def test_list(self):
+        response = self.benchmark('GET clothing-items', self.get('/api/clothing-items/'), queries=2)
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertIn('facets', response.data)
+
+    def test_list_next_page(self):
+        next_page = self.client.get('/api/clothing-items/').data['next']
+        response = self.benchmark('GET clothing-items (page 2)', self.get(next_page), queries=1)
+        self.assertNotIn('facets', response.data)
+
+    def test_list_filtered(self):
+        self.benchmark(
+            'GET clothing-items?category=&color=',
+            self.get('/api/clothing-items/', data={'category': 'shirt,pants', 'color': 'black'}),
+            queries=2,
+        )
+
+    def test_list_sparse_fields(self):
+        response = self.benchmark(
+            'GET clothing-items?fields=',
+            self.get('/api/clothing-items/', data={'fields': 'id,name,category', 'page_size': 200}),
+            queries=2,
+        )
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'category'})
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self.client.get('/api/clothing-items/')
+        for page_size in (10, 200):
+            with self.assertQueryBudget(2):
+                self.client.get('/api/clothing-items/', data={'page_size': page_size})
+
+    def test_list_not_modified(self):
+        etag = self.client.get('/api/clothing-items/')['ETag']
+        self.benchmark(
+            'GET clothing-items (304)',
+            self.get('/api/clothing-items/', HTTP_IF_NONE_MATCH=etag),
+            queries=0, status=304,
+        )
+
+    def test_sync(self):
+        response = self.benchmark(
+            'GET clothing-items?since=0', self.get('/api/clothing-items/', data={'since': 0}), queries=1,
+        )
+        self.assertEqual(len(response.data['changed']), ITEMS)
+        self.assertFalse(response.data['has_more'])
+
+    def test_retrieve(self):
+        self.benchmark('GET clothing-items/<id>', self.get(f'/api/clothing-items/{self.item_ids[0]}/'), queries=1)
+
+    def test_create(self):
+        data = {
+            'name': 'Grey Wool Overcoat',
+            'category': 'jacket',
+            'color': 'black',
+            'weather_suitability': 'cold',
+            'brand': 'COS',
+            'purchase_price': '249.00',
+        }
+        self.benchmark(
+            'POST clothing-items',
+            lambda: self.client.post('/api/clothing-items/', data, format='json'),
+            queries=1, status=201,
+        )
+
+    def test_update(self):
+        path = f'/api/clothing-items/{self.item_ids[0]}/'
+        self.benchmark(
+            'PATCH clothing-items/<id>',
+            lambda: self.client.patch(path, {'name': 'Renamed'}, format='json'),
+            queries=2,
+        )
+
+    def test_delete(self):
+        ids = iter(self.item_ids)
+        self.benchmark(
+            'DELETE clothing-items/<id>',
+            lambda: self.client.delete(f'/api/clothing-items/{next(ids)}/'),
+            queries=5, status=204, warmup=False,
+        )
+
+    @mock.patch('wardrobe.weather.WeatherService._fetch_current', return_value=CURRENT_WEATHER)
+    def test_suggestions(self, fetch_current):
+        with self.settings(OPENWEATHER_API_KEY='benchmark'):
+            response = self.benchmark(
+                'GET clothing-items/suggestions',
+                self.get('/api/clothing-items/suggestions/', data={'city': 'Chicago'}),
+                queries=2,
+            )
+        self.assertTrue(response.data['outfits'])
+
+    @mock.patch('wardrobe.weather.WeatherService._fetch_current', return_value=CURRENT_WEATHER)
+    def test_suggestions_response(self, fetch_current):
+        with self.settings(OPENWEATHER_API_KEY='benchmark'):
+            response = self.client.get('/api/clothing-items/suggestions/', {'city': 'Chicago', 'limit': 2})
+        self.assertEqual(set(response.data), {'weather', 'suggestions', 'outfits'})
+        self.assertEqual(response.data['weather']['temperature'], CURRENT_WEATHER['temperature'])
+        self.assertLessEqual(len(response.data['suggestions']), 5)
+
+        outfits = response.data['outfits']
+        self.assertEqual(len(outfits), 2)
+        self.assertGreaterEqual(outfits[0]['score'], outfits[1]['score'])
+        for outfit in outfits:
+            self.assertEqual(set(outfit), {'score', 'items'})
+            self.assertTrue({item['id'] for item in outfit['items']} <= set(self.item_ids))
+            categories = [item['category'] for item in outfit['items']]
+            # 68°F is warm: a full outfit, a jacket optional
+            self.assertIn('shoes', categories)
+            self.assertTrue('dress' in categories or {'shirt', 'pants'} <= set(categories))
+
+
+class WearLogEndpointTests(WardrobeBenchmark):
+    def test_list(self):
+        response = self.benchmark('GET wear-logs', self.get('/api/wear-logs/'), queries=2)
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_list_next_page(self):
+        next_page = self.client.get('/api/wear-logs/').data['next']
+        self.benchmark('GET wear-logs (page 2)', self.get(next_page), queries=2)
+
+    def test_list_date_range(self):
+        after = self.first_day + datetime.timedelta(days=90)
+        self.benchmark(
+            'GET wear-logs?date_worn_after=&date_worn_before=',
+            self.get('/api/wear-logs/', data={
+                'date_worn_after': after.isoformat(),
+                'date_worn_before': (after + datetime.timedelta(days=30)).isoformat(),
+            }),
+            queries=2,
+        )
+
+    def test_list_matches_the_serializer(self):
+        response = self.client.get('/api/wear-logs/', data={'page_size': 200})
+        ids = [log['id'] for log in response.data['results']]
+        logs = (
+            WearLog.objects.filter(pk__in=ids).select_related('weather_log').prefetch_related('items')
+            .order_by('-date_worn', '-id')
+        )
+        expected = WearLogSerializer(logs, many=True, context={'request': RequestFactory().get('/')}).data
+
+        def normalized(results):
+            # The item order within a log is unspecified either way
+            return [
+                {**log, 'items': sorted((dict(item) for item in log['items']), key=itemgetter('id'))}
+                for log in results
+            ]
+        self.assertEqual(normalized(response.data['results']), normalized(expected))
+        self.assertTrue(any(log['weather_log'] is None for log in expected))
+        self.assertTrue(any(log['weather_log'] is not None for log in expected))
+
+    def test_list_sparse_fields(self):
+        response = self.benchmark(
+            'GET wear-logs?fields=',
+            self.get('/api/wear-logs/', data={'fields': 'id,date_worn,weather_log.temp_high', 'page_size': 200}),
+            queries=1,
+        )
+        results = response.data['results']
+        self.assertEqual(set(results[0]), {'id', 'date_worn', 'weather_log'})
+        self.assertEqual({frozenset(log['weather_log']) for log in results if log['weather_log']}, {frozenset({'temp_high'})})
+
+        response = self.client.get('/api/wear-logs/', data={'fields': 'id,items.name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'items'})
+        self.assertEqual({frozenset(item) for log in response.data['results'] for item in log['items']}, {frozenset({'name'})})
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self.client.get('/api/wear-logs/')
+        for page_size in (10, 200):
+            with self.assertQueryBudget(2):
+                self.client.get('/api/wear-logs/', data={'page_size': page_size})
+
+    def test_pages_through_logs_sharing_a_timestamp(self):
+        moment = timezone.now() + datetime.timedelta(days=1)
+        created = WearLog.objects.bulk_create([WearLog(owner=self.user, date_worn=moment) for _ in range(70)])
+        pages, seen, path = [], [], '/api/wear-logs/?page_size=30'
+        for _ in range(3):
+            with CaptureQueriesContext(connections['default']) as queries:
+                response = self.client.get(path)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+            pages.append(response.data)
+            seen += [log['id'] for log in response.data['results']]
+            path = response.data['next']
+        self.assertEqual(seen[:70], sorted((log.id for log in created), reverse=True))
+
+        # And back again from the third page
+        previous = self.client.get(pages[2]['previous']).data
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_sync(self):
+        response = self.benchmark(
+            'GET wear-logs?since=0', self.get('/api/wear-logs/', data={'since': 0}), queries=2,
+        )
+        self.assertEqual(len(response.data['changed']), min(len(self.log_ids), settings.SYNC_PAGE_SIZE))
+        self.assertEqual(response.data['has_more'], len(self.log_ids) > settings.SYNC_PAGE_SIZE)
+
+    def test_retrieve(self):
+        self.benchmark('GET wear-logs/<id>', self.get(f'/api/wear-logs/{self.log_ids[0]}/'), queries=2)
+
+    def test_calendar(self):
+        month = (self.first_day + datetime.timedelta(days=60)).strftime('%Y-%m')
+        response = self.benchmark(
+            'GET wear-logs/calendar', self.get('/api/wear-logs/calendar/', data={'month': month}), queries=1,
+        )
+        self.assertTrue(response.data['days'])
+
+    def test_create(self):
+        data = {
+            'item_ids': self.item_ids[:4],
+            'date_worn': timezone.now().isoformat(),
+            'notes': 'Benchmark',
+            'weather_log': WEATHER_READINGS,
+        }
+        response = self.benchmark(
+            'POST wear-logs',
+            lambda: self.client.post('/api/wear-logs/', data, format='json'),
+            queries=10, status=201,
+        )
+        self.assertEqual(len(response.data['items']), 4)
+
+    def test_create_rejects_malformed_weather(self):
+        readings = {key: value for key, value in WEATHER_READINGS.items() if key != 'temp_high'}
+        for weather_log in (readings, 'sunny', ['mild'], {**WEATHER_READINGS, 'humidity': 'damp'}):
+            data = {'item_ids': self.item_ids[:2], 'date_worn': timezone.now().isoformat(), 'weather_log': weather_log}
+            response = self.client.post('/api/wear-logs/', data, format='json')
+            self.assertEqual(response.status_code, 400, weather_log)
+            self.assertIn('weather_log', response.data)
+        self.assertEqual(WearLog.objects.filter(owner=self.user).count(), len(self.log_ids))
+
+    def test_create_queries_do_not_grow_with_items(self):
+        for item_ids in (self.item_ids[:2], self.item_ids[:12]):
+            data = {'item_ids': item_ids, 'date_worn': timezone.now().isoformat()}
+            with self.assertQueryBudget(9):
+                self.client.post('/api/wear-logs/', data, format='json')
+
+    def test_bulk(self):
+        moment = timezone.now() - datetime.timedelta(days=YEARS * 365 + 30)
+        logs = [
+            {
+                'item_ids': self.item_ids[n % 50:n % 50 + 3],
+                'date_worn': (moment + datetime.timedelta(days=n)).isoformat(),
+                'weather_log': {**WEATHER_READINGS, 'temp_high': 60.0 + n % 10},
+            }
+            for n in range(50)
+        ]
+        response = self.benchmark(
+            'POST wear-logs/bulk (50 logs)',
+            lambda: self.client.post('/api/wear-logs/bulk/', {'logs': logs}, format='json'),
+            queries=8, status=201,
+        )
+        self.assertEqual(response.data['created'], 50)
+
+    def test_delete(self):
+        ids = iter(self.log_ids)
+        self.benchmark(
+            'DELETE wear-logs/<id>',
+            lambda: self.client.delete(f'/api/wear-logs/{next(ids)}/'),
+            queries=10, status=204, warmup=False,
+        )
+
+    def test_weather_suggestions(self):
+        self.benchmark(
+            'GET wear-logs/get_weather_suggestions', self.get('/api/wear-logs/get_weather_suggestions/'), queries=1,
+        )
+
+
+class WeatherEndpointTests(WardrobeBenchmark):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        today = timezone.localdate()
+        Weather.objects.bulk_create([
+            Weather(
+                date=today - datetime.timedelta(days=offset),
+                temp_high=70 - offset % 15, temp_low=50 - offset % 15,
+                precipitation_chance=offset * 7 % 100, humidity=40 + offset % 50,
+            )
+            for offset in range(1, 61)
+        ])
+        cls.weather = Weather.objects.order_by('date').first()
+
+    def test_list(self):
+        self.benchmark('GET weather', self.get('/api/weather/'), queries=1)
+
+    def test_retrieve(self):
+        self.benchmark('GET weather/<id>', self.get(f'/api/weather/{self.weather.pk}/'), queries=1)
+
+    def test_current(self):
+        # Without an API key the sample forecast is stored
+        with self.settings(OPENWEATHER_API_KEY=''):
+            self.benchmark('GET weather/current', self.get('/api/weather/current/'), queries=0)
+
+
+class AnalyticsEndpointTests(WardrobeBenchmark):
+    def test_analytics(self):
+        response = self.benchmark('GET analytics', self.get('/api/analytics/'), queries=2)
+        self.assertEqual(len(response.data['items']), ITEMS)
+
+    def test_health(self):
+        self.benchmark('GET health', self.get('/api/health/'), queries=0)
+
+    def test_api_root(self):
+        self.benchmark('GET api root', self.get('/api/'), queries=0)
+
+
+class LargeClosetBenchmarks(WardrobeBenchmark):
+    """
+    The list and history routes over 40 users with 300 items and five years
+    of logs each, about 60,000 wear logs: budgets must hold, and the timings
+    show scans that the small closet hides.
+    """
+    users = 40
+    items = 300
+    years = 5
+
+    def test_item_list(self):
+        response = self.benchmark('GET clothing-items', self.get('/api/clothing-items/'), queries=2)
+        self.assertEqual(len(response.data['results']), 50)
+
+    def test_item_list_last_page(self):
+        path = '/api/clothing-items/?page_size=200'
+        while True:
+            response = self.client.get(path)
+            if response.data['next'] is None:
+                break
+            path = response.data['next']
+        self.benchmark('GET clothing-items (last page)', self.get(path), queries=1)
+
+    def test_item_list_filtered(self):
+        self.benchmark(
+            'GET clothing-items?category=&color=',
+            self.get('/api/clothing-items/', data={'category': 'shirt,pants', 'color': 'black'}),
+            queries=2,
+        )
+
+    def test_wear_log_list(self):
+        response = self.benchmark('GET wear-logs', self.get('/api/wear-logs/'), queries=2)
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_wear_log_list_oldest_year(self):
+        after = self.first_day + datetime.timedelta(days=30)
+        response = self.benchmark(
+            'GET wear-logs?date_worn_after= (oldest year)',
+            self.get('/api/wear-logs/', data={
+                'date_worn_after': after.isoformat(),
+                'date_worn_before': (after + datetime.timedelta(days=365)).isoformat(),
+            }),
+            queries=2,
+        )
+        self.assertTrue(response.data['next'])
+
+    def test_wear_log_calendar(self):
+        month = (self.first_day + datetime.timedelta(days=60)).strftime('%Y-%m')
+        response = self.benchmark(
+            'GET wear-logs/calendar', self.get('/api/wear-logs/calendar/', data={'month': month}), queries=1,
+        )
+        self.assertTrue(response.data['days'])
+
+    def test_wear_log_sync(self):
+        response = self.benchmark(
+            'GET wear-logs?since=0', self.get('/api/wear-logs/', data={'since': 0}), queries=2,
+        )
+        self.assertEqual(len(response.data['changed']), settings.SYNC_PAGE_SIZE)
+        self.assertTrue(response.data['has_more'])
+
+    def test_analytics(self):
+        response = self.benchmark('GET analytics', self.get('/api/analytics/'), queries=2)
+        self.assertEqual(len(response.data['items']), self.items)
+
+
+class WearStatsTests(WardrobeBenchmark):
+    """ItemWearStats and last_worn match the wear logs after every kind of write"""
+
+    def assertStatsMatchLogs(self, item_ids):
+        expected = {}
+        last_worn = {item_id: None for item_id in item_ids}
+        logs = WearLog.objects.filter(items__in=item_ids).select_related('weather_log').distinct()
+        for log in logs.prefetch_related('items'):
+            bucket = weather_bucket(log.weather_log)
+            for item in log.items.all():
+                if item.id not in last_worn:
+                    continue
+                count, latest = expected.get((item.id, bucket), (0, log.date_worn))
+                expected[item.id, bucket] = (count + 1, max(latest, log.date_worn))
+                last_worn[item.id] = max(filter(None, [last_worn[item.id], log.date_worn]))
+        stats = {
+            (item_id, bucket): (count, latest)
+            for item_id, bucket, count, latest in ItemWearStats.objects.filter(item_id__in=item_ids)
+            .values_list('item_id', 'weather_bucket', 'wear_count', 'last_worn')
+        }
+        self.assertEqual(stats, expected)
+        self.assertEqual(
+            dict(ClothingItem.objects.filter(id__in=item_ids).values_list('id', 'last_worn')), last_worn,
+        )
+
+    def test_create(self):
+        item_ids = self.item_ids[:3]
+        response = self.client.post('/api/wear-logs/', {
+            'item_ids': item_ids,
+            'date_worn': timezone.now().isoformat(),
+            'weather_log': WEATHER_READINGS,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertStatsMatchLogs(item_ids)
+
+    def test_bulk_import(self):
+        moment = timezone.now() - datetime.timedelta(days=YEARS * 365 + 30)
+        logs = [
+            {
+                'item_ids': self.item_ids[n:n + 3],
+                'date_worn': (moment + datetime.timedelta(days=n)).isoformat(),
+                'weather_log': {**WEATHER_READINGS, 'temp_high': 60.0 + n * 10},
+            }
+            for n in range(5)
+        ]
+        response = self.client.post('/api/wear-logs/bulk/', {'logs': logs}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertStatsMatchLogs(self.item_ids[:7])
+
+    def test_item_removed_from_log(self):
+        log = WearLog.objects.filter(owner=self.user).prefetch_related('items').order_by('-date_worn').first()
+        item = log.items.all()[0]
+        log.items.remove(item)
+        self.assertStatsMatchLogs([item.id])
+
+    def test_delete(self):
+        log = WearLog.objects.filter(owner=self.user).order_by('date_worn').first()
+        item_ids = list(log.items.values_list('id', flat=True))
+        self.assertEqual(self.client.delete(f'/api/wear-logs/{log.id}/').status_code, 204)
+        self.assertStatsMatchLogs(item_ids)
+
+    def test_deleting_the_latest_log_restores_last_worn(self):
+        item_id = self.item_ids[0]
+        previous = ClothingItem.objects.get(id=item_id).last_worn
+        response = self.client.post('/api/wear-logs/', {
+            'item_ids': [item_id], 'date_worn': timezone.now().isoformat(),
+        }, format='json')
+        self.assertGreater(ClothingItem.objects.get(id=item_id).last_worn, previous)
+
+        self.client.delete(f"/api/wear-logs/{response.data['id']}/")
+        self.assertEqual(ClothingItem.objects.get(id=item_id).last_worn, previous)
+        self.assertStatsMatchLogs([item_id])
+
+
+class SyncFeedTests(WardrobeBenchmark):
+    """The ?since= feed: paging, tombstones and expired tokens"""
+
+    def sync(self, path, since):
+        """Follow ``has_more`` from ``since``; returns the pages"""
+        pages = [self.client.get(path, {'since': since}).data]
+        while pages[-1]['has_more']:
+            pages.append(self.client.get(path, {'since': pages[-1]['token']}).data)
+        return pages
+
+    @override_settings(SYNC_PAGE_SIZE=40)
+    def test_pages_through_every_row(self):
+        for path, ids in (('/api/clothing-items/', self.item_ids), ('/api/wear-logs/', self.log_ids)):
+            pages = self.sync(path, 0)
+            self.assertTrue(all(len(page['changed']) <= 40 for page in pages))
+            seen = [row['id'] for page in pages for row in page['changed']]
+            self.assertEqual(sorted(seen), ids)
+            # The last token is a plain moment, not a continuation
+            self.assertNotIn(':', pages[-1]['token'])
+
+    @override_settings(SYNC_PAGE_SIZE=40)
+    def test_rows_written_while_paging_come_back_next_sync(self):
+        ClothingItem.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        pages = [self.client.get('/api/clothing-items/', {'since': 0}).data]
+        # Already sent on the first page
+        self.client.patch(f'/api/clothing-items/{self.item_ids[0]}/', {'name': 'Renamed'}, format='json')
+        while pages[-1]['has_more']:
+            pages.append(self.client.get('/api/clothing-items/', {'since': pages[-1]['token']}).data)
+        changed = self.sync('/api/clothing-items/', pages[-1]['token'])[0]['changed']
+        self.assertEqual([(row['id'], row['name']) for row in changed], [(self.item_ids[0], 'Renamed')])
+
+    def test_deletions_are_listed(self):
+        token = self.sync('/api/clothing-items/', 0)[-1]['token']
+        self.client.delete(f'/api/clothing-items/{self.item_ids[0]}/')
+        feed = self.client.get('/api/clothing-items/', {'since': token}).data
+        self.assertEqual(feed['deleted'], [self.item_ids[0]])
+        self.assertNotIn(self.item_ids[0], [row['id'] for row in feed['changed']])
+
+    def test_deleting_the_owner_writes_no_tombstones(self):
+        other = User.objects.get(username='bench-other')
+        self.assertTrue(ClothingItem.objects.filter(owner=other).exists())
+        other.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_expired_token(self):
+        moment = timezone.now() - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1)
+        response = self.client.get('/api/clothing-items/', {'since': encode_token(moment)})
+        self.assertEqual(response.status_code, 410)
+
+    def test_invalid_token(self):
+        for since in ('soon', '1:2', '-1'):
+            response = self.client.get('/api/wear-logs/', {'since': since})
+            self.assertEqual(response.status_code, 400)
+
+
+class WriteConsistencyTests(WardrobeBenchmark):
+    """Caches derived from a user's rows are only dropped once the write commits"""
+
+    def test_features_are_dropped_on_commit(self):
+        WardrobeFeatures.for_user(self.user)
+        key = FEATURES_CACHE_KEY.format(user_id=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/clothing-items/{self.item_ids[0]}/', {'name': 'Renamed'}, format='json')
+            # Not yet committed: a rebuild now would read the old rows
+            self.assertIsNotNone(cache.get(key))
+        self.assertIsNone(cache.get(key))
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get('/api/clothing-items/')['ETag']
+        self.client.patch(f'/api/clothing-items/{self.item_ids[0]}/', {'name': 'Renamed'}, format='json')
+        response = self.client.get('/api/clothing-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_item_list_after_wear_log_is_not_stale(self):
+        item_id = self.item_ids[0]
+        path = f'/api/clothing-items/?fields=id,last_worn&page_size={ITEMS}'
+        worn = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/wear-logs/', {'item_ids': [item_id], 'date_worn': worn.isoformat()}, format='json')
+            # An ETag handed out before the commit may describe the old rows
+            etag = self.client.get(path)['ETag']
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        item = next(item for item in response.data['results'] if item['id'] == item_id)
+        self.assertEqual(item['last_worn'], worn.isoformat().replace('+00:00', 'Z'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(WardrobeBenchmark):
+    """Reads go to the replica unless the request or a recent one by the same user wrote"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        replica = connections['replica']
+        if replica.vendor == 'sqlite':
+            # The mirror is a second connection to the shared in-memory test
+            # database; let it read the test transaction's rows without locking
+            with replica.cursor() as cursor:
+                cursor.execute('PRAGMA read_uncommitted = 1')
+
+    def queries(self, request):
+        """Run ``request`` and return the number of queries sent to each alias"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            request()
+        return {
+            alias: sum(not TRANSACTION_CONTROL.match(query['sql']) for query in context.captured_queries)
+            for alias, context in (('default', primary), ('replica', replica))
+        }
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.queries(self.get('/api/clothing-items/')), {'default': 0, 'replica': 2})
+        self.assertEqual(self.queries(self.get('/api/wear-logs/')), {'default': 0, 'replica': 2})
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        path = f'/api/clothing-items/{self.item_ids[0]}/'
+        self.assertEqual(
+            self.queries(lambda: self.client.patch(path, {'name': 'Renamed'}, format='json')),
+            {'default': 2, 'replica': 0},
+        )
+        self.assertEqual(self.queries(self.get(path)), {'default': 1, 'replica': 0})
+
+        # Other users are not pinned
+        other = APIClient()
+        other.force_authenticate(User.objects.get(username='bench-other'))
+        self.assertEqual(self.queries(lambda: other.get('/api/clothing-items/')), {'default': 0, 'replica': 2})
+
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            self.client.patch(path, {'name': 'Renamed again'}, format='json')
+        self.assertEqual(self.queries(self.get(path)), {'default': 0, 'replica': 1})
+
+    def test_async_views_route_by_the_token_user(self):
+        request = RequestFactory().get(
+            '/api/clothing-items/suggestions/', HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+        # What AuthenticationMiddleware leaves for a request without a session
+        request.user = AnonymousUser()
+        routing = RequestRouting(request)
+        user, _ = async_to_sync(authenticate)(request)
+        self.assertEqual(request.user, self.user)
+        pin(user)
+        self.assertEqual(routing.read_alias(), 'default')
+
+
+class OutfitEngineTests(SimpleTestCase):
+    """Ranking on fixed feature arrays, without the database"""
+    NOW = datetime.datetime(2025, 1, 15, 12, tzinfo=datetime.timezone.utc)
+
+    def closet(self, *rows):
+        """Features for ``(category, weather, color, formality, last_worn)`` rows, ids from 1"""
+        return WardrobeFeatures.from_rows([(number, *row) for number, row in enumerate(rows, 1)])
+
+    def rank(self, features, weather, limit=3, **kwargs):
+        engine = OutfitEngine(features, weather, now=self.NOW, **kwargs)
+        return [(score, [features.ids[i] for i in outfit]) for score, outfit in engine.rank(limit)]
+
+    def categories(self, ids, rows):
+        return [rows[item_id - 1][0] for item_id in ids]
+
+    def test_score(self):
+        features = self.closet(
+            ('shirt', 'cool', 'white', 'casual', None),
+            ('pants', 'cool', 'black', 'casual', None),
+            ('shoes', 'cool', 'white', 'casual', None),
+        )
+        engine = OutfitEngine(features, 'cool', now=self.NOW)
+        # Perfect weather fit, never worn: 0.4 + 0.2 per item. Colors
+        # white/black 1.0, white/white 0.8, black/white 1.0. One formality.
+        expected = 0.6 + 0.25 * (2.8 / 3) + 0.15 * 1.0
+        self.assertAlmostEqual(engine.score([0, 1, 2]), expected)
+
+    def test_freshness_and_weather_fit(self):
+        yesterday = self.NOW - datetime.timedelta(days=1)
+        rows = [
+            ('shirt', 'cool', 'white', '', yesterday),
+            ('shirt', 'cool', 'white', '', None),
+            ('shirt', 'hot', 'white', '', None),
+            ('pants', 'cool', 'black', '', None),
+            ('shoes', 'cool', 'black', '', None),
+        ]
+        features = self.closet(*rows)
+        scores = OutfitEngine(features, 'cool', now=self.NOW).item_scores
+        # Fresh and suited beats worn yesterday, which beats unsuited
+        self.assertGreater(scores[1], scores[0])
+        self.assertGreater(scores[0], scores[2])
+        (_, best), = self.rank(features, 'cool', limit=1)
+        self.assertEqual(best, [2, 4, 5])
+
+    def test_slot_rules(self):
+        rows = [
+            ('dress', 'cold', 'black', '', None),
+            ('shirt', 'cold', 'red', '', None),
+            ('pants', 'cold', 'yellow', '', None),
+            ('shoes', 'cold', 'black', '', None),
+            ('jacket', 'cold', 'white', '', None),
+            ('accessory', 'cold', 'white', '', None),
+        ]
+        features = self.closet(*rows)
+        for weather in ('cold', 'cool', 'rainy'):
+            for _, ids in self.rank(features, weather, limit=5):
+                categories = self.categories(ids, rows)
+                # A dress is never paired with a top or bottom
+                if 'dress' in categories:
+                    self.assertNotIn('shirt', categories)
+                    self.assertNotIn('pants', categories)
+                else:
+                    self.assertIn('shirt', categories)
+                    self.assertIn('pants', categories)
+                self.assertIn('shoes', categories)
+                self.assertIn('jacket', categories)
+        # Never a jacket when it's hot
+        for _, ids in self.rank(features, 'hot', limit=5):
+            self.assertNotIn('jacket', self.categories(ids, rows))
+
+    def test_jacket_is_optional_when_warm(self):
+        rows = [
+            ('shirt', 'warm', 'white', '', None),
+            ('pants', 'warm', 'black', '', None),
+            ('shoes', 'warm', 'white', '', None),
+            ('jacket', 'cold', 'red', '', None),
+        ]
+        outfits = self.rank(self.closet(*rows), 'warm', limit=2)
+        self.assertEqual([ids for _, ids in outfits], [[1, 2, 3], [1, 2, 3, 4]])
+
+    def test_limit_and_order(self):
+        rows = [('shirt', 'cool', color, '', None) for color in ('white', 'black', 'blue')]
+        rows += [('pants', 'cool', 'black', '', None), ('shoes', 'cool', 'black', '', None)]
+        rows += [('jacket', 'cool', color, '', None) for color in ('white', 'black')]
+        features = self.closet(*rows)
+        outfits = self.rank(features, 'cool', limit=4)
+        self.assertEqual(len(outfits), 4)
+        scores = [score for score, _ in outfits]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        # Equal scores keep closet order, so results are repeatable
+        self.assertEqual(outfits, self.rank(features, 'cool', limit=4))
+
+        weather = {'condition': 'clear'}
+        for limit, expected in ((None, DEFAULT_OUTFITS), ('2', 2), ('500', MAX_OUTFITS), ('x', DEFAULT_OUTFITS)):
+            self.assertEqual(len(rank_outfits(features, weather, 'cool', limit=limit)), min(expected, 6))
+
+    def test_ties_keep_closet_order(self):
+        rows = [('shirt', 'cool', 'white', '', None)] * 3 + [
+            ('pants', 'cool', 'black', '', None),
+            ('shoes', 'cool', 'black', '', None),
+            ('jacket', 'cool', 'black', '', None),
+        ]
+        outfits = self.rank(self.closet(*rows), 'cool', limit=3)
+        self.assertEqual([ids[0] for _, ids in outfits], [1, 2, 3])
+
+    def test_rain_prefers_rainy_items(self):
+        rows = [
+            ('shirt', 'rainy', 'white', '', None),
+            ('shirt', 'warm', 'white', '', None),
+            ('pants', 'rainy', 'black', '', None),
+            ('shoes', 'rainy', 'black', '', None),
+            ('jacket', 'rainy', 'black', '', None),
+        ]
+        (_, best), = rank_outfits(self.closet(*rows), {'condition': 'rain'}, 'warm', limit=1)
+        self.assertIn(1, best)
+        self.assertIn(5, best)
+
+    def test_large_closet_latency(self):
+        rng = random.Random(SEED)
+        categories = [category for category, _ in ClothingItem.CATEGORY_CHOICES]
+        weathers = [weather for weather, _ in ClothingItem.WEATHER_CHOICES]
+        colors = [color for color, _ in ClothingItem.COLOR_CHOICES]
+        features = self.closet(*[
+            (
+                rng.choice(categories), rng.choice(weathers), rng.choice(colors),
+                rng.choice(['casual', 'business', '']),
+                self.NOW - datetime.timedelta(days=rng.randrange(90)) if rng.random() < 0.8 else None,
+            )
+            for _ in range(2000)
+        ])
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            outfits = rank_outfits(features, CURRENT_WEATHER, 'cool', limit=MAX_OUTFITS)
+            timings.append(time.perf_counter() - started)
+        self.assertEqual(len(outfits), MAX_OUTFITS)
+        self.assertLess(min(timings), 0.05)
+
+
+class FakeClock:
+    """Stands in for the ``time`` module: sleeping only moves the clock on"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class WeatherCacheTests(SimpleTestCase):
+    """Single-flight refreshes and stale-while-revalidate in WeatherService"""
+    KEY = 'weather:current:test'
+
+    def setUp(self):
+        cache.clear()
+        self.service = WeatherService()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def blocking_fetch(self, value):
+        def fetch():
+            self.calls += 1
+            self.release.wait(5)
+            return value
+        return fetch
+
+    def run_threads(self, target, count):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_concurrent_misses_make_one_upstream_call(self):
+        threads, results = self.run_threads(
+            lambda: self.service._get_cached(self.KEY, self.blocking_fetch({'temperature': 70}), 60), 5,
+        )
+        time.sleep(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'temperature': 70}] * 5)
+
+    def test_async_concurrent_misses_make_one_upstream_call(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def fetch():
+                self.calls += 1
+                await release.wait()
+                return {'temperature': 70}
+
+            waiting = [asyncio.create_task(self.service._aget_cached(self.KEY, fetch, 60)) for _ in range(5)]
+            await asyncio.sleep(0.2)
+            release.set()
+            return await asyncio.gather(*waiting)
+
+        results = asyncio.run(scenario())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'temperature': 70}] * 5)
+
+    def test_stale_value_is_served_while_a_refresh_runs(self):
+        clock = FakeClock()
+        with mock.patch('wardrobe.weather.time', clock):
+            self.service._get_cached(self.KEY, lambda: 'old', 60)
+            clock.now += 61
+
+            threads, refreshed = self.run_threads(
+                lambda: self.service._get_cached(self.KEY, self.blocking_fetch('new'), 60), 1,
+            )
+            while not cache.get(f'{self.KEY}:lock'):
+                time.sleep(0.01)
+            # Another request meanwhile gets the stale value at once
+            unexpected = mock.Mock(side_effect=AssertionError('second upstream call'))
+            self.assertEqual(self.service._get_cached(self.KEY, unexpected, 60), 'old')
+
+            self.release.set()
+            threads[0].join()
+            self.assertEqual(refreshed, ['new'])
+            self.assertEqual(self.service._get_cached(self.KEY, unexpected, 60), 'new')
+        self.assertEqual(self.calls, 1)
+        self.assertIsNone(cache.get(f'{self.KEY}:lock'))
+
+    def test_failed_refresh_keeps_the_stale_value(self):
+        clock = FakeClock()
+        with mock.patch('wardrobe.weather.time', clock):
+            self.service._get_cached(self.KEY, lambda: 'old', 60)
+            clock.now += 61
+            self.assertEqual(self.service._get_cached(self.KEY, lambda: None, 60), 'old')
+            # The lock is released, so the next request tries again
+            self.assertEqual(self.service._get_cached(self.KEY, lambda: 'new', 60), 'new')
+
+    def test_cold_cache_waits_at_most_the_lock_timeout(self):
+        clock = FakeClock()
+        cache.add(f'{self.KEY}:lock', True, 60)
+        with mock.patch('wardrobe.weather.time', clock):
+            started = clock.now
+            self.assertIsNone(self.service._get_cached(self.KEY, lambda: 'unused', 60))
+        self.assertGreaterEqual(clock.now - started, WeatherService.LOCK_TIMEOUT)
+        self.assertLess(clock.now - started, WeatherService.LOCK_TIMEOUT + 2 * WeatherService.POLL_INTERVAL)
+
+    def test_lock_outlasts_the_slowest_refresh(self):
+        # Three attempts of 2 s connect + 4 s read, and backoffs of up to 0.2 s and 0.4 s
+        self.assertAlmostEqual(max_duration(2, 4, 2, 0.2), 18.6)
+        self.assertGreaterEqual(WeatherService.LOCK_TIMEOUT, weather_client.max_duration)
+        self.assertGreaterEqual(WeatherService.LOCK_TIMEOUT, async_weather_client.max_duration)
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.service._get_cached(self.KEY, lambda: 'value', 60)
+        add.assert_called_once_with(f'{self.KEY}:lock', True, WeatherService.LOCK_TIMEOUT)
+
+
+class FakeSession:
+    """
+    Stands in for a requests.Session: each get() plays the next scripted
+    outcome, a status code, ``'timeout'`` (which uses up the read timeout on
+    the clock) or an exception.
+    """
+
+    def __init__(self, clock, outcomes):
+        self.clock = clock
+        self.outcomes = list(outcomes)
+        self.timeouts = []
+
+    def get(self, url, params=None, timeout=None):
+        self.timeouts.append(timeout)
+        outcome = self.outcomes.pop(0)
+        if outcome == 'timeout':
+            self.clock.now += timeout[1]
+            raise requests.Timeout('read timed out')
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.url = url
+        return response
+
+
+class UpstreamClientTests(SimpleTestCase):
+    """Retries, deadline and circuit breaker against a fake transport and clock"""
+    URL = 'http://weather.test/weather'
+
+    def setUp(self):
+        self.clock = FakeClock()
+        for patcher in (
+            mock.patch('wardrobe.upstream.time', self.clock),
+            # The longest backoff every time
+            mock.patch('wardrobe.upstream.random', mock.Mock(uniform=lambda low, high: high)),
+            mock.patch('wardrobe.upstream.logger'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    def upstream(self, outcomes, **kwargs):
+        options = {'connect_timeout': 2, 'read_timeout': 4, 'max_retries': 2, 'backoff': 0.2}
+        client = UpstreamClient(breaker=self.breaker, **{**options, **kwargs})
+        client._session = FakeSession(self.clock, outcomes)
+        client._pid = os.getpid()
+        return client
+
+    def test_retries_with_backoff_until_success(self):
+        client = self.upstream([503, 'timeout', 200])
+        self.assertEqual(client.get(self.URL).status_code, 200)
+        self.assertEqual(len(client.session.timeouts), 3)
+        # One read timeout, then backoffs of 0.2 s and 0.4 s
+        self.assertAlmostEqual(self.clock.now - FakeClock().now, 4.6)
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual(self.breaker._failures, 0)
+
+    def test_gives_up_after_max_retries(self):
+        client = self.upstream([503] * 5)
+        with self.assertRaises(requests.HTTPError):
+            client.get(self.URL)
+        self.assertEqual(len(client.session.timeouts), 3)
+
+    def test_client_errors_are_not_retried(self):
+        client = self.upstream([404, 200])
+        with self.assertRaises(requests.HTTPError):
+            client.get(self.URL)
+        self.assertEqual(len(client.session.timeouts), 1)
+        # The upstream answered: not a failure
+        self.assertEqual(self.breaker._failures, 0)
+
+    def test_other_request_errors_are_not_retried(self):
+        client = self.upstream([requests.exceptions.InvalidURL('bad'), 200])
+        with self.assertRaises(requests.exceptions.InvalidURL):
+            client.get(self.URL)
+        self.assertEqual(self.breaker._failures, 1)
+
+    def test_deadline_bounds_the_whole_call(self):
+        client = self.upstream(['timeout'] * 3, deadline=5)
+        started = self.clock.now
+        with self.assertRaises(requests.Timeout):
+            client.get(self.URL)
+        # 4 s timeout and a 0.2 s backoff leave 0.8 s for the second attempt;
+        # a third would start after the deadline
+        timeouts = client.session.timeouts
+        self.assertEqual(len(timeouts), 2)
+        self.assertEqual(timeouts[0], (2, 4))
+        self.assertAlmostEqual(timeouts[1][1], 0.8)
+        self.assertLessEqual(self.clock.now - started, 5 + 1e-9)
+
+    def test_max_duration(self):
+        self.assertAlmostEqual(self.upstream([]).max_duration, 18.6)
+        self.assertEqual(self.upstream([], deadline=5).max_duration, 5)
+
+    def test_circuit_opens_and_fails_fast(self):
+        client = self.upstream(['timeout'] * 3 + [200], max_retries=0)
+        for _ in range(3):
+            with self.assertRaises(requests.Timeout):
+                client.get(self.URL)
+        self.assertTrue(self.breaker.is_open)
+        with self.assertRaises(CircuitOpenError):
+            client.get(self.URL)
+        self.assertEqual(len(client.session.timeouts), 3)
+
+    def test_retries_stop_once_the_circuit_opens(self):
+        client = self.upstream([503] * 10, max_retries=8)
+        with self.assertRaises(requests.HTTPError):
+            client.get(self.URL)
+        self.assertEqual(len(client.session.timeouts), 3)
+
+    def test_half_open_probe(self):
+        client = self.upstream([503, 503, 503, 503, 200, 200], max_retries=0)
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                client.get(self.URL)
+
+        # Still open just before the reset timeout
+        self.clock.now += 29
+        with self.assertRaises(CircuitOpenError):
+            client.get(self.URL)
+
+        # One probe goes through; a failed one opens the circuit again
+        self.clock.now += 1
+        with self.assertRaises(requests.HTTPError):
+            client.get(self.URL)
+        self.assertTrue(self.breaker.is_open)
+        with self.assertRaises(CircuitOpenError):
+            client.get(self.URL)
+
+        # While a probe is in flight other calls still fail fast
+        self.clock.now += 30
+        self.breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.breaker.record_failure()
+
+        # A successful probe closes it
+        self.clock.now += 30
+        self.assertEqual(client.get(self.URL).status_code, 200)
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual(client.get(self.URL).status_code, 200)
+
+    def test_async_client_retries_within_the_deadline(self):
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request.extensions['timeout'])
+            if len(requests_seen) == 1:
+                return httpx.Response(503)
+            # Uses up the read timeout
+            self.clock.now += request.extensions['timeout']['read']
+            raise httpx.ReadTimeout('read timed out', request=request)
+
+        async def sleep(seconds):
+            self.clock.now += seconds
+
+        client = AsyncUpstreamClient(
+            connect_timeout=2, read_timeout=4, max_retries=5, backoff=0.2, deadline=6,
+            breaker=self.breaker, transport=httpx.MockTransport(handler),
+        )
+        started = self.clock.now
+        with mock.patch('wardrobe.upstream.asyncio.sleep', sleep), self.assertRaises(httpx.ReadTimeout):
+            asyncio.run(client.get(self.URL))
+        # 503, a 0.2 s backoff, a full 4 s attempt, a 0.4 s backoff, then an
+        # attempt cut to the 1.4 s left
+        self.assertEqual([timeout['read'] for timeout in requests_seen[:2]], [4, 4])
+        self.assertAlmostEqual(requests_seen[2]['read'], 1.4)
+        self.assertEqual(len(requests_seen), 3)
+        self.assertLessEqual(self.clock.now - started, 6 + 1e-9)
+
+    def test_async_client_per_event_loop(self):
+        upstream = AsyncUpstreamClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+
+        async def call():
+            await upstream.get(self.URL)
+            await upstream.get(self.URL)
+            return upstream.client
+
+        first = asyncio.run(call())
+        second = asyncio.run(call())
+        # Pooled connections belong to the loop that opened them
+        self.assertIsNot(first, second)
+        # The closed loop's client is not kept around
+        self.assertNotIn(first, list(upstream._clients.values()))
+
+        async def reopen():
+            closed = upstream.client
+            await upstream.aclose()
+            return closed, upstream.client
+
+        closed, reopened = asyncio.run(reopen())
+        self.assertTrue(closed.is_closed)
+        self.assertIsNot(closed, reopened)
+
+
+class WearLogAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin-owner', password=None)
+        cls.other = User.objects.create_user('admin-other', password=None)
+        cls.item = ClothingItem.objects.create(owner=cls.user, name='Tee', category='shirt', color='white')
+        cls.other_item = ClothingItem.objects.create(owner=cls.other, name='Jeans', category='pants', color='blue')
+
+    def form(self, items, instance=None):
+        now = timezone.now()
+        return WearLogAdminForm(
+            {'items': [item.pk for item in items], 'date_worn': now, 'created_at': now, 'notes': ''},
+            instance=instance,
+        )
+
+    def test_owner_is_taken_from_the_items(self):
+        form = self.form([self.item])
+        self.assertTrue(form.is_valid(), form.errors)
+        log = form.save()
+        self.assertEqual(log.owner, self.user)
+        self.assertEqual(WearLog.objects.filter(owner=self.user).count(), 1)
+
+    def test_owner_follows_edited_items(self):
+        log = WearLog.objects.create(date_worn=timezone.now())
+        form = self.form([self.other_item], instance=log)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().owner, self.other)
+
+    def test_items_of_several_users_are_rejected(self):
+        self.assertFalse(self.form([self.item, self.other_item]).is_valid())
+
+
+class WeatherSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('snapshots', password=None)
+
+    def test_identical_readings_share_a_snapshot(self):
+        snapshot = WeatherLog.objects.get_snapshot(**WEATHER_READINGS)
+        self.assertEqual(WeatherLog.objects.get_snapshot(**WEATHER_READINGS), snapshot)
+        [same, other] = WeatherLog.objects.get_snapshots([
+            WEATHER_READINGS, {**WEATHER_READINGS, 'temp_high': 70.0},
+        ])
+        self.assertEqual(same, snapshot)
+        self.assertNotEqual(other, snapshot)
+        self.assertEqual(WeatherLog.objects.count(), 2)
+
+    def test_saved_snapshots_cannot_change(self):
+        snapshot = WeatherLog.objects.get_snapshot(**WEATHER_READINGS)
+        logs = [
+            WearLog.objects.create(owner=self.user, date_worn=timezone.now(), weather_log=snapshot)
+            for _ in range(2)
+        ]
+        snapshot.temp_high = 90.0
+        with self.assertRaises(ValueError):
+            snapshot.save()
+        for log in logs:
+            log.refresh_from_db()
+            self.assertEqual(log.weather_log.temp_high, WEATHER_READINGS['temp_high'])
+
+    def test_admin_cannot_add_or_change(self):
+        request = RequestFactory().get('/admin/')
+        request.user = User(is_staff=True, is_superuser=True)
+        model_admin = admin.site._registry[WeatherLog]
+        self.assertFalse(model_admin.has_add_permission(request))
+        self.assertFalse(model_admin.has_change_permission(request))
+        self.assertTrue(model_admin.has_view_permission(request))
+        self.assertTrue(model_admin.has_delete_permission(request))
+
+
+class WeatherSnapshotMigrationTests(TransactionTestCase):
+    """0006 fingerprints existing snapshots and merges the duplicates"""
+    before = [('wardrobe', '0005_clothingitem_purchase_price_itemwearstats')]
+    after = [('wardrobe', '0007_alter_weatherlog_fingerprint')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_duplicates_are_merged(self):
+        apps = self.migrate(self.before)
+        OldWeatherLog = apps.get_model('wardrobe', 'WeatherLog')
+        OldWearLog = apps.get_model('wardrobe', 'WearLog')
+        readings = {key: value for key, value in WEATHER_READINGS.items() if key != 'location'}
+        readings['date'] = timezone.make_aware(datetime.datetime(2024, 5, 1, 8))
+        snapshots = [
+            OldWeatherLog.objects.create(**readings),
+            OldWeatherLog.objects.create(**readings),
+            OldWeatherLog.objects.create(**{**readings, 'temp_high': 70.0}),
+            OldWeatherLog.objects.create(**readings),
+        ]
+        owner = apps.get_model('auth', 'User').objects.create(username='migrated')
+        logs = [
+            OldWearLog.objects.create(owner_id=owner.pk, date_worn=readings['date'], weather_log=snapshot)
+            for snapshot in snapshots
+        ]
+        unlogged = OldWearLog.objects.create(owner_id=owner.pk, date_worn=readings['date'])
+
+        apps = self.migrate(self.after)
+        NewWeatherLog = apps.get_model('wardrobe', 'WeatherLog')
+        NewWearLog = apps.get_model('wardrobe', 'WearLog')
+        kept, different = snapshots[0].pk, snapshots[2].pk
+        self.assertEqual(sorted(NewWeatherLog.objects.values_list('pk', flat=True)), [kept, different])
+        self.assertEqual(
+            [NewWearLog.objects.get(pk=log.pk).weather_log_id for log in logs], [kept, kept, different, kept],
+        )
+        self.assertIsNone(NewWearLog.objects.get(pk=unlogged.pk).weather_log_id)
+        # The fingerprints are the ones the live model computes
+        for snapshot in NewWeatherLog.objects.all():
+            fields = {field: getattr(snapshot, field) for field in WEATHER_READINGS}
+            self.assertEqual(snapshot.fingerprint, weather_fingerprint(**fields))
+
+
+class MiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('middleware', password=None)
+        ClothingItem.objects.create(owner=cls.user, name='Tee', category='shirt', color='white')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def api_client(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return client
+
+    def test_request_logging_redacts_credentials(self):
+        middleware = RequestLoggingMiddleware(lambda request: HttpResponse())
+        request = self.factory.get(
+            '/api/clothing-items/', HTTP_AUTHORIZATION='Token secret-token',
+            HTTP_COOKIE='sessionid=secret-session', HTTP_X_CSRFTOKEN='secret-csrf', HTTP_ACCEPT='application/json',
+        )
+        with self.assertLogs('config.middleware', 'DEBUG') as logs:
+            middleware(request)
+        output = '\n'.join(logs.output)
+        self.assertNotIn('secret', output)
+        self.assertIn('application/json', output)
+        self.assertEqual(redact_headers({'Authorization': 'Token x', 'Accept': '*/*'}), {
+            'Authorization': '[redacted]', 'Accept': '*/*',
+        })
+
+    @override_settings(CSRF_EXEMPT_URLS=[r'^/api/accounts/login/', r'^/api/accounts/register/'])
+    def test_csrf_exempt_patterns(self):
+        middleware = CsrfExemptMiddleware(lambda request: HttpResponse())
+        cases = {
+            '/api/accounts/login/': True,
+            '/api/accounts/register/': True,
+            # The doubled prefix some clients send
+            '/api/api/accounts/login/': True,
+            '/api/clothing-items/': False,
+            '/static/api/accounts/login/': False,
+        }
+        for path, exempt in cases.items():
+            with self.subTest(path=path):
+                request = self.factory.post(path)
+                middleware(request)
+                self.assertEqual(getattr(request, '_dont_enforce_csrf_checks', False), exempt)
+
+    @override_settings(CSRF_EXEMPT_URLS=[])
+    def test_csrf_exempt_unused_without_patterns(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            CsrfExemptMiddleware(lambda request: HttpResponse())
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing(self):
+        response = self.api_client().get('/api/clothing-items/')
+        self.assertEqual(response.status_code, 200)
+        metrics = dict(
+            metric.split(';', 1) for metric in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(metrics), {'mw', 'auth', 'view', 'db', 'render', 'total'})
+        self.assertRegex(metrics['db'], r'^dur=\d+\.\d;desc="queries: \d+"$')
+        durations = {name: float(re.match(r'dur=([\d.]+)', value)[1]) for name, value in metrics.items()}
+        # Exclusive phases add up to the total
+        self.assertAlmostEqual(
+            sum(duration for name, duration in durations.items() if name != 'total'), durations['total'], delta=0.35,
+        )
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        response = self.api_client().get('/api/clothing-items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+
+def photo(width, height, orientation=None, mode='RGB'):
+    """An in-memory JPEG (PNG when it has alpha), optionally EXIF-rotated"""
+    image = Image.new(mode, (width, height), 'red')
+    buffer = BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[ExifTags.Base.Orientation] = orientation
+    image.save(buffer, 'PNG' if 'A' in mode else 'JPEG', exif=exif)
+    return SimpleUploadedFile('photo.png' if 'A' in mode else 'photo.jpg', buffer.getvalue())
+
+
+class RenditionTests(TestCase):
+    """Photo renditions, built inline (no thread pool) in a temporary MEDIA_ROOT"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('renditions', password=None)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = self.settings(MEDIA_ROOT=media.name, IMAGE_RENDITION_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def create(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = ClothingItem.objects.create(
+                owner=self.user, name='Shirt', category='shirt', color='red', image=image,
+            )
+        item.refresh_from_db()
+        return item
+
+    def scheduled(self, callbacks):
+        """The rendition builds among on_commit callbacks"""
+        return [callback for callback in callbacks if callback.__qualname__.startswith('schedule_renditions.')]
+
+    def stored(self, name):
+        with default_storage.open(name) as f:
+            image = Image.open(f)
+            image.load()
+        return image
+
+    def test_sizes_and_formats(self):
+        item = self.create(photo(2000, 1000))
+        self.assertEqual(item.renditions['source'], item.image.name)
+        sizes = {size: (item.renditions[size]['width'], item.renditions[size]['height']) for size in RENDITIONS}
+        self.assertEqual(sizes, {'thumb': (160, 80), 'card': (480, 240), 'full': (1280, 640)})
+        for size in RENDITIONS:
+            for extension, (pil_format, _) in FORMATS.items():
+                with self.subTest(size=size, extension=extension):
+                    name = item.renditions[size][extension]
+                    self.assertTrue(name.startswith('clothing_items/renditions/'))
+                    image = self.stored(name)
+                    self.assertEqual(image.format, pil_format)
+                    self.assertEqual(image.size, sizes[size])
+
+    def test_small_photos_are_not_upscaled(self):
+        item = self.create(photo(300, 200))
+        sizes = {size: (item.renditions[size]['width'], item.renditions[size]['height']) for size in RENDITIONS}
+        self.assertEqual(sizes, {'thumb': (160, 107), 'card': (300, 200), 'full': (300, 200)})
+
+    def test_exif_orientation_is_applied(self):
+        # Orientation 6: stored landscape, displayed rotated a quarter turn
+        item = self.create(photo(400, 200, orientation=6))
+        self.assertEqual((item.renditions['full']['width'], item.renditions['full']['height']), (200, 400))
+        self.assertEqual(self.stored(item.renditions['full']['jpeg']).size, (200, 400))
+
+    def test_transparency_is_flattened(self):
+        item = self.create(photo(100, 100, mode='RGBA'))
+        self.assertEqual(self.stored(item.renditions['thumb']['jpeg']).mode, 'RGB')
+
+    def test_built_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            item = ClothingItem.objects.create(
+                owner=self.user, name='Shirt', category='shirt', color='red', image=photo(600, 600),
+            )
+            # Nothing is built inside the transaction
+            self.assertEqual(ClothingItem.objects.get(pk=item.pk).renditions, {})
+        [build] = self.scheduled(callbacks)
+
+        with self.settings(IMAGE_RENDITION_WORKERS=2), mock.patch('wardrobe.renditions.get_executor') as executor:
+            build()
+        executor.return_value.submit.assert_called_once_with(render_item_in_thread, item.pk)
+
+        build()
+        item.refresh_from_db()
+        self.assertEqual(item.renditions['card']['width'], 480)
+
+        # Saving without a new image queues nothing
+        with self.captureOnCommitCallbacks() as callbacks:
+            item.name = 'Renamed'
+            item.save()
+        self.assertEqual(self.scheduled(callbacks), [])
+
+    def test_replaced_image_is_not_overwritten(self):
+        item = self.create(photo(300, 200))
+        first = item.renditions
+        with self.captureOnCommitCallbacks() as callbacks:
+            item.image = photo(200, 300)
+            item.save()
+        # The photo changes again before the queued build runs
+        ClothingItem.objects.filter(pk=item.pk).update(image='clothing_items/other.jpg')
+        [build] = self.scheduled(callbacks)
+        build()
+        item.refresh_from_db()
+        self.assertEqual(item.renditions, first)
+
+    def test_serializer_srcset(self):
+        item = self.create(photo(300, 200))
+        request = RequestFactory().get('/api/clothing-items/')
+        data = ClothingItemSerializer(item, context={'request': request}).data
+        self.assertEqual(set(data['renditions']), set(RENDITIONS))
+        urls = {
+            extension: {size: data['renditions'][size][extension] for size in RENDITIONS}
+            for extension in FORMATS
+        }
+        self.assertTrue(urls['webp']['thumb'].startswith('http://testserver/media/clothing_items/renditions/'))
+        # card and full are the same width, so it is listed once
+        self.assertEqual(data['srcset'], {
+            extension: f"{urls[extension]['thumb']} 160w, {urls[extension]['card']} 300w"
+            for extension in FORMATS
+        })
+
+        # Renditions of an earlier image are not offered
+        ClothingItem.objects.filter(pk=item.pk).update(image='clothing_items/other.jpg')
+        item.refresh_from_db()
+        data = ClothingItemSerializer(item, context={'request': request}).data
+        self.assertEqual(data['renditions'], {})
+        self.assertIsNone(data['srcset'])
+
+
+class MediaTests(TestCase):
+    """Content-addressed storage and the media view, in a temporary MEDIA_ROOT"""
+    CONTENT = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('media', password=None)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = self.settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.name = default_storage.save('clothing_items/Photo.JPG', ContentFile(self.CONTENT))
+        self.url = default_storage.url(self.name)
+        self.client.force_login(self.user)
+
+    def get(self, url=None, **headers):
+        return self.client.get(url or self.url, headers=headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_names_are_content_hashes(self):
+        digest = hashlib.sha256(self.CONTENT).hexdigest()
+        self.assertEqual(self.name, f'clothing_items/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(content_digest(self.name), digest)
+        # The same bytes under any name are stored once
+        self.assertEqual(default_storage.save('clothing_items/copy.jpg', ContentFile(self.CONTENT)), self.name)
+        self.assertEqual(os.listdir(Path(settings.MEDIA_ROOT) / 'clothing_items' / digest[:2]), [f'{digest}.jpg'])
+        other = default_storage.save('clothing_items/other.jpg', ContentFile(b'other'))
+        self.assertNotEqual(other, self.name)
+
+    def test_content_addressed_files_are_immutable(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(response['ETag'], f'"{content_digest(self.name)}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_other_files_get_a_short_max_age(self):
+        path = Path(settings.MEDIA_ROOT) / 'notes.txt'
+        path.write_bytes(b'notes')
+        response = self.get('/media/notes.txt')
+        self.assertEqual(self.body(response), b'notes')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=3600')
+
+    def test_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(If_None_Match=f'"other", {etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.body(response), b'')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(self.get(If_None_Match='"other"').status_code, 200)
+
+    def test_range_requests(self):
+        size = len(self.CONTENT)
+        cases = {
+            'bytes=0-9': (0, 9),
+            'bytes=1000-': (1000, size - 1),
+            'bytes=-24': (size - 24, size - 1),
+            'bytes=1000-5000': (1000, size - 1),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(range=header):
+                response = self.get(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self.body(response), self.CONTENT[start:end + 1])
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(int(response['Content-Length']), end - start + 1)
+
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.get(Range=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        # Invalid, multiple or outdated ranges get the whole file
+        for headers in ({'Range': 'bytes=20-10'}, {'Range': 'bytes=0-1,5-6'},
+                        {'Range': 'bytes=0-9', 'If-Range': '"outdated"'}):
+            with self.subTest(headers=headers):
+                response = self.get(**headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.body(response), self.CONTENT)
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range=etag).status_code, 206)
+
+    def test_requires_a_signed_in_user(self):
+        self.client.logout()
+        self.assertEqual(self.get().status_code, 403)
+        self.client.cookies[MEDIA_COOKIE] = 'not-a-token'
+        self.assertEqual(self.get().status_code, 403)
+
+    def test_token_clients_get_a_media_cookie(self):
+        self.client.logout()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+        response = client.get('/api/clothing-items/')
+        cookie = response.cookies[MEDIA_COOKIE]
+        self.assertEqual(cookie.value, self.token.key)
+        self.assertEqual(cookie['path'], settings.MEDIA_URL)
+        self.assertTrue(cookie['httponly'])
+        self.assertEqual(client.get(self.url).status_code, 200)
+        # Only set when missing
+        self.assertNotIn(MEDIA_COOKIE, client.get('/api/clothing-items/').cookies)
+
+        # A deleted token no longer opens photos
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+    def test_not_found(self):
+        for path in ('/media/missing.jpg', '/media/../manage.py', '/media/clothing_items/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path).status_code, 404)
+
+    def test_front_end_hand_off(self):
+        with self.settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response = self.get()
+        self.assertEqual(self.body(response), b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response['ETag'], f'"{content_digest(self.name)}"')
+
+        with self.settings(MEDIA_SENDFILE=True):
+            response = self.get()
+        self.assertEqual(self.body(response), b'')
+        self.assertEqual(response['X-Sendfile'], str(Path(settings.MEDIA_ROOT) / self.name))
+
+    def test_not_served_without_a_way_to_send_files(self):
+        with self.settings(MEDIA_SERVE_FILES=False):
+            self.assertEqual(self.get().status_code, 404)
+            with self.settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+                self.assertEqual(self.get().status_code, 200)
+
+
+class MetricsTests(SimpleTestCase):
+    def scrape(self, **headers):
+        return metrics_view(RequestFactory().get('/metrics', headers=headers))
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-secret')
+    def test_token_is_checked(self):
+        self.assertEqual(self.scrape().status_code, 401)
+        self.assertEqual(self.scrape(Authorization='Bearer wrong').status_code, 401)
+        self.assertEqual(self.scrape(Authorization='scrape-secret').status_code, 401)
+        response = self.scrape(Authorization='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_responses_total', response.content)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='')
+    def test_open_without_a_token_outside_production(self):
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False, METRICS_TOKEN='scrape-secret')
+    def test_disabled(self):
+        with self.assertRaises(Http404):
+            self.scrape(Authorization='Bearer scrape-secret')
+
+    def production_setting(self, name, **env):
+        """A setting's value in config.settings.production under ``env``"""
+        env = {
+            **{key: value for key, value in os.environ.items() if not key.startswith('METRICS_')},
+            'DJANGO_SETTINGS_MODULE': 'config.settings.production', 'SECRET_KEY': 'test',
+            'DATABASE_URL': 'sqlite:///:memory:', **env,
+        }
+        script = f'import django; django.setup(); from django.conf import settings; print(settings.{name})'
+        result = subprocess.run(
+            [sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        )
+        return result.stdout.strip()
+
+    def test_production_requires_a_token(self):
+        self.assertEqual(self.production_setting('METRICS_ENABLED'), 'False')
+        self.assertEqual(self.production_setting('METRICS_ENABLED', METRICS_TOKEN='scrape-secret'), 'True')
+
+    def test_worker_processes_are_added_up(self):
+        # prometheus_client picks multiprocess storage when imported, so the
+        # workers are separate interpreters, as under gunicorn
+        script = (
+            'from config import metrics; '
+            "metrics.RESPONSES.labels('wear-logs', 'GET', '200').inc(); "
+            "metrics.IN_FLIGHT.inc()"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+            for _ in range(3):
+                subprocess.run([sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR, check=True)
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                output = generate_latest(metrics_registry()).decode()
+        self.assertIn(
+            'http_responses_total{method="GET",route="wear-logs",status="200"} 3.0', output,
+        )
+        self.assertEqual(len(re.findall(r'^http_requests_in_flight\{pid="\d+"\} 1\.0$', output, re.M)), 3)
+
+    def test_startup_removes_only_metric_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                gunicorn_config = importlib.import_module('gunicorn_config')
+            for name in ('counter_101.db', 'gauge_liveall_101.db', 'notes.txt', 'backup.db.bak'):
+                (Path(directory) / name).write_text('')
+            (Path(directory) / 'nested.db').mkdir()
+            (Path(directory) / 'nested.db' / 'histogram_7.db').write_text('')
+            with mock.patch.object(gunicorn_config, 'METRICS_DIR', directory):
+                gunicorn_config.on_starting(None)
+            remaining = sorted(str(path.relative_to(directory)) for path in Path(directory).rglob('*'))
+        self.assertEqual(remaining, ['backup.db.bak', 'nested.db', 'nested.db/histogram_7.db', 'notes.txt'])
+
+
+class FrontendShellTests(SimpleTestCase):
+    MANIFEST = {
+        'index.html': {
+            'file': 'assets/index-4f2a.js',
+            'isEntry': True,
+            'css': ['assets/index-9c1d.css'],
+            'imports': ['_vendor-77ab.js'],
+        },
+        '_vendor-77ab.js': {'file': 'assets/vendor-77ab.js'},
+    }
+
+    def test_manifest_setting_matches_the_vite_build(self):
+        config = (settings.BASE_DIR / 'src' / 'frontend' / 'vite.config.ts').read_text()
+        out_dir = re.search(r"outDir: '([^']+)'", config).group(1)
+        manifest = re.search(r"manifest: '([^']+)'", config).group(1)
+        built = (settings.BASE_DIR / 'src' / 'frontend' / out_dir / manifest).resolve()
+        self.assertEqual(Path(settings.FRONTEND_MANIFEST).resolve(), built)
+
+    @mock.patch('config.frontend.get_frontend_assets', side_effect=AssertionError('scanned the assets directory'))
+    def test_shell_is_rendered_from_the_manifest(self, scan):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'build-manifest.json'
+            path.write_text(json.dumps(self.MANIFEST))
+            _, content, etag, link = FrontendShell(path).get()
+
+        content = content.decode()
+        self.assertIn('/static/frontend/assets/index-4f2a.js', content)
+        self.assertIn('/static/frontend/assets/index-9c1d.css', content)
+        self.assertEqual(link, (
+            '</static/frontend/assets/index-9c1d.css>; rel=preload; as=style, '
+            '</static/frontend/assets/index-4f2a.js>; rel=modulepreload, '
+            '</static/frontend/assets/vendor-77ab.js>; rel=modulepreload'
+        ))
+        self.assertTrue(etag.startswith('"'))
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an upstream that is currently failing."""
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail immediately for ``reset_timeout`` seconds. The first call after
+    that is let through as a probe: success closes the circuit, failure opens
+    it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("Upstream circuit is open")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning("Opening upstream circuit after %d failures", self._failures)
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class UpstreamClient:
+    """
+    HTTP client for one upstream service.
+
+    Keeps a keep-alive ``requests.Session`` per process (recreated after a
+    fork), applies connect/read timeouts to every call, retries connection
+    errors, timeouts and 5xx/429 responses with jittered exponential backoff,
+    and short-circuits through a ``CircuitBreaker`` while the upstream is
+    unhealthy. With a ``deadline`` the whole call, retries included, gets
+    that many seconds: attempts are cut to the time left, and a retry that
+    could not start before the deadline is not made.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, connect_timeout=2, read_timeout=4, max_retries=2,
+                 backoff=0.2, pool_size=10, breaker=None, deadline=None):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.max_duration = max_duration(connect_timeout, read_timeout, max_retries, backoff, deadline)
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_size,
+                        max_retries=0,
+                    )
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+
+    def get(self, url, params=None):
+        """GET ``url`` and return the successful response, or raise RequestException"""
+        ends_at = time.monotonic() + self.deadline if self.deadline else None
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            timeout = attempt_timeouts(self.connect_timeout, self.read_timeout, ends_at)
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+                if response.status_code in self.RETRY_STATUSES:
+                    response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                self.breaker.record_failure()
+                delay = retry_delay(self.backoff, attempt, self.max_retries, self.breaker, ends_at, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except requests.RequestException:
+                self.breaker.record_failure()
+                raise
+
+            self.breaker.record_success()
+            # Remaining 4xx errors are the caller's problem, not the upstream's
+            response.raise_for_status()
+            return response
+
+
+class AsyncUpstreamClient:
+    """
+    ``UpstreamClient`` counterpart for async views, built on ``httpx``.
+
+    One ``httpx.AsyncClient`` with a keep-alive pool is kept per event loop,
+    so a single process can hold many upstream requests in flight. Pooled
+    connections belong to the loop that opened them, so a client is never
+    used from another loop: under uvicorn there is one loop per worker, but
+    each ``async_to_sync`` call (tests, management commands) runs its own.
+    Clients are dropped with their loop, or once it is closed. Retry,
+    timeout, deadline and circuit-breaker behaviour matches ``UpstreamClient``.
+    """
+    RETRY_STATUSES = UpstreamClient.RETRY_STATUSES
+
+    def __init__(self, connect_timeout=2, read_timeout=4, max_retries=2,
+                 backoff=0.2, pool_size=100, breaker=None, deadline=None, transport=None):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.max_duration = max_duration(connect_timeout, read_timeout, max_retries, backoff, deadline)
+        self.breaker = breaker or CircuitBreaker()
+        # An httpx transport to use instead of the network, for tests
+        self.transport = transport
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        """The ``httpx.AsyncClient`` of the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            for old_loop in [old_loop for old_loop in self._clients if old_loop.is_closed()]:
+                del self._clients[old_loop]
+            client = self._clients[loop] = httpx.AsyncClient(limits=self.limits, transport=self.transport)
+        return client
+
+    async def aclose(self):
+        """Close the running event loop's client and its pooled connections"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def get(self, url, params=None):
+        """GET ``url`` and return the successful response, or raise an HTTP error"""
+        ends_at = time.monotonic() + self.deadline if self.deadline else None
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            connect, read = attempt_timeouts(self.connect_timeout, self.read_timeout, ends_at)
+            try:
+                response = await self.client.get(url, params=params, timeout=httpx.Timeout(read, connect=connect))
+                if response.status_code in self.RETRY_STATUSES:
+                    response.raise_for_status()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                self.breaker.record_failure()
+                delay = retry_delay(self.backoff, attempt, self.max_retries, self.breaker, ends_at, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except httpx.HTTPError:
+                self.breaker.record_failure()
+                raise
+
+            self.breaker.record_success()
+            response.raise_for_status()
+            return response
+
+
+def max_duration(connect_timeout, read_timeout, max_retries, backoff, deadline=None):
+    """
+    Seconds a ``get()`` can take when every attempt hits both timeouts and
+    every backoff is the longest possible, or the deadline if that is
+    sooner. The read timeout bounds each wait for data, so a server
+    trickling bytes could still take longer.
+    """
+    attempts = max_retries + 1
+    backoffs = sum(backoff * (2 ** attempt) for attempt in range(max_retries))
+    duration = attempts * (connect_timeout + read_timeout) + backoffs
+    return min(duration, deadline) if deadline else duration
+
+
+def attempt_timeouts(connect_timeout, read_timeout, ends_at):
+    """``(connect, read)`` timeouts for the next attempt, cut to the time left before ``ends_at``"""
+    if ends_at is None:
+        return connect_timeout, read_timeout
+    remaining = max(ends_at - time.monotonic(), 0.001)
+    return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+
+def retry_delay(backoff, attempt, max_retries, breaker, ends_at, error):
+    """
+    Seconds to wait before retrying after ``error``, or None when the call
+    must give up: retries are used up, the circuit opened, or the deadline
+    would pass before the next attempt starts.
+    """
+    if attempt >= max_retries or breaker.is_open:
+        return None
+    delay = backoff_delay(backoff, attempt)
+    if ends_at is not None and time.monotonic() + delay >= ends_at:
+        return None
+    logger.info("Retrying upstream call in %.2fs after: %s", delay, error)
+    return delay
+
+
+def backoff_delay(backoff, attempt):
+    """Full-jitter delay: spreads retries from many workers over the whole window"""
+    return random.uniform(0, backoff * (2 ** attempt))
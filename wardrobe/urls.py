@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -7,7 +8,19 @@ router.register(r'clothing-items', views.ClothingItemViewSet, basename='clothing
 router.register(r'wear-logs', views.WearLogViewSet, basename='wear-log')
 router.register(r'weather', views.WeatherViewSet, basename='weather')
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    # Must come before the router so they shadow the sync DRF actions
+    urlpatterns += [
+        path('weather/current/', async_views.current_weather, name='weather-current'),
+        path('clothing-items/suggestions/', async_views.suggestions, name='clothing-item-suggestions'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
+    path('analytics/', views.wear_analytics, name='wear-analytics'),
     path('health/', views.health_check, name='health-check'),
-] 
\ No newline at end of file
+]
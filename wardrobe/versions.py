@@ -0,0 +1,125 @@
+"""
+Data versions for conditional GETs.
+
+Every user has an opaque data version in the cache that changes whenever
+one of their items or wear logs is written, and the weather endpoints share
+one weather version. ETags are derived from a version and the request
+alone, so a client that already holds the current payload gets a 304 after
+a single cache lookup, before any queryset runs or anything is serialized.
+
+A version missing from the cache is replaced by a fresh random one, which
+can only cost an extra full response, never a stale 304. The cache must be
+shared between processes (Redis or the database cache in production).
+
+Writes inside a transaction bump the version twice: at once, and again on
+commit. Until the commit other requests still read the old rows, so an ETag
+computed then would carry the first new version with the old payload, and
+only the second bump makes it stale.
+"""
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .weather import WeatherService
+
+DATA_VERSION_KEY = 'wardrobe:data-version:{user_id}'
+WEATHER_VERSION_KEY = 'wardrobe:weather-version'
+
+
+def _new_version():
+    return uuid.uuid4().hex[:16]
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _new_version(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def get_data_version(user_id):
+    return _get_version(DATA_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_data_version(user_id):
+    """Invalidate every ETag handed out for the user's items and wear logs"""
+    key = DATA_VERSION_KEY.format(user_id=user_id)
+    cache.set(key, _new_version(), None)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.set(key, _new_version(), None))
+
+
+def get_weather_version():
+    return _get_version(WEATHER_VERSION_KEY)
+
+
+async def aget_weather_version():
+    return await _aget_version(WEATHER_VERSION_KEY)
+
+
+def bump_weather_version():
+    cache.set(WEATHER_VERSION_KEY, _new_version(), None)
+
+
+def make_etag(request, *parts):
+    """Hash of ``parts`` and what else selects the payload: path, query and Accept"""
+    content = ':'.join(
+        [str(part) for part in parts] + [request.get_full_path(), request.headers.get('Accept', '')]
+    )
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+def data_etag(request, *args, **kwargs):
+    user_id = request.user.pk
+    return make_etag(request, 'data', user_id, get_data_version(user_id))
+
+
+def _weather_period():
+    """
+    The current weather day and cache period: a new one must reach the view
+    so the cached forecast gets refreshed.
+    """
+    duration = WeatherService.DAILY_CACHE_DURATION.total_seconds()
+    return f'{timezone.localdate()}:{int(time.time() // duration)}'
+
+
+def weather_etag(request, *args, **kwargs):
+    return make_etag(request, 'weather', get_weather_version(), _weather_period())
+
+
+async def aweather_etag(request):
+    return make_etag(request, 'weather', await aget_weather_version(), _weather_period())
+
+
+def revalidate(response):
+    """Let browsers keep the response but check its ETag before each reuse"""
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(etag_func):
+    """``condition(etag_func=...)`` whose responses are always revalidated"""
+    def decorator(view):
+        view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return revalidate(view(request, *args, **kwargs))
+        return wrapped
+    return decorator
@@ -1,24 +1,103 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from .models import ClothingItem, WearLog, WeatherLog, Weather
-from .serializers import ClothingItemSerializer, WearLogSerializer, WeatherLogSerializer, WeatherSerializer
+from .models import ClothingItem, ItemWearStats, WearLog, WeatherLog, Weather
+from .serializers import (
+    ClothingItemSerializer, OutfitSerializer, WearLogSerializer, WearLogImportSerializer,
+    WeatherLogSerializer, WeatherSerializer,
+)
+from .pagination import ClothingItemCursorPagination, WearLogCursorPagination
+from .aggregates import GroupConcat, split_ids
+from .outfits import WardrobeFeatures, rank_outfits
+from .stats import refresh_items
+from .versions import conditional, data_etag, weather_etag
+from .sync import SyncTokenExpired, changes, encode_token
+from .fastpath import ValuesSerializer, WearLogValuesSerializer
+from .filters import ClothingItemFilter, facet_counts
+from django_filters.rest_framework import DjangoFilterBackend
 import requests
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce, TruncDate
 from django.utils import timezone
-from .services import WeatherService
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from datetime import datetime, time, timedelta
+from .weather import WeatherService
 
 # Create your views here.
 
+def sync_response(view, model):
+    """
+    The ``?since=`` changes feed of a list view. Clients apply ``deleted``
+    before ``changed`` and send ``token`` as the next ``since``, right away
+    while ``has_more`` is set.
+    """
+    request = view.request
+    try:
+        changed, deleted, moment = changes(
+            view.get_queryset(), model, request.user, request.query_params['since']
+        )
+    except SyncTokenExpired:
+        return Response(
+            {"error": "Sync token expired; reload with since=0"},
+            status=status.HTTP_410_GONE
+        )
+    # One row past the page tells whether another follows
+    page_size = settings.SYNC_PAGE_SIZE
+    rows = view.sync_rows(changed[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return Response({
+        'changed': view.serialize_list(rows),
+        'deleted': deleted,
+        'token': encode_token(moment, rows[-1] if has_more else None),
+        'has_more': has_more,
+    })
+
+
 class ClothingItemViewSet(viewsets.ModelViewSet):
     serializer_class = ClothingItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ClothingItemCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ClothingItemFilter
 
     def get_queryset(self):
         return ClothingItem.objects.filter(owner=self.request.user)
 
+    @method_decorator(conditional(data_etag))
+    def list(self, request, *args, **kwargs):
+        if 'since' in request.query_params:
+            return sync_response(self, 'clothing_item')
+        # Reads dicts with values() instead of instances; same output as the serializer
+        rows = self.values_serializer()
+        page = self.paginate_queryset(rows.values(self.filter_queryset(self.get_queryset())))
+        response = self.get_paginated_response(rows.many(page))
+        # Facets don't change from page to page, so only the first one has them
+        if self.paginator.cursor_query_param not in request.query_params:
+            response.data['facets'] = facet_counts(self.get_queryset(), request.query_params, request)
+        return response
+
+    def values_serializer(self):
+        # The pagination cursor is read from the ordering columns, and the
+        # sync continuation token from updated_at and id
+        return ValuesSerializer(
+            self.get_serializer(many=True).child,
+            required=[field.lstrip('-') for field in self.pagination_class.ordering] + ['updated_at'],
+        )
+
+    def sync_rows(self, queryset):
+        return list(self.values_serializer().values(queryset))
+
+    def serialize_list(self, rows):
+        return self.values_serializer().many(rows)
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -45,7 +124,8 @@ class ClothingItemViewSet(viewsets.ModelViewSet):
 
             return Response({
                 'weather': weather_data,
-                'suggestions': ClothingItemSerializer(suitable_items, many=True).data
+                'suggestions': ClothingItemSerializer(suitable_items, many=True).data,
+                'outfits': self._rank_outfits(request, weather_data, weather_suitability),
             })
         except ValueError as e:
             return Response(
@@ -53,72 +133,254 @@ class ClothingItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    def _rank_outfits(self, request, weather_data, weather_suitability):
+        """Compose the top-N complete outfits for the current weather"""
+        ranked = rank_outfits(
+            WardrobeFeatures.for_user(request.user),
+            weather_data,
+            weather_suitability,
+            limit=request.query_params.get('limit'),
+            formality=request.query_params.get('formality'),
+        )
+        items = self.get_queryset().in_bulk({item_id for _, ids in ranked for item_id in ids})
+        outfits = [
+            {'score': round(score, 4), 'items': [items[item_id] for item_id in ids if item_id in items]}
+            for score, ids in ranked
+        ]
+        return OutfitSerializer(outfits, many=True, context=self.get_serializer_context()).data
+
+def parse_date_bound(value, param, end=False):
+    """
+    Aware datetime for a ``YYYY-MM-DD`` or ISO datetime query parameter.
+    Plain dates cover the whole day: ``end`` gives the start of the next one.
+    """
+    try:
+        # parse_datetime() would also accept a plain date, as midnight
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        moment = day = None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    elif moment is None:
+        raise ValidationError({param: 'Enter a date (YYYY-MM-DD) or an ISO 8601 datetime.'})
+    elif end:
+        # Datetimes are inclusive bounds
+        moment += timedelta(microseconds=1)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
 class WearLogViewSet(viewsets.ModelViewSet):
     serializer_class = WearLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = WearLogCursorPagination
 
     def get_queryset(self):
-        return WearLog.objects.filter(items__owner=self.request.user).distinct()
+        return self.filter_date_worn(
+            WearLog.objects.filter(owner=self.request.user)
+            .select_related('weather_log')
+            .prefetch_related('items')
+        )
+
+    @method_decorator(conditional(data_etag))
+    def list(self, request, *args, **kwargs):
+        if 'since' in request.query_params:
+            return sync_response(self, 'wear_log')
+        # values() rows instead of instances, as for clothing items
+        rows = self.values_serializer()
+        page = self.paginate_queryset(rows.values(self.get_queryset()))
+        return self.get_paginated_response(rows.many(page))
+
+    def values_serializer(self):
+        return WearLogValuesSerializer(
+            self.get_serializer(many=True).child,
+            required=[field.lstrip('-') for field in self.pagination_class.ordering] + ['updated_at'],
+        )
+
+    def sync_rows(self, queryset):
+        return list(self.values_serializer().values(queryset))
+
+    def serialize_list(self, rows):
+        return self.values_serializer().many(rows)
+
+    def filter_date_worn(self, queryset):
+        """Apply the inclusive ``date_worn_after``/``date_worn_before`` range"""
+        after = self.request.query_params.get('date_worn_after')
+        before = self.request.query_params.get('date_worn_before')
+        # Half-open ranges on the column itself keep the (owner, date_worn) index usable
+        if after:
+            queryset = queryset.filter(date_worn__gte=parse_date_bound(after, 'date_worn_after'))
+        if before:
+            queryset = queryset.filter(date_worn__lt=parse_date_bound(before, 'date_worn_before', end=True))
+        return queryset
+
+    # Upper bound on the number of logs accepted by a single bulk import
+    BULK_IMPORT_LIMIT = 1000
 
     def create(self, request, *args, **kwargs):
-        # Verify all items belong to the current user
-        items_data = request.data.get('items', [])
-        if isinstance(items_data, list):
-            for item_data in items_data:
-                try:
-                    item_id = item_data.get('id')
-                    if item_id:
-                        item = ClothingItem.objects.get(id=item_id)
-                        if item.owner != request.user:
-                            return Response(
-                                {"error": "Cannot create wear log with items that don't belong to you"},
-                                status=status.HTTP_403_FORBIDDEN
-                            )
-                except ClothingItem.DoesNotExist:
-                    return Response(
-                        {"error": "One or more items not found"},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-
-        weather_data = request.data.get('weather_log')
-        if weather_data:
-            # Create a new WeatherLog
-            weather_log = WeatherLog.objects.create(
-                date=weather_data['date'],
-                temp_high=weather_data['temp_high'],
-                temp_low=weather_data['temp_low'],
-                precipitation_chance=weather_data['precipitation_chance'],
-                humidity=weather_data['humidity'],
-                conditions=weather_data['conditions']
-            )
-            request.data['weather_log'] = weather_log.id
-        else:
-            request.data['weather_log'] = None
+        # Verify all items belong to the current user with a single query
+        self.item_owners, denied = self._check_item_ownership(self._get_requested_item_ids(request.data))
+        if denied is not None:
+            return denied
 
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        weather = self._validated_weather(request.data.get('weather_log'))
+        with transaction.atomic():
+            self.perform_create(serializer, weather)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-    def perform_create(self, serializer):
-        # Create wear log entry
-        wear_log = serializer.save()
+    def perform_create(self, serializer, weather=None):
+        weather_log = WeatherLog.objects.get_snapshot(**weather) if weather else None
+
+        # Adding the items updates their stats and last_worn (wardrobe.signals),
+        # with the owners already looked up above
+        return serializer.save(
+            owner=self.request.user, weather_log=weather_log, item_owners=self.item_owners,
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Import many historical wear logs in one request using bulk inserts"""
+        logs_data = request.data.get('logs') if isinstance(request.data, dict) else request.data
+        serializer = WearLogImportSerializer(data=logs_data, many=True)
+        serializer.is_valid(raise_exception=True)
+        entries = serializer.validated_data
 
-        # Update last_worn for all items
-        items_data = self.request.data.get('items', [])
+        if len(entries) > self.BULK_IMPORT_LIMIT:
+            return Response(
+                {"error": f"Cannot import more than {self.BULK_IMPORT_LIMIT} wear logs at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        item_ids = {item_id for entry in entries for item_id in entry['item_ids']}
+        _, denied = self._check_item_ownership(item_ids)
+        if denied is not None:
+            return denied
+
+        with transaction.atomic():
+            # Entries with the same readings share one WeatherLog
+            weather_logs = WeatherLog.objects.get_snapshots([entry.get('weather_log') for entry in entries])
+
+            wear_logs = WearLog.objects.bulk_create([
+                WearLog(
+                    owner=request.user,
+                    date_worn=entry['date_worn'],
+                    notes=entry.get('notes', ''),
+                    weather_log=weather_log,
+                )
+                for entry, weather_log in zip(entries, weather_logs)
+            ])
+
+            Through = WearLog.items.through
+            Through.objects.bulk_create([
+                Through(wearlog_id=wear_log.id, clothingitem_id=item_id)
+                for wear_log, entry in zip(wear_logs, entries)
+                for item_id in set(entry['item_ids'])
+            ])
+
+            # bulk_create skips m2m signals: recompute stats and last_worn
+            refresh_items(item_ids)
+
+        return Response(
+            {'created': len(wear_logs), 'ids': [wear_log.id for wear_log in wear_logs]},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['get'])
+    @method_decorator(conditional(data_etag))
+    def calendar(self, request):
+        """One entry per day of ``?month=YYYY-MM`` (default: this month) from one grouped query"""
+        month = request.query_params.get('month')
+        try:
+            first = (
+                datetime.strptime(month, '%Y-%m').date() if month
+                else timezone.localdate().replace(day=1)
+            )
+        except ValueError:
+            raise ValidationError({'month': 'Enter a month as YYYY-MM.'})
+        following = (first + timedelta(days=31)).replace(day=1)
+
+        rows = (
+            WearLog.objects.filter(
+                owner=request.user,
+                date_worn__gte=timezone.make_aware(datetime.combine(first, time.min)),
+                date_worn__lt=timezone.make_aware(datetime.combine(following, time.min)),
+            )
+            .annotate(day=TruncDate('date_worn'))
+            .values('day')
+            .annotate(
+                logs=Count('id', distinct=True),
+                item_ids=GroupConcat('items__id', distinct=True),
+                # Days normally have a single log; otherwise any of their conditions
+                weather=Max(KeyTextTransform('primary', 'weather_log__conditions')),
+            )
+            .order_by('day')
+        )
+        return Response({
+            'month': first.strftime('%Y-%m'),
+            'days': [
+                {
+                    'date': row['day'],
+                    'logs': row['logs'],
+                    'item_ids': split_ids(row['item_ids']),
+                    'weather': row['weather'],
+                }
+                for row in rows
+            ],
+        })
+
+    def _get_requested_item_ids(self, data):
+        """Collect item ids from ``item_ids`` and the legacy ``items`` payload"""
+        item_ids = set()
+        requested = data.get('item_ids', [])
+        if isinstance(requested, list):
+            item_ids.update(item_id for item_id in requested if item_id)
+        items_data = data.get('items', [])
         if isinstance(items_data, list):
-            for item_data in items_data:
-                try:
-                    item_id = item_data.get('id')
-                    if item_id:
-                        item = ClothingItem.objects.get(id=item_id)
-                        item.last_worn = timezone.now()
-                        item.save()
-                except ClothingItem.DoesNotExist:
-                    continue
-
-        return wear_log
+            item_ids.update(
+                item_data.get('id') for item_data in items_data
+                if isinstance(item_data, dict) and item_data.get('id')
+            )
+        return item_ids
+
+    def _check_item_ownership(self, item_ids):
+        """
+        ``(owners, denied)``: the ``{item id: owner id}`` of the requested
+        items, and an error response unless every id names an item owned by
+        the requesting user, or None when the items may be logged.
+        """
+        if not item_ids:
+            return {}, None
+        try:
+            owners = dict(
+                ClothingItem.objects.filter(id__in=item_ids).values_list('id', 'owner_id')
+            )
+        except (TypeError, ValueError):
+            owners = {}
+        if len(owners) != len(item_ids):
+            return owners, Response(
+                {"error": "One or more items not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if any(owner_id != self.request.user.id for owner_id in owners.values()):
+            return owners, Response(
+                {"error": "Cannot create wear log with items that don't belong to you"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return owners, None
+
+    def _validated_weather(self, weather_data):
+        """The client's weather payload, validated as in a bulk import entry, or None"""
+        if not weather_data:
+            return None
+        serializer = WeatherLogSerializer(data=weather_data)
+        if not serializer.is_valid():
+            raise ValidationError({'weather_log': serializer.errors})
+        return serializer.validated_data
 
     @action(detail=False, methods=['get'])
     def get_weather_suggestions(self, request):
@@ -155,6 +417,7 @@ class WeatherViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = WeatherSerializer
 
     @action(detail=False, methods=['get'])
+    @method_decorator(conditional(weather_etag))
     def current(self, request):
         """Get current weather data"""
         weather = WeatherService.get_weather_for_date()
@@ -167,6 +430,58 @@ class WeatherViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(weather)
         return Response(serializer.data)
 
+# Items listed per category as most and least worn
+ANALYTICS_RANKED_ITEMS = 3
+
+
+@api_view(['GET'])
+def wear_analytics(request):
+    """Wear counts, cost per wear and weather breakdown of the user's wardrobe"""
+    now = timezone.now()
+    items = list(
+        ClothingItem.objects.filter(owner=request.user)
+        .annotate(wear_count=Coalesce(Sum('wear_stats__wear_count'), 0))
+        .values('id', 'name', 'category', 'purchase_price', 'last_worn', 'wear_count')
+        .order_by('id')
+    )
+    for item in items:
+        price = item['purchase_price']
+        item['cost_per_wear'] = (
+            round(float(price) / item['wear_count'], 2) if price is not None and item['wear_count'] else None
+        )
+        item['days_since_worn'] = (now - item['last_worn']).days if item['last_worn'] else None
+
+    by_category = {}
+    for category, _ in ClothingItem.CATEGORY_CHOICES:
+        ranked = sorted(
+            (item for item in items if item['category'] == category),
+            key=lambda item: (-item['wear_count'], item['id']),
+        )
+        if ranked:
+            by_category[category] = {
+                'most_worn': [item['id'] for item in ranked[:ANALYTICS_RANKED_ITEMS]],
+                'least_worn': [item['id'] for item in reversed(ranked[-ANALYTICS_RANKED_ITEMS:])],
+            }
+
+    buckets = {
+        row['weather_bucket']: {'wears': row['wears'], 'items': row['items']}
+        for row in ItemWearStats.objects.filter(owner=request.user)
+        .values('weather_bucket')
+        .annotate(wears=Sum('wear_count'), items=Count('item'))
+        .order_by()
+    }
+    by_weather = {
+        bucket: buckets.get(bucket, {'wears': 0, 'items': 0})
+        for bucket, _ in ItemWearStats.WEATHER_BUCKETS
+    }
+
+    return Response({
+        'items': items,
+        'by_category': by_category,
+        'by_weather': by_weather,
+    })
+
+
 @api_view(['GET'])
 def health_check(request):
     return Response({"status": "healthy"}, status=status.HTTP_200_OK)
@@ -1,11 +1,87 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import timedelta
+
+import httpx
 import requests
 from django.conf import settings
-import os
+from django.core.cache import cache
+from django.utils import timezone
+
+from config.metrics import WEATHER_CACHE, upstream_call
+
+from .models import Weather
+from .upstream import AsyncUpstreamClient, CircuitBreaker, UpstreamClient
+
+logger = logging.getLogger(__name__)
+
+# Both clients share one breaker, so sync and async callers in a process
+# agree on whether the upstream is healthy
+weather_breaker = CircuitBreaker(
+    failure_threshold=settings.WEATHER_BREAKER_THRESHOLD,
+    reset_timeout=settings.WEATHER_BREAKER_RESET_SECONDS,
+)
+
+# One pooled, time-bounded client per process for the OpenWeather API
+weather_client = UpstreamClient(
+    connect_timeout=settings.WEATHER_CONNECT_TIMEOUT,
+    read_timeout=settings.WEATHER_READ_TIMEOUT,
+    max_retries=settings.WEATHER_MAX_RETRIES,
+    deadline=settings.WEATHER_DEADLINE,
+    breaker=weather_breaker,
+)
+
+# Event-loop client used by the async views
+async_weather_client = AsyncUpstreamClient(
+    connect_timeout=settings.WEATHER_CONNECT_TIMEOUT,
+    read_timeout=settings.WEATHER_READ_TIMEOUT,
+    max_retries=settings.WEATHER_MAX_RETRIES,
+    deadline=settings.WEATHER_DEADLINE,
+    pool_size=100,
+    breaker=weather_breaker,
+)
+
+# Errors that mean "no fresh data from upstream" rather than a bug
+UPSTREAM_ERRORS = (requests.RequestException, httpx.HTTPError, KeyError, IndexError, ValueError)
+
 
 class WeatherService:
+    """
+    Single provider for weather data.
+
+    Upstream responses are cached per location in Django's cache, which is
+    shared by every gunicorn worker. An entry is fresh for
+    ``WEATHER_FRESH_SECONDS`` and may then be served stale for another
+    ``WEATHER_STALE_SECONDS`` while exactly one worker refreshes it: the
+    refresh is guarded by a cache lock, so an expiring key never turns into
+    a burst of identical upstream calls. While the upstream circuit is open
+    refreshes fail fast and the stale value keeps being served.
+
+    Every public method has an ``a``-prefixed coroutine twin for the async
+    views; both share the same cache entries.
+    """
+    DAILY_CACHE_DURATION = timedelta(hours=1)  # Update daily weather every hour
+    # Seconds a refresh may hold the lock, and a waiter waits for it: the
+    # slowest the upstream call can be with all its retries, plus a margin
+    # for parsing and the cache writes. A shorter lock would expire mid-refresh
+    # and let a second worker start the same upstream call.
+    LOCK_TIMEOUT = math.ceil(max(weather_client.max_duration, async_weather_client.max_duration)) + 2
+    POLL_INTERVAL = 0.05  # seconds between checks while another worker fetches
+
+    # Used when no API key or location is configured so development setups work
+    SAMPLE_DAILY_WEATHER = {
+        'temp_high': 75,  # Fahrenheit
+        'temp_low': 65,   # Fahrenheit
+        'precipitation_chance': 20,  # percentage
+        'humidity': 65,    # percentage
+    }
+
     def __init__(self):
-        self.api_key = os.getenv('OPENWEATHER_API_KEY')
-        self.base_url = 'http://api.openweathermap.org/data/2.5/weather'
+        self.api_key = settings.OPENWEATHER_API_KEY
+        self.base_url = settings.OPENWEATHER_URL
 
     def get_weather(self, city=None, zip_code=None, country_code='US'):
         """
@@ -15,36 +91,50 @@ class WeatherService:
         :param country_code: Two-letter country code (default: 'US')
         :return: dict with weather data or None if error
         """
-        if not self.api_key:
-            raise ValueError("OpenWeather API key not found in environment variables")
+        param, location = self._location(city, zip_code, country_code)
+        return self._get_cached(
+            self._cache_key('current', param, location),
+            lambda: self._fetch_current(param, location),
+            settings.WEATHER_FRESH_SECONDS,
+        )
 
-        params = {
-            'appid': self.api_key,
-            'units': 'imperial'  # Use Fahrenheit
-        }
+    async def aget_weather(self, city=None, zip_code=None, country_code='US'):
+        """Async version of get_weather()"""
+        param, location = self._location(city, zip_code, country_code)
+        return await self._aget_cached(
+            self._cache_key('current', param, location),
+            lambda: self._afetch_current(param, location),
+            settings.WEATHER_FRESH_SECONDS,
+        )
 
-        if zip_code:
-            params['zip'] = f"{zip_code},{country_code}"
-        elif city:
-            params['q'] = f"{city},{country_code}"
-        else:
-            raise ValueError("Either city or zip_code must be provided")
+    @classmethod
+    def get_weather_for_date(cls, date=None):
+        """
+        Get weather data for a specific date. If no date is provided, use today.
+        Returns cached data if available and fresh, otherwise fetches new data.
+        """
+        if date is None:
+            date = timezone.now().date()
 
-        try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            return {
-                'temperature': data['main']['temp'],
-                'condition': data['weather'][0]['main'].lower(),
-                'description': data['weather'][0]['description'],
-                'humidity': data['main']['humidity'],
-                'wind_speed': data['wind']['speed']
-            }
-        except requests.RequestException as e:
-            print(f"Error fetching weather data: {e}")
-            return None
+        service = cls()
+        return service._get_cached(
+            service._cache_key('daily', date.isoformat(), settings.WEATHER_LOCATION),
+            lambda: service._refresh_daily(date),
+            int(cls.DAILY_CACHE_DURATION.total_seconds()),
+        )
+
+    @classmethod
+    async def aget_weather_for_date(cls, date=None):
+        """Async version of get_weather_for_date()"""
+        if date is None:
+            date = timezone.now().date()
+
+        service = cls()
+        return await service._aget_cached(
+            service._cache_key('daily', date.isoformat(), settings.WEATHER_LOCATION),
+            lambda: service._arefresh_daily(date),
+            int(cls.DAILY_CACHE_DURATION.total_seconds()),
+        )
 
     def get_weather_suitability(self, temperature):
         """
@@ -59,4 +149,204 @@ class WeatherService:
         elif temperature >= 50:
             return 'cool'
         else:
-            return 'cold' 
\ No newline at end of file
+            return 'cold'
+
+    def _location(self, city, zip_code, country_code):
+        if not self.api_key:
+            raise ValueError("OpenWeather API key not found in environment variables")
+        if zip_code:
+            return 'zip', f"{zip_code},{country_code}"
+        if city:
+            return 'q', f"{city},{country_code}"
+        raise ValueError("Either city or zip_code must be provided")
+
+    def _cache_key(self, kind, *parts):
+        location = '|'.join(str(part).strip().lower() for part in parts)
+        digest = hashlib.md5(location.encode()).hexdigest()
+        return f'weather:{kind}:{digest}'
+
+    def _count_lookup(self, key, result):
+        # Keys are weather:<kind>:<digest>
+        WEATHER_CACHE.labels(key.split(':', 2)[1], result).inc()
+
+    def _cache_entry(self, value, fresh_for):
+        return {'value': value, 'fresh_until': time.time() + fresh_for}
+
+    def _get_cached(self, key, fetch, fresh_for):
+        """
+        Return the cached value for ``key``, refreshing it with ``fetch`` when
+        it is stale. Only the worker holding the lock calls ``fetch``; the
+        others keep serving the stale value, or wait for the first value on a
+        cold cache.
+        """
+        entry = cache.get(key)
+        if entry is not None and time.time() < entry['fresh_until']:
+            self._count_lookup(key, 'fresh')
+            return entry['value']
+        self._count_lookup(key, 'stale' if entry is not None else 'miss')
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, True, self.LOCK_TIMEOUT):
+            try:
+                value = fetch()
+                if value is not None:
+                    cache.set(key, self._cache_entry(value, fresh_for),
+                              fresh_for + settings.WEATHER_STALE_SECONDS)
+                    return value
+            finally:
+                cache.delete(lock_key)
+            # Upstream failed: keep serving what we had
+            return entry['value'] if entry is not None else None
+
+        if entry is not None:
+            return entry['value']
+
+        # Another worker is fetching the first value for this key
+        deadline = time.time() + self.LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry['value']
+        return None
+
+    async def _aget_cached(self, key, fetch, fresh_for):
+        """Async version of _get_cached(); ``fetch`` returns an awaitable"""
+        entry = await cache.aget(key)
+        if entry is not None and time.time() < entry['fresh_until']:
+            self._count_lookup(key, 'fresh')
+            return entry['value']
+        self._count_lookup(key, 'stale' if entry is not None else 'miss')
+
+        lock_key = f'{key}:lock'
+        if await cache.aadd(lock_key, True, self.LOCK_TIMEOUT):
+            try:
+                value = await fetch()
+                if value is not None:
+                    await cache.aset(key, self._cache_entry(value, fresh_for),
+                                     fresh_for + settings.WEATHER_STALE_SECONDS)
+                    return value
+            finally:
+                await cache.adelete(lock_key)
+            return entry['value'] if entry is not None else None
+
+        if entry is not None:
+            return entry['value']
+
+        deadline = time.time() + self.LOCK_TIMEOUT
+        while time.time() < deadline:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return entry['value']
+        return None
+
+    def _current_params(self, param, location):
+        return {
+            'appid': self.api_key,
+            'units': 'imperial',  # Use Fahrenheit
+            param: location,
+        }
+
+    def _parse_current(self, data):
+        return {
+            'temperature': data['main']['temp'],
+            'condition': data['weather'][0]['main'].lower(),
+            'description': data['weather'][0]['description'],
+            'humidity': data['main']['humidity'],
+            'wind_speed': data['wind']['speed']
+        }
+
+    def _fetch_current(self, param, location):
+        try:
+            with upstream_call('current'):
+                response = weather_client.get(
+                    f'{self.base_url}/weather', params=self._current_params(param, location)
+                )
+            return self._parse_current(response.json())
+        except UPSTREAM_ERRORS as e:
+            logger.warning("Error fetching weather data: %s", e)
+            return None
+
+    async def _afetch_current(self, param, location):
+        try:
+            with upstream_call('current'):
+                response = await async_weather_client.get(
+                    f'{self.base_url}/weather', params=self._current_params(param, location)
+                )
+            return self._parse_current(response.json())
+        except UPSTREAM_ERRORS as e:
+            logger.warning("Error fetching weather data: %s", e)
+            return None
+
+    def _is_fresh(self, weather):
+        return weather and timezone.now() - weather.last_updated < self.DAILY_CACHE_DURATION
+
+    def _refresh_daily(self, date):
+        """Return the stored Weather row for ``date``, fetching it when stale"""
+        weather = Weather.objects.filter(date=date).first()
+        if self._is_fresh(weather):
+            return weather
+
+        weather_data = self._fetch_daily()
+        if weather_data is None:
+            return weather
+
+        weather, _ = Weather.objects.update_or_create(date=date, defaults=weather_data)
+        return weather
+
+    async def _arefresh_daily(self, date):
+        weather = await Weather.objects.filter(date=date).afirst()
+        if self._is_fresh(weather):
+            return weather
+
+        weather_data = await self._afetch_daily()
+        if weather_data is None:
+            return weather
+
+        weather, _ = await Weather.objects.aupdate_or_create(date=date, defaults=weather_data)
+        return weather
+
+    def _daily_params(self):
+        """Forecast query for WEATHER_LOCATION, or None to use the sample data"""
+        if not self.api_key or not settings.WEATHER_LOCATION:
+            return None
+        return {
+            'appid': self.api_key,
+            'units': 'imperial',
+            'q': settings.WEATHER_LOCATION,
+        }
+
+    def _parse_daily(self, data):
+        """Today's high/low from an OpenWeather forecast response"""
+        today_forecast = data['list'][0]
+        return {
+            'temp_high': today_forecast['main']['temp_max'],
+            'temp_low': today_forecast['main']['temp_min'],
+            'precipitation_chance': round(today_forecast.get('pop', 0) * 100),  # Convert to percentage
+            'humidity': today_forecast['main']['humidity'],
+        }
+
+    def _fetch_daily(self):
+        params = self._daily_params()
+        if params is None:
+            return dict(self.SAMPLE_DAILY_WEATHER)
+        try:
+            with upstream_call('forecast'):
+                response = weather_client.get(f'{self.base_url}/forecast', params=params)
+            return self._parse_daily(response.json())
+        except UPSTREAM_ERRORS as e:
+            logger.warning("Error fetching daily weather data: %s", e)
+            return None
+
+    async def _afetch_daily(self):
+        params = self._daily_params()
+        if params is None:
+            return dict(self.SAMPLE_DAILY_WEATHER)
+        try:
+            with upstream_call('forecast'):
+                response = await async_weather_client.get(f'{self.base_url}/forecast', params=params)
+            return self._parse_daily(response.json())
+        except UPSTREAM_ERRORS as e:
+            logger.warning("Error fetching daily weather data: %s", e)
+            return None